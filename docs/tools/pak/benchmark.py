@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Throughput and memory scaling benchmarks on synthetic archives.
+
+For each archive size the suite generates an IDX/PAK pair with
+synth_archive.py (cached in the work directory, reused while the settings
+match) and times the hot paths of the tools:
+
+  idx_load         read_idx() into IdxEntry objects
+  idx_load_table   read_idx_table() into a NumPy structured array (needs numpy)
+  xor              xor_repeat() over every stored payload, keys preloaded
+  extract          PakArchive.read() (key lookup, XOR, inflate) + write to disk
+  strings          read + printable ASCII / Hangul run extraction over every plaintext
+  strings_legacy   read + guides/csb_text_extractor.py on the first CSB entries only
+  repack           read + re-encode (deflate + XOR) every entry into a new IDX/PAK
+
+strings, strings_legacy and repack stream their plaintexts from the archive
+one entry at a time inside the timed stage, so their MB/s include the read
+(XOR, inflate) and their peak memory is that of one entry, not the archive.
+
+Each benchmark runs once without tracing for throughput, then again under
+tracemalloc for its peak Python memory (skipped with --no-memory), so the
+tracing overhead never shows up in MB/s. The report has one curve per
+benchmark: MB/s, entries/s and peak memory against the entry count.
+
+Usage:
+  python benchmark.py [--sizes 1K,10K,100K] [--workdir bench_data] [--mean-size 2048]
+                      [--only xor,extract] [--no-memory] [--output benchmark.json]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import re
+import shutil
+import sys
+import time
+from pathlib import Path
+
+from instrument import Profiler, format_size
+from keystore import Keystore
+from pak_format import PakArchive, PakWriter, decode_payload, local_path, read_idx, read_idx_table, xor_repeat
+from synth_archive import DEFAULT_MEAN_SIZE, generate, parse_count
+
+DEFAULT_SIZES = '1K,10K,100K'
+LEGACY_SAMPLE = 10
+MIN_STRING = 4
+# Printable ASCII or UTF-8 Hangul syllables (U+AC00..U+D7A3 -> EA B0 80 .. ED 9E A3)
+STRING_RUN = re.compile(rb'(?:[\x20-\x7e]|[\xea-\xed][\x80-\xbf]{2}){%d,}' % MIN_STRING)
+GUIDES_DIR = Path(__file__).resolve().parent.parent / 'guides'
+
+
+def _keys(idx_path, keystore_path):
+    with Keystore(keystore_path, fallback=None) as keys:
+        return [bytes(keys.get(entry.name, entry.index)) for entry in read_idx(idx_path)[1]]
+
+
+def bench_idx_load(stage, idx_path, keystore_path, scratch):
+    _, entries = read_idx(idx_path)
+    stage.add(bytes=Path(idx_path).stat().st_size, entries=len(entries))
+
+
+def bench_idx_load_table(stage, idx_path, keystore_path, scratch):
+    _, table = read_idx_table(idx_path)
+    stage.add(bytes=Path(idx_path).stat().st_size, entries=len(table))
+
+
+def bench_xor(stage, idx_path, keystore_path, scratch, keys=None):
+    with PakArchive(idx_path) as archive:
+        for entry, key in zip(archive.entries, keys):
+            stored = archive.raw(entry)
+            xor_repeat(stored, key)
+            stage.add(bytes=len(stored), entries=1)
+
+
+def bench_extract(stage, idx_path, keystore_path, scratch):
+    out = scratch / 'extracted'
+    with Keystore(keystore_path, fallback=None) as keys, \
+            PakArchive(idx_path, key_lookup=keys.lookup) as archive:
+        for entry in archive.entries:
+            plain = archive.read(entry)
+            target = out / local_path(entry.name)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_bytes(plain)
+            stage.add(bytes=len(plain), entries=1)
+
+
+def scan_strings(data):
+    """(offset, text) for every run of at least MIN_STRING printable ASCII / Hangul characters."""
+    return [(match.start(), match.group().decode('utf-8', errors='replace')) for match in STRING_RUN.finditer(data)]
+
+
+def bench_strings(stage, idx_path, keystore_path, scratch):
+    with Keystore(keystore_path, fallback=None) as keys, \
+            PakArchive(idx_path, key_lookup=keys.lookup) as archive:
+        for entry in archive.entries:
+            plain = archive.read(entry)
+            scan_strings(plain)
+            stage.add(bytes=len(plain), entries=1)
+
+
+def bench_strings_legacy(stage, idx_path, keystore_path, scratch, extract_strings=None):
+    sample = scratch / 'legacy_sample.csb'
+    with Keystore(keystore_path, fallback=None) as keys, \
+            PakArchive(idx_path, key_lookup=keys.lookup) as archive:
+        csb = [entry for entry in archive.entries if entry.name.endswith('.csb')][:LEGACY_SAMPLE]
+        for entry in csb:
+            plain = archive.read(entry)
+            sample.write_bytes(plain)
+            with contextlib.redirect_stdout(io.StringIO()):
+                extract_strings(sample)
+            stage.add(bytes=len(plain), entries=1)
+
+
+def bench_repack(stage, idx_path, keystore_path, scratch):
+    with Keystore(keystore_path, fallback=None) as keys, \
+            PakArchive(idx_path, key_lookup=keys.lookup) as archive, \
+            PakWriter(scratch / 'repacked.idx', preamble=archive.preamble()) as writer:
+        for entry in archive.entries:
+            stored = archive.raw(entry)
+            key = archive.key(entry, stored)
+            plain = decode_payload(stored, key, entry.flag)
+            writer.add_plain(entry.name, plain, key, entry.flag)
+            stage.add(bytes=len(plain), entries=1)
+
+
+BENCHMARKS = {
+    'idx_load': bench_idx_load,
+    'idx_load_table': bench_idx_load_table,
+    'xor': bench_xor,
+    'extract': bench_extract,
+    'strings': bench_strings,
+    'strings_legacy': bench_strings_legacy,
+    'repack': bench_repack,
+}
+
+
+def _inputs(name, idx_path, keystore_path):
+    """
+    Inputs a benchmark needs preloaded, so loading them is not measured: the
+    keys for xor and one-off imports. Plaintexts are never preloaded.
+    """
+    if name == 'idx_load_table':
+        import numpy  # noqa: F401  (keep the one-off import out of the timing)
+    if name == 'xor':
+        return {'keys': _keys(idx_path, keystore_path)}
+    if name == 'strings_legacy':
+        sys.path.insert(0, str(GUIDES_DIR))
+        try:
+            from csb_text_extractor import extract_strings
+        finally:
+            sys.path.remove(str(GUIDES_DIR))
+        return {'extract_strings': extract_strings}
+    return {}
+
+
+def run_benchmark(name, idx_path, keystore_path, scratch, trace_memory):
+    """One timed (or memory-traced) run of a benchmark; returns its stage dict."""
+    if scratch.exists():
+        shutil.rmtree(scratch)
+    scratch.mkdir(parents=True)
+    inputs = _inputs(name, idx_path, keystore_path)
+    profiler = Profiler(trace_memory=trace_memory).start()
+    with profiler.stage(name) as stage:
+        BENCHMARKS[name](stage, idx_path, keystore_path, scratch, **inputs)
+    profiler.stop()
+    del inputs
+    return profiler.stages[name].as_dict()
+
+
+def prepare_archive(workdir, entries, mean_size, seed=0):
+    """Generate (or reuse) the synthetic archive for one size."""
+    idx_path = workdir / f"synth_{entries}.idx"
+    settings_path = idx_path.with_suffix('.json')
+    settings = {'entries': entries, 'mean_size': mean_size, 'seed': seed}
+    if idx_path.exists() and settings_path.exists() and \
+            json.loads(settings_path.read_text(encoding='utf-8')).get('settings') == settings:
+        return idx_path, json.loads(settings_path.read_text(encoding='utf-8'))['stats']
+
+    started = time.perf_counter()
+    stats = generate(idx_path, entries, seed, mean_size=mean_size)
+    stats['generate_seconds'] = round(time.perf_counter() - started, 3)
+    settings_path.write_text(json.dumps({'settings': settings, 'stats': stats}, indent=1), encoding='utf-8')
+    return idx_path, stats
+
+
+def run_suite(workdir, sizes, mean_size=DEFAULT_MEAN_SIZE, only=None, memory=True, log=print):
+    """
+    Run every benchmark at every size.
+
+    Returns:
+        report dict: per size the archive stats and, per benchmark, the
+        throughput run merged with the traced peak memory
+    """
+    workdir = Path(workdir)
+    workdir.mkdir(parents=True, exist_ok=True)
+    names = [name for name in BENCHMARKS if not only or name in only]
+    report = {'mean_size': mean_size, 'sizes': sizes, 'benchmarks': names, 'results': {}}
+
+    for entries in sizes:
+        log(f"[*] {entries} entries: preparing archive")
+        idx_path, stats = prepare_archive(workdir, entries, mean_size)
+        keystore_path = idx_path.with_suffix('.l1rk')
+        results = {'archive': stats}
+        for name in names:
+            scratch = workdir / 'scratch'
+            result = run_benchmark(name, idx_path, keystore_path, scratch, trace_memory=False)
+            if memory:
+                result['peak_memory'] = run_benchmark(name, idx_path, keystore_path, scratch,
+                                                      trace_memory=True).get('peak_memory')
+            shutil.rmtree(scratch, ignore_errors=True)
+            results[name] = result
+            log(f"    {name:16s} {result['seconds']:8.3f}s {result.get('mb_per_s', 0):9.1f} MB/s "
+                f"{result.get('entries_per_s', 0):11.0f} entries/s  peak {format_size(result.get('peak_memory'))}")
+        report['results'][str(entries)] = results
+    return report
+
+
+def print_curves(report):
+    sizes = [str(size) for size in report['sizes']]
+    for metric, label, fmt in (('mb_per_s', 'MB/s', lambda v: f"{v:.1f}" if v >= 10 else f"{v:.3g}"),
+                               ('entries_per_s', 'entries/s', lambda v: f"{v:.0f}"),
+                               ('peak_memory', 'peak memory', format_size)):
+        print(f"\n{label} by entry count")
+        print(f"{'Benchmark':16s} " + ' '.join(f"{size:>12s}" for size in sizes))
+        print("-" * (17 + 13 * len(sizes)))
+        for name in report['benchmarks']:
+            values = [report['results'][size][name].get(metric) for size in sizes]
+            print(f"{name:16s} " + ' '.join(f"{fmt(v) if v is not None else '-':>12s}" for v in values))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput and memory scaling benchmarks on synthetic archives")
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help="Comma-separated entry counts, e.g. 1K,10K,100K,1M")
+    parser.add_argument('--workdir', default='bench_data', help="Where synthetic archives are generated and cached")
+    parser.add_argument('--mean-size', type=int, default=DEFAULT_MEAN_SIZE, help="Median synthetic entry size")
+    parser.add_argument('--only', help=f"Comma-separated subset of: {', '.join(BENCHMARKS)}")
+    parser.add_argument('--no-memory', action='store_true', help="Skip the tracemalloc pass")
+    parser.add_argument('--output', default='benchmark.json', help="JSON report path")
+    args = parser.parse_args()
+
+    sizes = [parse_count(size) for size in args.sizes.split(',') if size.strip()]
+    only = [name.strip() for name in args.only.split(',')] if args.only else None
+    unknown = set(only or ()) - set(BENCHMARKS)
+    if unknown:
+        print(f"[!] Unknown benchmark(s): {', '.join(sorted(unknown))}")
+        sys.exit(1)
+
+    print("=" * 80)
+    print("PAK TOOL BENCHMARKS")
+    print("=" * 80)
+    started = time.perf_counter()
+    report = run_suite(args.workdir, sizes, args.mean_size, only, not args.no_memory)
+    report['seconds'] = round(time.perf_counter() - started, 3)
+    print_curves(report)
+
+    Path(args.output).write_text(json.dumps(report, indent=1, ensure_ascii=False), encoding='utf-8')
+    print(f"\n[+] Report written to {args.output}")
@@ -0,0 +1,457 @@
+#!/usr/bin/env python3
+"""
+One persisted entry index across every IDX/PAK pair of a client install.
+
+The other tools take a single archive (ui.idx); the client ships several.
+`update` finds every IDX with a PAK next to it below the client directory,
+reads their entry tables and stores them in SQLite:
+
+  archives   one row per pair: IDX path relative to the client, PAK,
+             keystore, precedence rank, IDX size/mtime (change detection)
+  members    every entry of every archive
+  resolved   the winning entry for each name, with its IDX record
+
+Names are matched case-insensitively (the client runs on Windows). When
+several archives hold a name, the archive whose path matches the earliest
+--precedence pattern wins (fnmatch, e.g. 'patch/*.idx' 'ui.idx'); archives
+matching no pattern come after those that do, in path order. Within one
+archive a repeated name resolves to its last record, as PakArchive.by_name
+does. Shadowed entries stay in `members` and are listed by `conflicts`.
+
+Updates are incremental: only IDX files whose size or mtime changed are read
+again, then `resolved` is recomputed in one statement. Resolving a name is a
+primary-key lookup in `resolved`; ClientIndex.load() keeps the whole table
+in a dict for bulk work. Only the archive that holds an entry is opened, on
+first read, with <idx stem>.l1rk beside it (or --keystore stem=path) as its
+key source.
+
+Reads go through the archive's live IDX, never the offsets stored here: a
+resolved name picks the archive and IDX index, and the record at that index
+must still carry the name. An archive whose IDX changed since it was opened
+(PakPatcher, pak_watch) is reopened, so patched entries read their new
+payloads; one whose entries moved to other indices raises LookupError until
+the next update. entry_server.py (--client), string_index.py and
+layout_index.py (--client) take the index in place of a single IDX.
+
+    with ClientIndex('client.sqlite') as index:
+        plain = index.read('Chat\\\\2k_ChatUI.xml')
+        archive_path, entry = index.resolve('Chat/2k_ChatUI.xml')
+
+Usage:
+  python client_index.py <client.sqlite> update <client_dir> [--precedence 'patch/*.idx' ui.idx] [--keystore ui=keys.l1rk]
+  python client_index.py <client.sqlite> find <pattern> [--limit 50]
+  python client_index.py <client.sqlite> cat <name> [--output file]
+  python client_index.py <client.sqlite> conflicts [--limit 50]
+  python client_index.py <client.sqlite> stats
+"""
+
+import argparse
+import fnmatch
+import os
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+from pak_format import IdxEntry, PakArchive, archive_name, default_pak_path, read_idx
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS settings (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS archives (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    pak TEXT NOT NULL,
+    keystore TEXT,
+    rank INTEGER NOT NULL,
+    idx_size INTEGER NOT NULL,
+    idx_mtime_ns INTEGER NOT NULL,
+    entries INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS members (
+    archive INTEGER NOT NULL REFERENCES archives(id),
+    idx_index INTEGER NOT NULL,
+    key TEXT NOT NULL,
+    name TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    compressed_size INTEGER NOT NULL,
+    flag INTEGER NOT NULL,
+    PRIMARY KEY (archive, idx_index)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS members_by_key ON members(key);
+CREATE TABLE IF NOT EXISTS resolved (
+    key TEXT PRIMARY KEY,
+    archive INTEGER NOT NULL,
+    idx_index INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    compressed_size INTEGER NOT NULL,
+    flag INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+RESOLVE = """
+INSERT INTO resolved
+SELECT key, archive, idx_index, name, offset, size, compressed_size, flag FROM (
+    SELECT m.*, ROW_NUMBER() OVER (PARTITION BY m.key ORDER BY a.rank, a.path, m.idx_index DESC) AS n
+    FROM members AS m JOIN archives AS a ON a.id = m.archive
+) WHERE n = 1
+"""
+
+
+def name_key(name):
+    """Lookup key of an entry name: '/' or '\\' separated, any case."""
+    return archive_name(name).lower()
+
+
+def discover(client_dir):
+    """
+    IDX/PAK pairs below a client directory.
+
+    Returns:
+        [(IDX path relative to client_dir, '/' separated; PAK path relative to client_dir)], sorted
+    """
+    pairs = []
+    for directory, _, files in os.walk(client_dir):
+        present = {name.lower(): name for name in files}
+        for name in files:
+            if not name.lower().endswith('.idx'):
+                continue
+            pak = present.get(default_pak_path(name.lower()).name)
+            if pak is None:
+                continue
+            relative_dir = Path(directory).relative_to(client_dir)
+            pairs.append(((relative_dir / name).as_posix(), (relative_dir / pak).as_posix()))
+    return sorted(pairs)
+
+
+def precedence_rank(path, precedence):
+    """Index of the first pattern matching an archive path; unmatched archives rank last."""
+    for rank, pattern in enumerate(precedence):
+        if fnmatch.fnmatch(path.lower(), pattern.lower()) or fnmatch.fnmatch(Path(path).name.lower(),
+                                                                            pattern.lower()):
+            return rank
+    return len(precedence)
+
+
+def _close_archive(archive, keys):
+    archive.close()
+    if keys is not None:
+        keys.close()
+
+
+def _entry(row):
+    """IdxEntry from (idx_index, name, offset, size, compressed_size, flag)."""
+    return IdxEntry(*row)
+
+
+class ClientIndex:
+    """The SQLite index of a client install, opening archives only when an entry is read."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.db = sqlite3.connect(self.path)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SCHEMA)
+        self._archives = {}
+        self._retired = {}
+        self._table = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        for opened in [*self._archives.values(), *self._retired.values()]:
+            _close_archive(*opened)
+        self._archives.clear()
+        self._retired.clear()
+        self.db.commit()
+        self.db.close()
+
+    @property
+    def client_dir(self):
+        row = self.db.execute("SELECT value FROM settings WHERE name = 'client_dir'").fetchone()
+        if row is None:
+            raise LookupError(f"{self.path}: no client indexed yet (run update)")
+        return Path(row[0])
+
+    def update(self, client_dir, precedence=None, keystores=None):
+        """
+        Bring the index in line with a client directory.
+
+        Args:
+            client_dir: Client install directory
+            precedence: fnmatch patterns over archive paths (or file names), highest precedence first;
+                None keeps the patterns of the previous update
+            keystores: {IDX stem or path: .l1rk path}; default <idx stem>.l1rk next to the IDX, else
+                the keystore an earlier update recorded
+
+        Returns:
+            stats dict (archives, read, unchanged, removed, entries, names, conflicts, skipped)
+        """
+        client_dir = Path(client_dir).resolve()
+        keystores = keystores or {}
+        if precedence is None:
+            row = self.db.execute("SELECT value FROM settings WHERE name = 'precedence'").fetchone()
+            precedence = row[0].split('\n') if row and row[0] else []
+        stats = {'archives': 0, 'read': 0, 'unchanged': 0, 'removed': 0, 'skipped': []}
+        known = {path: (archive_id, size, mtime_ns) for archive_id, path, size, mtime_ns
+                 in self.db.execute("SELECT id, path, idx_size, idx_mtime_ns FROM archives")}
+        known_keystores = dict(self.db.execute("SELECT path, keystore FROM archives"))
+        self.db.execute("INSERT OR REPLACE INTO settings VALUES ('client_dir', ?)", (str(client_dir),))
+        self.db.execute("INSERT OR REPLACE INTO settings VALUES ('precedence', ?)", ('\n'.join(precedence),))
+
+        found = set()
+        for relative, pak in discover(client_dir):
+            idx_path = client_dir / relative
+            stat = idx_path.stat()
+            keystore = keystores.get(relative) or keystores.get(Path(relative).stem)
+            if keystore is None and idx_path.with_suffix('.l1rk').exists():
+                keystore = idx_path.with_suffix('.l1rk')
+            keystore = keystore or known_keystores.get(relative)
+            keystore = str(Path(keystore).resolve()) if keystore else None
+            rank = precedence_rank(relative, precedence)
+
+            previous = known.get(relative)
+            if previous and previous[1:] == (stat.st_size, stat.st_mtime_ns):
+                self.db.execute("UPDATE archives SET pak = ?, keystore = ?, rank = ? WHERE id = ?",
+                                (pak, keystore, rank, previous[0]))
+                stats['unchanged'] += 1
+                found.add(relative)
+                continue
+            try:
+                _, entries = read_idx(idx_path)
+            except ValueError as exc:
+                stats['skipped'].append(f"{relative}: {exc}")
+                continue
+            if previous:
+                self.db.execute("DELETE FROM members WHERE archive = ?", (previous[0],))
+                self.db.execute("UPDATE archives SET pak = ?, keystore = ?, rank = ?, idx_size = ?, "
+                                "idx_mtime_ns = ?, entries = ? WHERE id = ?",
+                                (pak, keystore, rank, stat.st_size, stat.st_mtime_ns, len(entries), previous[0]))
+                archive_id = previous[0]
+            else:
+                archive_id = self.db.execute(
+                    "INSERT INTO archives (path, pak, keystore, rank, idx_size, idx_mtime_ns, entries) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (relative, pak, keystore, rank, stat.st_size, stat.st_mtime_ns, len(entries))).lastrowid
+            self.db.executemany("INSERT INTO members VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                ((archive_id, entry.index, name_key(entry.name), entry.name, entry.offset,
+                                  entry.size, entry.compressed_size, entry.flag) for entry in entries))
+            stats['read'] += 1
+            found.add(relative)
+
+        for relative in known.keys() - found:
+            archive_id = known[relative][0]
+            self.db.execute("DELETE FROM members WHERE archive = ?", (archive_id,))
+            self.db.execute("DELETE FROM archives WHERE id = ?", (archive_id,))
+            stats['removed'] += 1
+
+        self.db.execute("DELETE FROM resolved")
+        self.db.execute(RESOLVE)
+        self.db.commit()
+        self._table = None
+        stats['archives'] = len(found)
+        stats['entries'] = self.db.execute("SELECT COUNT(*) FROM members").fetchone()[0]
+        stats['names'] = self.db.execute("SELECT COUNT(*) FROM resolved").fetchone()[0]
+        stats['conflicts'] = self.db.execute(
+            "SELECT COUNT(*) FROM (SELECT key FROM members GROUP BY key HAVING COUNT(DISTINCT archive) > 1)"
+        ).fetchone()[0]
+        return stats
+
+    def load(self):
+        """Keep the resolved table in memory: {name key: (archive id, IdxEntry)}."""
+        self._table = {key: (archive_id, _entry(row)) for key, archive_id, *row in self.db.execute(
+            "SELECT key, archive, idx_index, name, offset, size, compressed_size, flag FROM resolved")}
+        return self._table
+
+    def _resolve(self, name):
+        key = name_key(name)
+        if self._table is not None:
+            return self._table.get(key)
+        row = self.db.execute("SELECT archive, idx_index, name, offset, size, compressed_size, flag "
+                              "FROM resolved WHERE key = ?", (key,)).fetchone()
+        return None if row is None else (row[0], _entry(row[1:]))
+
+    def resolve(self, name):
+        """
+        The entry a name addresses in this install, as of the last update.
+
+        Returns:
+            (IDX path relative to the client, IdxEntry), or None when no archive holds the name
+        """
+        found = self._resolve(name)
+        if found is None:
+            return None
+        return self.db.execute("SELECT path FROM archives WHERE id = ?", (found[0],)).fetchone()[0], found[1]
+
+    def archive(self, archive_id):
+        """
+        PakArchive of an indexed pair, opened on first use and reopened when its IDX changes.
+
+        archive.idx_signature is the IDX (size, mtime_ns) the archive was read at. A replaced
+        archive stays open until the pair is reopened again, so reads still running on it (entry_server
+        decodes in threads) can finish; then it is closed with its keystore.
+        """
+        opened = self._archives.get(archive_id)
+        if opened is not None:
+            stat = opened[0].idx_path.stat()
+            if (stat.st_size, stat.st_mtime_ns) == opened[0].idx_signature:
+                return opened[0]
+            retired = self._retired.pop(archive_id, None)
+            if retired is not None:
+                _close_archive(*retired)
+            self._retired[archive_id] = opened
+        path, pak, keystore = self.db.execute("SELECT path, pak, keystore FROM archives WHERE id = ?",
+                                              (archive_id,)).fetchone()
+        keys = None
+        lookup = {}
+        if keystore:
+            from keystore import Keystore
+            keys = Keystore(keystore)
+            lookup['key_lookup'] = keys.lookup
+        stat = (self.client_dir / path).stat()
+        archive = PakArchive(self.client_dir / path, self.client_dir / pak, **lookup)
+        archive.idx_signature = (stat.st_size, stat.st_mtime_ns)
+        self._archives[archive_id] = archive, keys
+        return archive
+
+    def locate(self, name):
+        """
+        The open archive and live IDX record a name resolves to.
+
+        Raises:
+            KeyError: no archive holds the name
+            LookupError: the archive's IDX no longer has the entry at its indexed position (run update)
+        """
+        found = self._resolve(name)
+        if found is None:
+            raise KeyError(f"{name}: not in any archive of {self.client_dir}")
+        archive_id, indexed = found
+        archive = self.archive(archive_id)
+        if indexed.index < len(archive.entries):
+            entry = archive.entries[indexed.index]
+            if name_key(entry.name) == name_key(indexed.name):
+                return archive, entry
+        raise LookupError(f"{indexed.name}: {archive.idx_path} changed since the last update (run update)")
+
+    def read(self, name):
+        """Plaintext of the entry a name resolves to."""
+        archive, entry = self.locate(name)
+        return archive.read(entry)
+
+    def open(self, name):
+        """Binary file object streaming the plaintext of the entry a name resolves to."""
+        archive, entry = self.locate(name)
+        return archive.open(entry)
+
+    def pairs(self):
+        """[(IDX path relative to the client, IDX path, PAK path, keystore path or None)], highest precedence first."""
+        client_dir = self.client_dir
+        return [(path, client_dir / path, client_dir / pak, keystore) for path, pak, keystore
+                in self.db.execute("SELECT path, pak, keystore FROM archives ORDER BY rank, path")]
+
+    def find(self, pattern, limit=None):
+        """[(name, IDX path)] of resolved names matching a glob over '\\' separated names, any case."""
+        rows = self.db.execute(
+            "SELECT r.name, a.path FROM resolved AS r JOIN archives AS a ON a.id = r.archive "
+            "WHERE r.key GLOB ? ORDER BY r.key LIMIT ?", (name_key(pattern), -1 if limit is None else limit))
+        return rows.fetchall()
+
+    def conflicts(self, limit=None):
+        """[(name, [IDX paths holding it, winner first])] for names held by more than one archive."""
+        rows = self.db.execute(
+            "SELECT m.key, m.name, a.path FROM members AS m JOIN archives AS a ON a.id = m.archive "
+            "WHERE m.key IN (SELECT key FROM members GROUP BY key HAVING COUNT(DISTINCT archive) > 1 "
+            "ORDER BY key LIMIT ?) ORDER BY m.key, a.rank, a.path", (-1 if limit is None else limit,))
+        found = {}
+        for key, name, path in rows:
+            holders = found.setdefault(key, (name, []))[1]
+            if path not in holders:
+                holders.append(path)
+        return list(found.values())
+
+    def stats(self):
+        archives = self.db.execute(
+            "SELECT a.path, a.rank, a.entries, a.keystore, "
+            "(SELECT COUNT(*) FROM resolved AS r WHERE r.archive = a.id) "
+            "FROM archives AS a ORDER BY a.rank, a.path").fetchall()
+        names = self.db.execute("SELECT COUNT(*) FROM resolved").fetchone()[0]
+        return {'archives': archives, 'names': names}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Global entry index over every IDX/PAK pair of a client install")
+    parser.add_argument('index', help="SQLite index file (created if missing)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    update = commands.add_parser('update', help="Discover archives and merge their entry tables")
+    update.add_argument('client', help="Client install directory")
+    update.add_argument('--precedence', nargs='*',
+                        help="Archive path patterns, highest precedence first (e.g. 'patch/*.idx' ui.idx); "
+                             "default: those of the previous update")
+    update.add_argument('--keystore', nargs='*', default=[], metavar='STEM=PATH',
+                        help="Keystore per archive (default: <idx stem>.l1rk next to the IDX)")
+
+    find = commands.add_parser('find', help="List names matching a pattern and the archive serving each")
+    find.add_argument('pattern', help="Glob over entry names, e.g. 'chat\\*.xml' or 'Chat/*'")
+    find.add_argument('--limit', type=int, default=50)
+
+    cat = commands.add_parser('cat', help="Write the plaintext of an entry")
+    cat.add_argument('name', help="Entry name ('/' or '\\' separated, any case)")
+    cat.add_argument('--output', help="Output file (default: stdout)")
+
+    conflicts = commands.add_parser('conflicts', help="Names held by several archives, winner first")
+    conflicts.add_argument('--limit', type=int, default=50)
+    commands.add_parser('stats', help="Show indexed archives and resolved names")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    with ClientIndex(args.index) as index:
+        if args.command == 'update':
+            if not Path(args.client).is_dir():
+                print(f"[!] File not found: {args.client}")
+                sys.exit(1)
+            keystores = dict(item.split('=', 1) for item in args.keystore)
+            stats = index.update(args.client, args.precedence, keystores)
+            for reason in stats['skipped']:
+                print(f"[!] Skipped {reason}")
+            print(f"[+] {stats['archives']} archives ({stats['read']} read, {stats['unchanged']} unchanged, "
+                  f"{stats['removed']} removed): {stats['entries']} entries, {stats['names']} names, "
+                  f"{stats['conflicts']} held by several archives")
+        elif args.command == 'find':
+            hits = index.find(args.pattern, args.limit)
+            for name, path in hits:
+                print(f"{path:24s} {name}")
+            print(f"[*] {len(hits)} names")
+        elif args.command == 'cat':
+            try:
+                data = index.read(args.name)
+            except LookupError as exc:
+                print(f"[!] {exc.args[0]}")
+                sys.exit(1)
+            if args.output:
+                Path(args.output).write_bytes(data)
+                print(f"[+] {len(data)} bytes written to {args.output}")
+            else:
+                sys.stdout.buffer.write(data)
+                sys.exit(0)
+        elif args.command == 'conflicts':
+            for name, paths in index.conflicts(args.limit):
+                print(f"{name}: {' > '.join(paths)}")
+        else:
+            stats = index.stats()
+            for path, rank, entries, keystore, served in stats['archives']:
+                print(f"{path:24s} rank {rank:2d} {entries:8d} entries {served:8d} served  "
+                      f"{'keystore ' + Path(keystore).name if keystore else 'crib keys only'}")
+            print(f"Names: {stats['names']}")
+
+    print(f"[*] Completed in {time.perf_counter() - started:.2f}s")
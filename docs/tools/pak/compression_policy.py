@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Per-entry ZLIB compression policy engine for PAK repacking.
+
+ui.pak mixes uncompressed flag=0 entries (2k_ChatUI.xml, 4803 bytes) with
+ZLIB flag=2 entries and nothing records why. This tool trial-compresses every
+plaintext entry of an extracted tree at several ZLIB levels in a process pool,
+measures compression ratio against inflate time, and writes a per-entry policy
+(store, or compress at level N) for the repacker together with a comparison of
+whole-archive strategies.
+
+Usage:
+  python compression_policy.py <extracted_dir> [--idx ui.idx] [--levels 1,6,9]
+                               [--objective size|load] [--output policy.json] [--profile profile.json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from instrument import DISABLED, add_profile_arguments, finish_profile, profiler_from_args
+from pak_format import FLAG_STORED, FLAG_ZLIB, archive_name, read_idx
+
+DEFAULT_LEVELS = (1, 3, 6, 9)
+DEFAULT_READ_MBPS = 200.0
+INFLATE_REPEATS = 5
+
+
+def benchmark_entry(job):
+    """
+    Trial-compress one file at every level.
+
+    Args:
+        job: (name, path, levels) tuple
+
+    Returns:
+        dict with the plain size and, per level, compressed size, compress
+        time and best-of-N inflate time in seconds
+    """
+    name, path, levels = job
+    data = Path(path).read_bytes()
+
+    trials = {}
+    for level in levels:
+        start = time.perf_counter()
+        packed = zlib.compress(data, level)
+        compress_s = time.perf_counter() - start
+
+        inflate_s = float('inf')
+        for _ in range(INFLATE_REPEATS):
+            start = time.perf_counter()
+            zlib.decompress(packed)
+            inflate_s = min(inflate_s, time.perf_counter() - start)
+
+        trials[level] = {
+            'compressed': len(packed),
+            'compress_s': compress_s,
+            'inflate_s': inflate_s,
+        }
+
+    return {'name': name, 'size': len(data), 'trials': trials}
+
+
+def load_cost(stored_bytes, inflate_s, read_bps):
+    """Estimated client load time: read the stored bytes, then inflate them."""
+    return stored_bytes / read_bps + inflate_s
+
+
+def choose(result, objective, read_bps):
+    """
+    Pick the policy for one entry.
+
+    Returns:
+        (level, stored_bytes, inflate_s) with level None meaning store
+    """
+    best = (None, result['size'], 0.0)
+    for level, trial in result['trials'].items():
+        candidate = (level, trial['compressed'], trial['inflate_s'])
+        if objective == 'size':
+            better = (candidate[1], candidate[2]) < (best[1], best[2])
+        else:
+            better = load_cost(candidate[1], candidate[2], read_bps) < load_cost(best[1], best[2], read_bps)
+        if better:
+            best = candidate
+    return best
+
+
+def summarize(results, levels, read_bps, current=None):
+    """
+    Total archive bytes and estimated load seconds for each whole-archive strategy.
+
+    Args:
+        results: benchmark_entry() outputs
+        levels: ZLIB levels that were trialled
+        read_bps: assumed storage read throughput in bytes/second
+        current: optional {name: IdxEntry} from the shipped IDX
+    """
+    strategies = {}
+
+    def add(label, picks):
+        total_bytes = sum(stored for stored, _ in picks)
+        total_load = sum(load_cost(stored, inflate, read_bps) for stored, inflate in picks)
+        strategies[label] = {'archive_bytes': total_bytes, 'load_seconds': round(total_load, 6)}
+
+    add('store-all', [(r['size'], 0.0) for r in results])
+    for level in levels:
+        add(f'zlib-{level}', [(r['trials'][level]['compressed'], r['trials'][level]['inflate_s'])
+                              for r in results])
+    for objective in ('size', 'load'):
+        add(f'per-entry-{objective}', [choose(r, objective, read_bps)[1:] for r in results])
+
+    if current:
+        # Shipped flag=2 entries are timed with the trialled level nearest the zlib default (6)
+        reference = min(levels, key=lambda level: abs(level - 6))
+        picks = []
+        for r in results:
+            entry = current.get(r['name'])
+            if entry is None or entry.flag != FLAG_ZLIB:
+                picks.append((r['size'] if entry is None else entry.stored_size, 0.0))
+            else:
+                picks.append((entry.stored_size, r['trials'][reference]['inflate_s']))
+        add('current', picks)
+
+    return strategies
+
+
+def collect_jobs(source_dir, levels):
+    source = Path(source_dir)
+    jobs = []
+    for path in sorted(source.rglob('*')):
+        if path.is_file():
+            jobs.append((archive_name(path.relative_to(source)), str(path), levels))
+    return jobs
+
+
+def build_policy(source_dir, levels=DEFAULT_LEVELS, objective='size', read_mbps=DEFAULT_READ_MBPS,
+                 idx_path=None, workers=None, profiler=DISABLED):
+    """
+    Benchmark an extracted tree and build the repacker policy.
+
+    Returns:
+        JSON-serialisable dict with per-entry decisions and strategy totals
+    """
+    read_bps = read_mbps * 1024 * 1024
+    with profiler.stage('scan') as stage:
+        jobs = collect_jobs(source_dir, tuple(levels))
+        stage.add(entries=len(jobs))
+
+    with profiler.stage('benchmark', entries=len(jobs)) as stage, ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(benchmark_entry, jobs, chunksize=max(1, len(jobs) // ((os.cpu_count() or 1) * 8))))
+        stage.add(bytes=sum(r['size'] for r in results))
+
+    current = None
+    if idx_path:
+        with profiler.stage('read_idx') as stage:
+            _, entries = read_idx(idx_path)
+            stage.add(entries=len(entries))
+        current = {entry.name: entry for entry in entries}
+
+    policy_entries = []
+    for r in results:
+        level, stored, inflate_s = choose(r, objective, read_bps)
+        row = {
+            'name': r['name'],
+            'size': r['size'],
+            'action': 'store' if level is None else 'compress',
+            'flag': FLAG_STORED if level is None else FLAG_ZLIB,
+            'level': level,
+            'stored_size': stored,
+            'inflate_us': round(inflate_s * 1e6, 1),
+        }
+        if current is not None and r['name'] in current:
+            row['current_flag'] = current[r['name']].flag
+            row['current_stored_size'] = current[r['name']].stored_size
+        policy_entries.append(row)
+
+    with profiler.stage('summarize', entries=len(results)):
+        strategies = summarize(results, levels, read_bps, current)
+    return {
+        'source': str(source_dir),
+        'levels': list(levels),
+        'objective': objective,
+        'read_mbps': read_mbps,
+        'entries': policy_entries,
+        'strategies': strategies,
+        'smallest_archive': min(strategies, key=lambda s: strategies[s]['archive_bytes']),
+        'fastest_load': min(strategies, key=lambda s: strategies[s]['load_seconds']),
+    }
+
+
+def print_summary(policy):
+    entries = policy['entries']
+    compressed = [e for e in entries if e['action'] == 'compress']
+
+    print("=" * 80)
+    print("COMPRESSION POLICY")
+    print("=" * 80)
+    print(f"Entries: {len(entries)}  (compress {len(compressed)}, store {len(entries) - len(compressed)})")
+    print(f"Objective: {policy['objective']}  |  Assumed read speed: {policy['read_mbps']} MB/s")
+    print()
+    print(f"{'Strategy':20s} {'Archive bytes':>15s} {'Est. load (s)':>15s}")
+    print("-" * 52)
+    for label, totals in policy['strategies'].items():
+        print(f"{label:20s} {totals['archive_bytes']:15,d} {totals['load_seconds']:15.4f}")
+    print()
+    print(f"Smallest archive: {policy['smallest_archive']}")
+    print(f"Fastest load:     {policy['fastest_load']}")
+
+
+def parse_levels(text):
+    levels = tuple(sorted({int(part) for part in text.split(',') if part.strip()}))
+    if not levels or any(not 1 <= level <= 9 for level in levels):
+        raise argparse.ArgumentTypeError("levels must be ZLIB levels 1-9")
+    return levels
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark ZLIB levels per entry and emit a repack policy")
+    parser.add_argument('source', help="Extracted (plaintext) tree, e.g. extracted_data\\ui")
+    parser.add_argument('--idx', help="Shipped .idx to compare the current flags against")
+    parser.add_argument('--levels', type=parse_levels, default=DEFAULT_LEVELS, help="Comma-separated ZLIB levels")
+    parser.add_argument('--objective', choices=('size', 'load'), default='size',
+                        help="Minimise archive size or estimated client load time")
+    parser.add_argument('--read-mbps', type=float, default=DEFAULT_READ_MBPS,
+                        help="Storage read throughput used by the load-time model")
+    parser.add_argument('--workers', type=int, help="Process pool size (default: CPU count)")
+    parser.add_argument('--output', default='compression_policy.json', help="Policy JSON path")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    if not Path(args.source).is_dir():
+        print(f"[!] Directory not found: {args.source}")
+        sys.exit(1)
+
+    profiler = profiler_from_args(args)
+    started = time.perf_counter()
+    policy = build_policy(args.source, args.levels, args.objective, args.read_mbps, args.idx, args.workers,
+                          profiler)
+    Path(args.output).write_text(json.dumps(policy, indent=2), encoding='utf-8')
+
+    print_summary(policy)
+    print(f"\n[+] Policy written to {args.output} in {time.perf_counter() - started:.2f}s")
+    finish_profile(profiler, args)
@@ -0,0 +1,506 @@
+#!/usr/bin/env python3
+"""
+Dictionary crib-dragging over every entry of an archive.
+
+The XML prolog is the only crib the other tools use, so no key byte past
+position 38 is ever learned. This tool slides a dictionary of fragments known
+to occur in the UI files (XML element and attribute names, `encoding=`, Cocos
+node type strings found in CSB files) over the ciphertext of every entry.
+
+For a key period P, a fragment placed at offset p implies key bytes at
+columns (p + i) % P. Such a hypothesis is tested on every other row of the
+ciphertext that uses the same key columns: if the implied key bytes decrypt
+those rows to bytes that score close to a reference byte distribution (UI
+XML text, or FlatBuffers-like bytes for CSB), the hypothesis is accepted.
+All offsets of a fragment are tested at once with NumPy (a cheap pass over a
+few rows, then a full pass over the survivors).
+Accepted hypotheses vote for key bytes per column; the votes are merged into
+one key per entry with a per-byte confidence, seeded by the XML prolog where
+it applies and re-filtered against the merged key so that hypotheses which
+contradict the consensus drop out.
+
+Only flag=0 entries are dragged: for flag=2 entries the key covers the
+deflate stream, where plaintext fragments do not appear verbatim.
+
+A key counts as fully recovered only after the entry decrypts (and inflates)
+with it to a valid file: XML must start with the whole XML prolog (which
+alone covers a 38-byte key, also on a snapshot) and parse; CSB must pass the
+header check of verify_archive.py and decrypt to at least one zero byte in
+every key column (FlatBuffers padding, string terminators and the high bytes
+of small little-endian integers leave zeros everywhere; a wrong key byte
+turns all of its column's zeros into that byte). Only checked keys are
+written to --keystore; rejected ones are listed.
+
+With --snapshot the fragments are dragged over the snapshot's head bytes
+(--scan is capped at the snapshot width) and keys are checked on the head and
+tail bytes it holds: the XML prolog or CSB header and the zero-byte columns,
+but no XML parse, since the document is incomplete.
+
+Requires numpy.
+
+Usage:
+  python crib_drag.py <ui.idx> [--period 38] [--dict fragments.txt]
+                      [--output crib_report.json] [--keystore dragged.l1rk] [--profile profile.json]
+  python crib_drag.py --snapshot ui_snapshot.npz [--period 38] ...
+"""
+
+import argparse
+import json
+import sys
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from instrument import DISABLED, add_profile_arguments, finish_profile, profiler_from_args
+from keystore import write_keystore
+from pak_format import FLAG_STORED, XML_PROLOG, PakArchive, decode_payload, read_idx
+from snapshot import Snapshot, add_snapshot_argument, snapshot_from_args
+from verify_archive import validate_format
+
+DEFAULT_PERIOD = len(XML_PROLOG)
+DEFAULT_SCAN_BYTES = 8192
+SAMPLE_ROWS = 32
+PREFILTER_ROWS = 4
+MIN_SUPPORT = 24
+MIN_CONFIDENCE = 0.6
+SEED_WEIGHT = 1000.0
+CHUNK = 4096
+
+XML_FRAGMENTS = [
+    b'<?xml version="1.0"', b' encoding="UTF-8"?>', b'encoding=',
+    b'<UIObject name="', b'</UIObject>', b'<Layer', b'</Layer>', b'<Node', b'</Node>',
+    b'<Button', b'<Sprite', b'<ImageView', b'<Text', b'<TextField', b'<ScrollView',
+    b'<ListView', b'<Panel', b'<Children>', b'</Children>',
+    b' name="', b' texture="', b' image="', b' position="', b' size="', b' width="', b' height="',
+    b' x="', b' y="', b' anchorPoint="', b' visible="', b' tag="', b' type="', b' text="',
+    b' fontName="', b' fontSize="', b' color="', b' opacity="', b' scaleX="', b' scaleY="',
+    b'="true"', b'="false"', b'.png"', b'"/>\r\n', b'"/>\n', b'">\r\n',
+]
+
+# Node type and resource strings embedded in Cocos Studio binaries
+CSB_FRAGMENTS = [
+    b'NodeObjectData', b'SpriteObjectData', b'ImageViewObjectData', b'ButtonObjectData',
+    b'TextObjectData', b'TextBMFontObjectData', b'LoadingBarObjectData', b'ScrollViewObjectData',
+    b'ListViewObjectData', b'PanelObjectData', b'ProjectNodeObjectData', b'LayerObjectData',
+    b'Default/', b'.png', b'.plist', b'.fnt', b'.ttf', b'.csb',
+]
+
+
+# Representative Cocos UI layout, used as the default XML byte distribution
+XML_REFERENCE = b"""<?xml version="1.0" encoding="UTF-8"?>
+<UIObject name="ChatUI" type="Layer" width="1280" height="720">
+  <UIObject name="bg" type="ImageView" image="ui/chat/bg_chat.png" x="0" y="0" width="420" height="210" visible="true"/>
+  <UIObject name="btn_close" type="Button" normal="ui/common/btn_close_n.png" pressed="ui/common/btn_close_p.png" x="396" y="4"/>
+  <UIObject name="txt_title" type="Text" text="Chat" fontName="fonts/NanumGothic.ttf" fontSize="14" color="255,255,255"/>
+  <UIObject name="list" type="ListView" x="8" y="32" width="404" height="150" direction="vertical" bounce="false">
+    <UIObject name="item" type="Panel" anchorPoint="0,0" scaleX="1.0" scaleY="1.0" opacity="255" tag="1001"/>
+  </UIObject>
+</UIObject>
+"""
+
+# FlatBuffers (CSB) byte shares: zero padding, small offsets/lengths, inline
+# strings, little-endian high bytes
+CSB_REFERENCE_SHARES = [
+    (range(0x00, 0x01), 0.30),
+    (range(0x01, 0x10), 0.15),
+    (range(0x10, 0x20), 0.03),
+    (range(0x20, 0x7F), 0.35),
+    (range(0x7F, 0xFF), 0.12),
+    (range(0xFF, 0x100), 0.05),
+]
+SMOOTHING = 0.05
+# Accept a hypothesis when its decrypted rows score within this many bits
+# per byte of the reference entropy
+DEFAULT_MARGIN = 0.5
+
+
+def byte_profile(counts):
+    """
+    Log2 probability table for a byte distribution.
+
+    Args:
+        counts: 256 byte counts or weights (additively smoothed)
+
+    Returns:
+        (float32 log2-probability table, entropy in bits per byte)
+    """
+    counts = np.asarray(counts, dtype=np.float64) + SMOOTHING
+    p = counts / counts.sum()
+    return np.log2(p).astype(np.float32), float(-(p * np.log2(p)).sum())
+
+
+def text_profile(corpus=None):
+    """Byte profile of UI XML: the built-in reference or every .xml file under a directory."""
+    counts = np.bincount(np.frombuffer(XML_REFERENCE, dtype=np.uint8), minlength=256)
+    if corpus:
+        for path in Path(corpus).rglob('*.xml'):
+            counts = counts + np.bincount(np.frombuffer(path.read_bytes(), dtype=np.uint8), minlength=256)
+    return byte_profile(counts)
+
+
+def binary_profile(corpus=None):
+    """Byte profile of CSB files: the built-in FlatBuffers shares or every .csb file under a directory."""
+    counts = np.zeros(256, dtype=np.float64)
+    if corpus:
+        for path in Path(corpus).rglob('*.csb'):
+            counts += np.bincount(np.frombuffer(path.read_bytes(), dtype=np.uint8), minlength=256)
+    if not counts.any():
+        for byte_range, share in CSB_REFERENCE_SHARES:
+            counts[list(byte_range)] = share / len(byte_range) * 10000
+    return byte_profile(counts)
+
+
+_pak = None
+_snapshot = None
+_profiles = None
+
+
+def load_fragments(path):
+    """One fragment per line; Python backslash escapes (\\x00, \\n) are decoded."""
+    fragments = []
+    for line in Path(path).read_text(encoding='utf-8').splitlines():
+        if line and not line.startswith('#'):
+            fragments.append(line.encode('utf-8').decode('unicode_escape').encode('latin-1'))
+    return fragments
+
+
+def _open_worker(pak_path, profiles, snapshot_path=None):
+    """Process pool initializer: each worker maps the PAK (or snapshot) once and keeps the byte profiles."""
+    global _pak, _snapshot, _profiles
+    if snapshot_path:
+        _snapshot = Snapshot(snapshot_path)
+    else:
+        _pak = np.memmap(pak_path, dtype=np.uint8, mode='r') if Path(pak_path).stat().st_size else np.zeros(0, np.uint8)
+    _profiles = profiles
+
+
+def score_hypotheses(grid, grid_valid, rows, period, positions, columns, candidates, profile):
+    """
+    Mean log2 probability of the bytes each hypothesis decrypts on the given rows.
+
+    Args:
+        grid: ciphertext reshaped to (row count, period)
+        grid_valid: mask of real (non-padding) bytes in grid
+        rows: sample row numbers to decrypt
+        positions: (n,) fragment offsets
+        columns: (n, m) key columns of each hypothesis
+        candidates: (n, m) implied key bytes
+        profile: log2-probability table from byte_profile()
+
+    Returns:
+        (score per hypothesis, number of bytes checked per hypothesis)
+    """
+    width = columns.shape[1]
+    scores = np.zeros(len(positions), dtype=np.float32)
+    support = np.zeros(len(positions), dtype=np.int64)
+    for start in range(0, len(positions), CHUNK):
+        part = slice(start, start + CHUNK)
+        cols = columns[part]
+        block = grid[rows][:, cols]
+        valid = grid_valid[rows][:, cols]
+        # The fragment's own bytes would trivially pass, so they are not evidence
+        absolute = rows[:, None, None] * period + cols[None]
+        valid &= absolute != (positions[part, None] + np.arange(width))[None]
+        logp = np.where(valid, profile[block ^ candidates[part][None]], 0.0)
+        support[part] = valid.sum(axis=(0, 2))
+        scores[part] = logp.sum(axis=(0, 2)) / np.maximum(support[part], 1)
+    return scores, support
+
+
+def drag_fragment(cipher, grid, grid_valid, sample, period, fragment, profile, threshold):
+    """
+    All accepted placements of one fragment.
+
+    Returns:
+        (columns (n, m), implied key bytes (n, m), vote weights (n,)) or None;
+        a placement's weight grows with how far its score clears the threshold
+    """
+    needle = np.frombuffer(fragment, dtype=np.uint8)
+    width = len(needle)
+    if width > period or width > len(cipher):
+        return None
+
+    positions = np.arange(len(cipher) - width + 1, dtype=np.int64)
+    candidates = sliding_window_view(cipher, width) ^ needle
+    columns = (positions[:, None] + np.arange(width)) % period
+
+    # Cheap pass over a few rows, then every sampled row for the survivors
+    quick_rows = sample[np.unique(np.linspace(0, len(sample) - 1, PREFILTER_ROWS).astype(np.int64))]
+    scores, support = score_hypotheses(grid, grid_valid, quick_rows, period, positions, columns, candidates, profile)
+    keep = (scores >= threshold) & (support > 0)
+    if not keep.any():
+        return None
+    positions, columns, candidates = positions[keep], columns[keep], candidates[keep]
+
+    scores, support = score_hypotheses(grid, grid_valid, sample, period, positions, columns, candidates, profile)
+    keep = (scores >= threshold) & (support >= MIN_SUPPORT)
+    if not keep.any():
+        return None
+    return columns[keep], candidates[keep], 1.0 + scores[keep] - threshold
+
+
+def merge_votes(period, hypotheses, seed=None, known=None):
+    """
+    Merge hypotheses into one key.
+
+    Hypotheses that disagree with a byte of `known` (a (key, mask) pair) are
+    dropped before voting.
+
+    Returns:
+        (key bytes, confidence per column, votes cast per column, accepted hypothesis count)
+    """
+    votes = np.zeros((period, 256), dtype=np.float64)
+    if seed is not None:
+        seed_columns, seed_bytes = seed
+        np.add.at(votes, (seed_columns, seed_bytes), SEED_WEIGHT)
+
+    accepted = 0
+    for columns, candidates, weights in hypotheses:
+        if known is not None:
+            key, mask = known
+            agree = (candidates == key[columns]) | ~mask[columns]
+            consistent = agree.all(axis=1)
+            columns, candidates, weights = columns[consistent], candidates[consistent], weights[consistent]
+        if not len(weights):
+            continue
+        accepted += len(weights)
+        np.add.at(votes, (columns.ravel(), candidates.ravel()), np.repeat(weights.astype(np.float64), columns.shape[1]))
+
+    totals = votes.sum(axis=1)
+    key = votes.argmax(axis=1).astype(np.uint8)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        confidence = np.where(totals > 0, votes.max(axis=1) / totals, 0.0)
+    return key, confidence, totals, accepted
+
+
+def drag_entry(job):
+    """Crib-drag one entry; runs inside a pool worker."""
+    index, name, offset, length, period, scan, fragments, passes, margin = job
+    if _snapshot is not None:
+        # Snapshot rows are IDX indices; the head is the contiguous prefix
+        cipher = np.array(_snapshot.head[index, :min(int(_snapshot.head_len[index]), scan)], dtype=np.uint8)
+    else:
+        end = min(offset + length, len(_pak))
+        cipher = np.array(_pak[offset:min(end, offset + scan)], dtype=np.uint8)
+    result = {'index': index, 'name': name, 'period': period, 'scanned': len(cipher)}
+
+    is_xml = name.lower().endswith('.xml')
+    profile_name = 'binary' if name.lower().endswith('.csb') else 'text'
+    profile, entropy = _profiles[profile_name]
+    threshold = -(entropy + margin)
+
+    row_count = max(-(-len(cipher) // period), 1)
+    padded = np.zeros(row_count * period, dtype=np.uint8)
+    padded[:len(cipher)] = cipher
+    grid = padded.reshape(row_count, period)
+    grid_valid = (np.arange(row_count * period) < len(cipher)).reshape(row_count, period)
+    sample = np.unique(np.linspace(0, row_count - 1, min(SAMPLE_ROWS, row_count)).astype(np.int64))
+
+    seed = None
+    if is_xml and len(cipher) >= len(XML_PROLOG):
+        prolog = np.frombuffer(XML_PROLOG, dtype=np.uint8)
+        seed = (np.arange(len(prolog)) % period, cipher[:len(prolog)] ^ prolog)
+
+    hypotheses = []
+    hits = {}
+    for fragment in fragments:
+        found = drag_fragment(cipher, grid, grid_valid, sample, period, fragment, profile, threshold)
+        if found is not None:
+            hypotheses.append(found)
+            hits[fragment.decode('latin-1')] = len(found[2])
+
+    known = None
+    if seed is not None:
+        seed_key = np.zeros(period, dtype=np.uint8)
+        seed_mask = np.zeros(period, dtype=bool)
+        seed_key[seed[0]] = seed[1]
+        seed_mask[seed[0]] = True
+        known = (seed_key, seed_mask)
+
+    key, confidence, totals, accepted = merge_votes(period, hypotheses, seed, known)
+    for _ in range(passes - 1):
+        mask = (totals > 0) & (confidence >= MIN_CONFIDENCE)
+        key, confidence, totals, accepted = merge_votes(period, hypotheses, seed, (key, mask))
+
+    recovered = (totals > 0) & (confidence >= MIN_CONFIDENCE)
+    result.update(
+        profile=profile_name,
+        seeded=seed is not None,
+        hypotheses=accepted,
+        recovered=int(recovered.sum()),
+        coverage=round(float(recovered.mean()), 4),
+        key=''.join(f'{b:02x}' if ok else '??' for b, ok in zip(key.tolist(), recovered.tolist())),
+        confidence=[round(float(c), 3) if ok else None for c, ok in zip(confidence, recovered)],
+        fragments=dict(sorted(hits.items(), key=lambda item: -item[1])[:10]),
+    )
+    return result
+
+
+def check_key(name, stored, key, flag, known=None):
+    """
+    Decrypt (and inflate) an entry with a recovered key and check the result is a valid file.
+
+    Args:
+        known: For a partially known flag=0 payload (a snapshot), boolean mask
+            of the stored bytes that are real; XML is then not parsed and only
+            real bytes count for the zero-byte columns
+
+    Returns:
+        problem string, or None when the key checks out
+    """
+    try:
+        plain = decode_payload(stored, key, flag)
+    except zlib.error as e:
+        return f'inflate failed: {e}'
+    kind, problem = validate_format(name, plain, parse_xml=known is None)
+    if problem:
+        return problem
+    if kind == 'xml' and not plain.startswith(XML_PROLOG):
+        return 'XML prolog differs from the known plaintext'
+    if kind.startswith('csb') and flag == FLAG_STORED:
+        # Plaintext byte i was decrypted with key column i % period
+        zeros = np.frombuffer(plain, dtype=np.uint8) == 0
+        if known is not None:
+            zeros &= known
+        seen = np.zeros(len(key), dtype=bool)
+        seen[np.flatnonzero(zeros) % len(key)] = True
+        if not seen.all():
+            return f'no zero byte in key column(s) {np.flatnonzero(~seen).tolist()}'
+    return None
+
+
+def snapshot_payload(snapshot, row):
+    """
+    An entry's stored payload as far as a snapshot holds it.
+
+    Returns:
+        (bytes of the full stored size, zero where unknown; boolean mask of known bytes)
+    """
+    positions, data = snapshot.known_bytes(row)
+    stored = np.zeros(snapshot.stored_size(row), dtype=np.uint8)
+    known = np.zeros(len(stored), dtype=bool)
+    stored[positions] = data
+    known[positions] = True
+    return stored.tobytes(), known
+
+
+def drag_archive(idx_path, pak_path=None, period=DEFAULT_PERIOD, fragments=None, scan=DEFAULT_SCAN_BYTES,
+                 passes=2, margin=DEFAULT_MARGIN, corpus=None, workers=None, profiler=DISABLED, snapshot=None):
+    """
+    Crib-drag every uncompressed entry of an archive, or of a Snapshot
+    (idx_path and pak_path are then ignored).
+
+    Returns:
+        list of per-entry result dicts in IDX order
+    """
+    with profiler.stage('read_idx') as stage:
+        if snapshot is not None:
+            entries = snapshot.entries()
+            pak_path, snapshot_path = None, str(snapshot.path)
+        else:
+            _, entries = read_idx(idx_path)
+            pak_path, snapshot_path = str(pak_path or Path(idx_path).with_suffix('.pak')), None
+        stage.add(entries=len(entries))
+    fragments = [f for f in (fragments or XML_FRAGMENTS + CSB_FRAGMENTS) if 0 < len(f) <= period]
+
+    with profiler.stage('profiles'):
+        profiles = {'text': text_profile(corpus), 'binary': binary_profile(corpus)}
+
+    jobs = [(entry.index, entry.name, entry.offset, entry.stored_size, period, scan, fragments, passes, margin)
+            for entry in entries if entry.flag == FLAG_STORED and entry.stored_size]
+    limit = min(scan, snapshot.width) if snapshot is not None else scan
+    with profiler.stage('drag', bytes=sum(min(job[3], limit) for job in jobs), entries=len(jobs)), \
+            ProcessPoolExecutor(max_workers=workers, initializer=_open_worker,
+                                initargs=(pak_path, profiles, snapshot_path)) as pool:
+        return list(pool.map(drag_entry, jobs, chunksize=16))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recover key bytes by dragging known fragments over every entry")
+    parser.add_argument('idx', nargs='?', help="Path to the .idx file")
+    add_snapshot_argument(parser)
+    parser.add_argument('--pak', help="Path to the .pak file (default: next to the .idx)")
+    parser.add_argument('--period', type=int, default=DEFAULT_PERIOD, help="Key period to solve for")
+    parser.add_argument('--dict', help="Extra fragments, one per line (replaces the built-in dictionary)")
+    parser.add_argument('--scan', type=int, default=DEFAULT_SCAN_BYTES, help="Leading bytes dragged per entry")
+    parser.add_argument('--passes', type=int, default=2, help="Merge passes (later passes drop contradicting cribs)")
+    parser.add_argument('--margin', type=float, default=DEFAULT_MARGIN,
+                        help="Accept cribs scoring within this many bits/byte of the reference entropy")
+    parser.add_argument('--corpus', help="Directory of extracted .xml/.csb files for the reference byte profiles")
+    parser.add_argument('--workers', type=int, help="Process pool size (default: CPU count)")
+    parser.add_argument('--output', default='crib_report.json', help="JSON report path")
+    parser.add_argument('--keystore', help="Write fully recovered keys that pass the format check to this .l1rk")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    snapshot = snapshot_from_args(parser, args)
+    if args.period < 1:
+        print("[!] --period must be positive")
+        sys.exit(1)
+
+    fragments = load_fragments(args.dict) if args.dict else None
+    profiler = profiler_from_args(args)
+    started = time.perf_counter()
+    results = drag_archive(args.idx, args.pak, args.period, fragments, args.scan, args.passes, args.margin,
+                           args.corpus, args.workers, profiler, snapshot)
+    elapsed = time.perf_counter() - started
+
+    complete = [r for r in results if r['recovered'] == args.period]
+    rejected = []
+    with profiler.stage('check_keys', entries=len(complete)):
+        if snapshot is not None:
+            for result in complete:
+                stored, known = snapshot_payload(snapshot, result['index'])
+                result['key_check'] = check_key(result['name'], stored, bytes.fromhex(result['key']), FLAG_STORED,
+                                                known) or 'ok'
+                if result['key_check'] != 'ok':
+                    rejected.append(result)
+        else:
+            with PakArchive(args.idx, args.pak) as archive:
+                for result in complete:
+                    entry = archive.entries[result['index']]
+                    result['key_check'] = check_key(entry.name, archive.raw(entry), bytes.fromhex(result['key']),
+                                                    entry.flag) or 'ok'
+                    if result['key_check'] != 'ok':
+                        rejected.append(result)
+    complete = [r for r in complete if r['key_check'] == 'ok']
+    extended = [r for r in results if r['recovered'] > min(len(XML_PROLOG), args.period) or
+                (not r['seeded'] and r['recovered'])]
+
+    print("=" * 80)
+    print("CRIB DRAGGING")
+    print("=" * 80)
+    print(f"Entries dragged: {len(results)} (flag=0)  period {args.period}  in {elapsed:.2f}s")
+    if snapshot is not None:
+        print(f"Source: snapshot {args.snapshot} (up to {min(args.scan, snapshot.width)} head bytes dragged, "
+              f"keys checked on the head/tail bytes only)")
+    print(f"Fully keyed: {len(complete)} (decrypt to a valid file)"
+          f"{f', {len(rejected)} complete keys rejected' if rejected else ''}")
+    print(f"Key bytes beyond the XML prolog crib: {len(extended)} entries")
+    if results:
+        print(f"Mean coverage: {sum(r['coverage'] for r in results) / len(results):.1%}")
+    print()
+    for result in sorted(results, key=lambda r: -r['recovered'])[:15]:
+        print(f"  {result['recovered']:4d}/{args.period}  {result['name']}")
+    for result in rejected:
+        print(f"  [!] Rejected key for {result['name']}: {result['key_check']}")
+
+    Path(args.output).write_text(json.dumps({
+        'idx': snapshot.meta['idx'] if snapshot is not None else str(args.idx),
+        'snapshot': args.snapshot,
+        'period': args.period,
+        'seconds': round(elapsed, 3),
+        'results': results,
+    }, indent=1, ensure_ascii=False), encoding='utf-8')
+    print(f"\n[+] Report written to {args.output}")
+
+    if args.keystore:
+        records = [{'name': r['name'], 'index': r['index'], 'key': bytes.fromhex(r['key'])} for r in complete]
+        count = write_keystore(args.keystore, records, args.period, ['crib-drag'],
+                               f"crib_drag.py period {args.period} on {args.snapshot or args.idx}")
+        print(f"[+] Wrote {count} complete keys to {args.keystore}")
+    finish_profile(profiler, args)
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+Local asyncio server for decrypted, decompressed PAK entries.
+
+Opens the given IDX/PAK pairs once and serves plaintext entries over HTTP/1.1
+on localhost or on a Unix socket, so editor tooling and scripts read UI
+assets from memory instead of re-extracting them to temp directories:
+
+  GET /                        archives (JSON)
+  GET /<archive>/              entry names, sizes and flags of one archive (JSON)
+  GET /<archive>/<entry name>  plaintext; '/' or '\\' separate directories
+  GET /_stats                  cache and request counters (JSON)
+
+<archive> is the IDX file stem (ui for ui.idx). Entry names match
+case-insensitively when there is no exact match. With --client, the archive
+`client` serves every name of a client_index.py index from the archive that
+wins it, through that archive's live IDX. GET and HEAD are supported,
+with single byte ranges (Range: bytes=0-99, bytes=100-, bytes=-100 -> 206,
+unsatisfiable -> 416) and keep-alive connections.
+
+Decoded entries go into one shared LRU cache bounded by --cache-mb. Decoding
+runs in a thread pool (zlib releases the GIL), and concurrent requests for an
+entry that is not cached yet wait on the same decode instead of starting
+their own.
+
+Keys come from --keystore (one per archive, in order), else from a .l1rk next
+to the IDX, else from the XML prolog crib.
+
+Usage:
+  python entry_server.py ui.idx [more.idx ...] [--keystore keys.l1rk ...] [--port 8765] [--cache-mb 256]
+  python entry_server.py ui.idx --unix /tmp/pak.sock
+  python entry_server.py --client client.sqlite
+  curl http://127.0.0.1:8765/ui/Action/MainMenuUI.xml -H "Range: bytes=0-99"
+"""
+
+import argparse
+import asyncio
+import json
+import re
+import sys
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import unquote
+
+from client_index import ClientIndex
+from keystore import Keystore
+from pak_format import NoKeyError, PakArchive
+
+CLIENT = 'client'
+DEFAULT_PORT = 8765
+DEFAULT_CACHE_MB = 256
+MAX_HEADER_BYTES = 64 * 1024
+KEEP_ALIVE_SECONDS = 30
+RANGE = re.compile(r'bytes=(\d*)-(\d*)$')
+REASONS = {200: 'OK', 206: 'Partial Content', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           416: 'Range Not Satisfiable', 500: 'Internal Server Error'}
+
+
+class EntryCache:
+    """Byte-bounded LRU of decoded entries, keyed by (archive, entry name)."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._items = OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key):
+        data = self._items.get(key)
+        if data is not None:
+            self._items.move_to_end(key)
+        return data
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        old = self._items.pop(key, None)
+        if old is not None:
+            self.bytes -= len(old)
+        self._items[key] = data
+        self.bytes += len(data)
+        while self.bytes > self.max_bytes:
+            _, evicted = self._items.popitem(last=False)
+            self.bytes -= len(evicted)
+
+
+class EntryServer:
+    """
+    Archives, cache and in-flight decodes shared by every connection.
+
+    Args:
+        archives: [(idx path, keystore path or None), ...]
+        cache_bytes: Upper bound for cached plaintext
+        workers: Decode threads
+        client: ClientIndex served as the archive 'client', or None
+    """
+
+    def __init__(self, archives, cache_bytes=DEFAULT_CACHE_MB * 1024 * 1024, workers=4, client=None):
+        self.archives = {}
+        self._keystores = []
+        for idx_path, keystore_path in archives:
+            lookup = {}
+            if keystore_path:
+                keys = Keystore(keystore_path)
+                self._keystores.append(keys)
+                lookup = {'key_lookup': keys.lookup}
+            archive = PakArchive(idx_path, **lookup)
+            name = Path(idx_path).stem
+            if name in self.archives:
+                raise ValueError(f"Two archives named {name}")
+            archive.by_lower = {}
+            for entry in archive.entries:
+                archive.by_lower.setdefault(entry.name.lower(), entry)
+            self.archives[name] = archive
+        self.client = client
+        self._client_table = {}
+        if client is not None:
+            if CLIENT in self.archives:
+                raise ValueError(f"Two archives named {CLIENT}")
+            self._client_table = client.load()
+        self.cache = EntryCache(cache_bytes)
+        self._pending = {}
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='decode')
+        self.stats = {'requests': 0, 'hits': 0, 'misses': 0, 'coalesced': 0, 'errors': 0, 'bytes_sent': 0}
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        for archive in self.archives.values():
+            archive.close()
+        for keys in self._keystores:
+            keys.close()
+        if self.client is not None:
+            self.client.close()
+
+    def find(self, archive_name, entry_name):
+        """(archive, entry) for a request path; LookupError when the client index is stale for the name."""
+        if archive_name == CLIENT and self.client is not None:
+            try:
+                return self.client.locate(entry_name)
+            except KeyError:
+                return None, None
+        archive = self.archives.get(archive_name)
+        if archive is None:
+            return None, None
+        entry_name = entry_name.replace('/', '\\')
+        entry = archive.by_name.get(entry_name) or archive.by_lower.get(entry_name.lower())
+        return archive, entry
+
+    async def plaintext(self, archive_name, archive, entry):
+        """Decoded entry from the cache, an in-flight decode, or a new decode."""
+        # Client archives are reopened whenever their IDX changes (any patch, in place or not); keying
+        # on the IDX signature they were read at keeps plaintext from before a patch out of later hits
+        key = (archive_name, entry.name, getattr(archive, 'idx_signature', None))
+        data = self.cache.get(key)
+        if data is not None:
+            self.stats['hits'] += 1
+            return data
+        pending = self._pending.get(key)
+        if pending is not None:
+            self.stats['coalesced'] += 1
+            return await asyncio.shield(pending)
+
+        self.stats['misses'] += 1
+        future = asyncio.get_running_loop().run_in_executor(self._executor, archive.read, entry)
+        self._pending[key] = future
+        try:
+            data = await asyncio.shield(future)
+        finally:
+            del self._pending[key]
+        self.cache.put(key, data)
+        return data
+
+    def describe(self):
+        archives = {name: {'idx': str(archive.idx_path), 'pak': str(archive.pak_path), 'entries': len(archive)}
+                    for name, archive in self.archives.items()}
+        if self.client is not None:
+            archives[CLIENT] = {'index': str(self.client.path), 'client_dir': str(self.client.client_dir),
+                                'entries': len(self._client_table)}
+        return {'archives': archives}
+
+    def counters(self):
+        return dict(self.stats, cached_entries=len(self.cache), cached_bytes=self.cache.bytes,
+                    cache_limit=self.cache.max_bytes, in_flight=len(self._pending))
+
+    async def respond(self, method, target, headers):
+        """(status, extra headers, body) for one request."""
+        if method not in ('GET', 'HEAD'):
+            return 405, {'Allow': 'GET, HEAD'}, b''
+        path = unquote(target.split('?', 1)[0]).lstrip('/')
+        if not path:
+            return _json(self.describe())
+        if path == '_stats':
+            return _json(self.counters())
+
+        archive_name, _, entry_name = path.partition('/')
+        if not entry_name and archive_name == CLIENT and self.client is not None:
+            return _json([{'name': entry.name, 'size': entry.size, 'flag': entry.flag}
+                          for _, entry in self._client_table.values()])
+        if not entry_name:
+            archive = self.archives.get(archive_name)
+            if archive is None:
+                return 404, {}, b''
+            return _json([{'name': entry.name, 'size': entry.size, 'flag': entry.flag} for entry in archive.entries])
+
+        try:
+            archive, entry = self.find(archive_name, entry_name)
+        except LookupError as exc:
+            self.stats['errors'] += 1
+            return 404, {}, f"{exc.args[0]}\n".encode()
+        if entry is None:
+            return 404, {}, b''
+        try:
+            data = await self.plaintext(archive_name, archive, entry)
+        except NoKeyError as exc:
+            self.stats['errors'] += 1
+            return 404, {}, f"{exc}\n".encode()
+        except Exception as exc:  # corrupt payload, wrong key: report it, keep serving
+            self.stats['errors'] += 1
+            return 500, {}, f"{entry.name}: {exc}\n".encode()
+
+        extra = {'Accept-Ranges': 'bytes', 'Content-Type': _content_type(entry.name)}
+        spec = headers.get('range')
+        if spec is None:
+            return 200, extra, memoryview(data)
+        span = parse_range(spec, len(data))
+        if span is None:
+            return 416, {'Content-Range': f"bytes */{len(data)}"}, b''
+        start, end = span
+        extra['Content-Range'] = f"bytes {start}-{end - 1}/{len(data)}"
+        return 206, extra, memoryview(data)[start:end]
+
+    async def handle(self, reader, writer):
+        """Serve requests on one connection until it closes or idles out."""
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), KEEP_ALIVE_SECONDS)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    break
+                except asyncio.LimitOverrunError:
+                    await _send(writer, 400, {'Connection': 'close'}, b'', False)
+                    break
+
+                lines = head.decode('latin-1').split('\r\n')
+                parts = lines[0].split()
+                if len(parts) != 3:
+                    await _send(writer, 400, {'Connection': 'close'}, b'', False)
+                    break
+                method, target, version = parts
+                headers = {}
+                for line in lines[1:]:
+                    name, sep, value = line.partition(':')
+                    if sep:
+                        headers[name.strip().lower()] = value.strip()
+                keep_alive = (headers.get('connection', '').lower() != 'close' if version == 'HTTP/1.1'
+                              else headers.get('connection', '').lower() == 'keep-alive')
+
+                self.stats['requests'] += 1
+                status, extra, body = await self.respond(method, target, headers)
+                if not keep_alive:
+                    extra['Connection'] = 'close'
+                self.stats['bytes_sent'] += await _send(writer, status, extra, body, method == 'HEAD')
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+def parse_range(spec, size):
+    """(start, end) for a single 'bytes=' range, end exclusive; None if unsatisfiable or malformed."""
+    match = RANGE.match(spec.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first == '':
+        length = int(last)
+        return (max(size - length, 0), size) if length and size else None
+    start = int(first)
+    end = min(int(last) + 1, size) if last else size
+    return (start, end) if start < size and start < end else None
+
+
+def _content_type(name):
+    lower = name.lower()
+    if lower.endswith('.xml'):
+        return 'application/xml'
+    if lower.endswith('.png'):
+        return 'image/png'
+    return 'application/octet-stream'
+
+
+def _json(value):
+    return 200, {'Content-Type': 'application/json'}, json.dumps(value, ensure_ascii=False).encode('utf-8')
+
+
+async def _send(writer, status, headers, body, head_only):
+    lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}", f"Content-Length: {len(body)}"]
+    lines += [f"{name}: {value}" for name, value in headers.items()]
+    writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+    if not head_only and len(body):
+        writer.write(body)
+    await writer.drain()
+    return 0 if head_only else len(body)
+
+
+async def serve(server, host='127.0.0.1', port=DEFAULT_PORT, unix=None):
+    """Run until cancelled."""
+    if unix:
+        listener = await asyncio.start_unix_server(server.handle, path=unix, limit=MAX_HEADER_BYTES)
+        where = f"unix:{unix}"
+    else:
+        listener = await asyncio.start_server(server.handle, host, port, limit=MAX_HEADER_BYTES)
+        where = f"http://{host}:{port}/"
+    for name, archive in server.archives.items():
+        print(f"[+] {name}: {len(archive)} entries from {archive.idx_path}")
+    print(f"[*] Serving on {where} (cache {server.cache.max_bytes // 1024 // 1024} MB), Ctrl+C to stop")
+    async with listener:
+        await listener.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve decrypted PAK entries over localhost HTTP or a Unix socket")
+    parser.add_argument('idx', nargs='*', help="IDX files (the .pak next to each is used)")
+    parser.add_argument('--client', help="client_index.py index to serve as the archive 'client'")
+    parser.add_argument('--keystore', action='append', default=[],
+                        help="Keystore for the IDX at the same position (default: .l1rk next to the IDX)")
+    parser.add_argument('--host', default='127.0.0.1', help="Bind address (keep it local: entries are plaintext)")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--unix', help="Listen on this Unix socket path instead of TCP")
+    parser.add_argument('--cache-mb', type=int, default=DEFAULT_CACHE_MB, help="Shared plaintext cache size")
+    parser.add_argument('--workers', type=int, default=4, help="Decode threads")
+    args = parser.parse_args()
+
+    if not args.idx and not args.client:
+        parser.error("give IDX files, --client, or both")
+    if len(args.keystore) > len(args.idx):
+        print("[!] More --keystore options than IDX files")
+        sys.exit(1)
+    archives = []
+    for position, idx_path in enumerate(args.idx):
+        keystore_path = args.keystore[position] if position < len(args.keystore) else None
+        if keystore_path is None and Path(idx_path).with_suffix('.l1rk').exists():
+            keystore_path = Path(idx_path).with_suffix('.l1rk')
+        for path in (idx_path, keystore_path):
+            if path and not Path(path).exists():
+                print(f"[!] File not found: {path}")
+                sys.exit(1)
+        archives.append((idx_path, keystore_path))
+    if args.client and not Path(args.client).exists():
+        print(f"[!] File not found: {args.client}")
+        sys.exit(1)
+    if args.unix and not hasattr(asyncio, 'start_unix_server'):
+        print("[!] Unix sockets are not available on this platform; use --port")
+        sys.exit(1)
+
+    client = ClientIndex(args.client) if args.client else None
+    server = EntryServer(archives, args.cache_mb * 1024 * 1024, args.workers, client)
+    try:
+        asyncio.run(serve(server, args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        print("\n[*] Stopped")
+    finally:
+        server.close()
+        if args.unix:
+            Path(args.unix).unlink(missing_ok=True)
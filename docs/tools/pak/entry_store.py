@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Content-addressed, deduplicating extraction target for multiple client versions.
+
+Each plaintext entry is stored once under its BLAKE2b hash; every client
+version gets a manifest mapping entry names to hashes. A cipher index maps
+(key, flag, stored bytes) to the plaintext hash, so an entry whose stored
+bytes were already seen - in this or any earlier version - is neither
+decrypted nor written again. Disk use grows with what changed between
+versions, not with the number of versions.
+
+Store layout:
+  <store>/objects/ab/cdef...        plaintext blobs (read-only)
+  <store>/cipher_index.tsv          cipher digest -> plaintext digest (append-only)
+  <store>/manifests/<version>.json  name -> {hash, size}
+
+Usage:
+  python entry_store.py <store> add <version> <ui.idx> [--pak ui.pak] [--keystore keys.l1rk] [--profile profile.json]
+  python entry_store.py <store> checkout <version> <dest_dir> [--link]
+  python entry_store.py <store> stats
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import stat
+import sys
+import time
+from pathlib import Path
+
+from instrument import DISABLED, add_profile_arguments, finish_profile, profiler_from_args
+from keystore import Keystore
+from pak_format import NoKeyError, PakArchive, decode_payload, local_path
+
+DIGEST_SIZE = 32
+# Store objects are read-only: linked checkouts share their inode
+READ_ONLY = stat.S_IREAD | stat.S_IRGRP | stat.S_IROTH
+WRITE_BITS = stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH
+
+
+def plain_digest(data):
+    return hashlib.blake2b(data, digest_size=DIGEST_SIZE).hexdigest()
+
+
+def cipher_digest(stored, key, flag):
+    """Identity of a stored payload: the same digest always decodes to the same plaintext."""
+    h = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    h.update(hashlib.blake2b(key, digest_size=16).digest())
+    h.update(bytes([flag]))
+    h.update(stored)
+    return h.hexdigest()
+
+
+class EntryStore:
+    """A content-addressed object directory plus per-version manifests."""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.objects = self.root / 'objects'
+        self.manifests = self.root / 'manifests'
+        self.cipher_index_path = self.root / 'cipher_index.tsv'
+        self.objects.mkdir(parents=True, exist_ok=True)
+        self.manifests.mkdir(parents=True, exist_ok=True)
+
+        self.cipher_index = {}
+        if self.cipher_index_path.exists():
+            with open(self.cipher_index_path, encoding='ascii') as f:
+                for line in f:
+                    cipher, _, plain = line.rstrip('\n').partition('\t')
+                    if plain:
+                        self.cipher_index[cipher] = plain
+
+    def object_path(self, digest):
+        return self.objects / digest[:2] / digest[2:]
+
+    def has_object(self, digest):
+        return self.object_path(digest).exists()
+
+    def put(self, data):
+        """Store a plaintext blob. Returns (digest, written) where written is False for duplicates."""
+        digest = plain_digest(data)
+        path = self.object_path(digest)
+        if path.exists():
+            return digest, False
+        path.parent.mkdir(exist_ok=True)
+        tmp = path.with_suffix('.tmp')
+        tmp.write_bytes(data)
+        os.chmod(tmp, READ_ONLY)
+        os.replace(tmp, path)
+        return digest, True
+
+    def add_version(self, version, idx_path, pak_path=None, key_lookup=None, profiler=DISABLED):
+        """
+        Extract one client version into the store.
+
+        Returns:
+            stats dict (entries, decrypted, written, reused, skipped)
+        """
+        stats = {'entries': 0, 'decrypted': 0, 'written': 0, 'reused': 0, 'skipped': 0}
+        manifest = {'version': version, 'idx': str(idx_path), 'entries': {}, 'skipped': []}
+
+        archive_args = {'key_lookup': key_lookup} if key_lookup else {}
+        with PakArchive(idx_path, pak_path, **archive_args) as archive, \
+                open(self.cipher_index_path, 'a', encoding='ascii') as cipher_log:
+            for entry in archive.entries:
+                stats['entries'] += 1
+                with profiler.stage('read', entries=1) as stage:
+                    stored = archive.raw(entry)
+                    stage.add(bytes=len(stored))
+                try:
+                    with profiler.stage('key', entries=1):
+                        key = archive.key(entry, stored)
+                except NoKeyError:
+                    stats['skipped'] += 1
+                    manifest['skipped'].append(entry.name)
+                    continue
+
+                with profiler.stage('cipher_digest', bytes=len(stored), entries=1):
+                    cipher = cipher_digest(stored, key, entry.flag)
+                digest = self.cipher_index.get(cipher)
+                if digest is not None and self.has_object(digest):
+                    stats['reused'] += 1
+                else:
+                    with profiler.stage('decrypt', bytes=len(stored), entries=1):
+                        plain = decode_payload(stored, key, entry.flag)
+                    stats['decrypted'] += 1
+                    with profiler.stage('write', bytes=len(plain), entries=1):
+                        digest, written = self.put(plain)
+                    stats['written' if written else 'reused'] += 1
+                    if self.cipher_index.get(cipher) != digest:
+                        self.cipher_index[cipher] = digest
+                        cipher_log.write(f"{cipher}\t{digest}\n")
+
+                manifest['entries'][entry.name] = {'hash': digest, 'size': entry.size}
+
+        manifest['stats'] = stats
+        path = self.manifests / f"{version}.json"
+        path.write_text(json.dumps(manifest, indent=1, ensure_ascii=False), encoding='utf-8')
+        return stats
+
+    def load_manifest(self, version):
+        path = self.manifests / f"{version}.json"
+        if not path.exists():
+            raise FileNotFoundError(f"No manifest for version '{version}' in {self.root}")
+        return json.loads(path.read_text(encoding='utf-8'))
+
+    def checkout(self, version, dest_dir, link=False):
+        """
+        Materialise a version as a normal directory tree.
+
+        Files are copies by default. With link=True they are hard links to the
+        store objects (copies where linking fails). A linked file is the
+        object's inode, read-only because objects are; its mode is never
+        changed through the checkout, which would make the object writable for
+        every version holding the same entry.
+        """
+        manifest = self.load_manifest(version)
+        dest = Path(dest_dir)
+        for name, info in manifest['entries'].items():
+            target = dest / local_path(name)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            if target.exists():
+                self._remove_checkout_file(target)
+            source = self.object_path(info['hash'])
+            if link:
+                if source.stat().st_mode & WRITE_BITS:
+                    os.chmod(source, READ_ONLY)
+                try:
+                    os.link(source, target)
+                    continue
+                except OSError:
+                    pass
+            shutil.copyfile(source, target)
+        return len(manifest['entries'])
+
+    def _remove_checkout_file(self, target):
+        try:
+            target.unlink()
+            return
+        except PermissionError:
+            pass
+        # Windows refuses to delete read-only files. A linked file is the store object named by its
+        # content (same inode), so the read-only flag is cleared only for the unlink and then restored
+        linked = self.object_path(plain_digest(target.read_bytes())) if target.stat().st_nlink > 1 else None
+        os.chmod(target, stat.S_IREAD | stat.S_IWRITE)
+        target.unlink()
+        if linked is not None and linked.exists():
+            os.chmod(linked, READ_ONLY)
+
+    def stats(self):
+        versions = sorted(p.stem for p in self.manifests.glob('*.json'))
+        object_count = 0
+        object_bytes = 0
+        for path in self.objects.rglob('*'):
+            if path.is_file():
+                object_count += 1
+                object_bytes += path.stat().st_size
+
+        logical_bytes = 0
+        for version in versions:
+            logical_bytes += sum(info['size'] for info in self.load_manifest(version)['entries'].values())
+        return {
+            'versions': versions,
+            'objects': object_count,
+            'stored_bytes': object_bytes,
+            'logical_bytes': logical_bytes,
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deduplicating entry store for extracted client versions")
+    parser.add_argument('store', help="Store directory")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    add = commands.add_parser('add', help="Extract a client version into the store")
+    add.add_argument('version', help="Version label, e.g. 20251113")
+    add.add_argument('idx', help="Path to the .idx file")
+    add.add_argument('--pak', help="Path to the .pak file (default: next to the .idx)")
+    add.add_argument('--keystore', help="Per-entry .l1rk keystore (default: XML prolog keys only)")
+    add_profile_arguments(add)
+
+    checkout = commands.add_parser('checkout', help="Write a version out as a directory tree")
+    checkout.add_argument('version')
+    checkout.add_argument('dest')
+    checkout.add_argument('--link', action='store_true',
+                          help="Hard-link read-only files to the store objects instead of copying")
+
+    commands.add_parser('stats', help="Show dedup statistics")
+    args = parser.parse_args()
+
+    store = EntryStore(args.store)
+    started = time.perf_counter()
+
+    if args.command == 'add':
+        if not Path(args.idx).exists():
+            print(f"[!] File not found: {args.idx}")
+            sys.exit(1)
+        profiler = profiler_from_args(args)
+        if args.keystore:
+            with Keystore(args.keystore) as keys:
+                stats = store.add_version(args.version, args.idx, args.pak, keys.lookup, profiler)
+        else:
+            stats = store.add_version(args.version, args.idx, args.pak, profiler=profiler)
+        print(f"[+] Version {args.version}: {stats['entries']} entries")
+        print(f"    Decrypted: {stats['decrypted']}  Written: {stats['written']}  "
+              f"Reused: {stats['reused']}  Skipped (no key): {stats['skipped']}")
+        finish_profile(profiler, args, stats=stats)
+    elif args.command == 'checkout':
+        count = store.checkout(args.version, args.dest, args.link)
+        print(f"[+] Checked out {count} entries of {args.version} to {args.dest}"
+              f"{' (read-only hard links)' if args.link else ''}")
+    else:
+        stats = store.stats()
+        ratio = stats['logical_bytes'] / stats['stored_bytes'] if stats['stored_bytes'] else 0
+        print(f"Versions: {', '.join(stats['versions']) or '(none)'}")
+        print(f"Objects: {stats['objects']} ({stats['stored_bytes']:,} bytes)")
+        print(f"Logical size of all versions: {stats['logical_bytes']:,} bytes (dedup ratio {ratio:.2f}x)")
+
+    print(f"[*] Completed in {time.perf_counter() - started:.2f}s")
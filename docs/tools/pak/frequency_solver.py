@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Ciphertext-only key recovery by column-wise frequency analysis.
+
+crack_xor_key.py needs the XML prolog, so it cannot key CSB entries. For a
+given key period P, every byte at position i of an entry was encrypted with
+key byte i % P, so each of the P columns is a single-byte XOR of plaintext
+with a known byte distribution. Per column, the log-likelihood of all 256
+candidate key bytes is one matrix product:
+
+    score[j, k] = sum_x count[j, x] * log2 p(x ^ k)
+
+against a reference distribution (UI XML text for .xml entries, a FlatBuffers
+byte profile for .csb entries; see crib_drag.py, or pass --corpus). The best
+candidate per column gives the key, and the posterior probability of that
+candidate among all 256 is its confidence.
+
+Only flag=0 entries are solved: a flag=2 entry's key covers a deflate stream,
+whose byte distribution is too flat to separate candidates.
+
+With --snapshot the histograms are built from the head and tail bytes the
+snapshot holds per entry (each at its real position, so at its real key
+column) instead of the whole entry: less evidence per column, no PAK needed.
+
+Confident keys are checked with crib_drag.check_key (the entry must decrypt
+to a valid file) before they are written to --keystore; rejected ones are
+listed.
+
+Requires numpy.
+
+Usage:
+  python frequency_solver.py <ui.idx> [--period 38] [--corpus extracted_ui]
+                             [--output freq_report.json] [--keystore freq.l1rk --min-confidence 0.99]
+                             [--profile profile.json]
+  python frequency_solver.py --snapshot ui_snapshot.npz [--period 38] ...
+"""
+
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from crib_drag import DEFAULT_PERIOD, binary_profile, check_key, snapshot_payload, text_profile
+from instrument import DISABLED, add_profile_arguments, finish_profile, profiler_from_args
+from keystore import write_keystore
+from pak_format import FLAG_STORED, XML_PROLOG, PakArchive, derive_key, read_idx
+from snapshot import Snapshot, add_snapshot_argument, snapshot_from_args
+
+DEFAULT_MIN_CONFIDENCE = 0.99
+
+_pak = None
+_snapshot = None
+_shifted = None
+
+
+def shifted_profile(log_probs):
+    """(256, 256) matrix L[k, x] = log2 p(x ^ k) for scoring every key byte at once."""
+    x = np.arange(256)
+    return log_probs[x[None, :] ^ x[:, None]].astype(np.float64)
+
+
+def column_histograms(cipher, period, positions=None):
+    """Byte counts per key column: (period, 256). `positions` defaults to 0..len(cipher)-1."""
+    if positions is None:
+        positions = np.arange(len(cipher), dtype=np.int64)
+    columns = positions % period
+    flat = columns * 256 + cipher
+    return np.bincount(flat, minlength=period * 256).reshape(period, 256)
+
+
+def solve_columns(histograms, shifted):
+    """
+    Most likely key byte per column.
+
+    Returns:
+        (key bytes, posterior confidence per column, log2-likelihood margin
+        over the runner-up candidate per column)
+    """
+    scores = histograms.astype(np.float64) @ shifted.T
+    ranked = np.sort(scores, axis=1)
+    margin = ranked[:, -1] - ranked[:, -2]
+
+    # Posterior over the 256 candidates with a flat prior, in log2 space
+    relative = np.exp2(np.maximum(scores - ranked[:, -1:], -1074))
+    confidence = 1.0 / relative.sum(axis=1)
+    return scores.argmax(axis=1).astype(np.uint8), confidence, margin
+
+
+def _open_worker(pak_path, profiles, snapshot_path=None):
+    """Process pool initializer: map the PAK (or snapshot) and precompute the shifted profiles once per worker."""
+    global _pak, _snapshot, _shifted
+    if snapshot_path:
+        _snapshot = Snapshot(snapshot_path)
+    else:
+        _pak = np.memmap(pak_path, dtype=np.uint8, mode='r') if Path(pak_path).stat().st_size else np.zeros(0, np.uint8)
+    _shifted = {name: shifted_profile(log_probs) for name, (log_probs, _) in profiles.items()}
+
+
+def solve_entry(job):
+    """Frequency-solve one entry; runs inside a pool worker."""
+    index, name, offset, length, period = job
+    if _snapshot is not None:
+        # Snapshot rows are IDX indices
+        positions, cipher = _snapshot.known_bytes(index)
+    else:
+        cipher = np.array(_pak[offset:min(offset + length, len(_pak))], dtype=np.uint8)
+        positions = None
+    profile = 'binary' if name.lower().endswith('.csb') else 'text'
+
+    key, confidence, margin = solve_columns(column_histograms(cipher, period, positions), _shifted[profile])
+    result = {
+        'index': index,
+        'name': name,
+        'profile': profile,
+        'bytes': len(cipher),
+        'key': bytes(key).hex(),
+        'confidence': [round(float(c), 4) for c in confidence],
+        'min_confidence': round(float(confidence.min()), 4),
+        'mean_margin_bits': round(float(margin.mean()), 2),
+    }
+
+    # Uncompressed XML entries double as a check against the prolog crib
+    if name.lower().endswith('.xml') and len(cipher) >= len(XML_PROLOG) and \
+            (positions is None or positions[len(XML_PROLOG) - 1] == len(XML_PROLOG) - 1):
+        crib = derive_key(bytes(cipher[:len(XML_PROLOG)]))
+        columns = np.arange(len(XML_PROLOG)) % period
+        result['prolog_agreement'] = round(float(np.mean(key[columns] == np.frombuffer(crib, dtype=np.uint8))), 4)
+    return result
+
+
+def solve_archive(idx_path, pak_path=None, period=DEFAULT_PERIOD, corpus=None, workers=None, profiler=DISABLED,
+                  snapshot=None):
+    """
+    Frequency-solve every uncompressed entry of an archive, or of a Snapshot
+    (idx_path and pak_path are then ignored).
+
+    Returns:
+        list of per-entry result dicts in IDX order
+    """
+    with profiler.stage('read_idx') as stage:
+        entries = snapshot.entries() if snapshot is not None else read_idx(idx_path)[1]
+        stage.add(entries=len(entries))
+    if snapshot is not None:
+        pak_path, snapshot_path = None, str(snapshot.path)
+        # Only the snapshotted head and tail bytes are read
+        lengths = {entry.index: min(snapshot.stored_size(entry.index), 2 * snapshot.width) for entry in entries}
+    else:
+        pak_path, snapshot_path = str(pak_path or Path(idx_path).with_suffix('.pak')), None
+        lengths = {entry.index: entry.stored_size for entry in entries}
+    with profiler.stage('profiles'):
+        profiles = {'text': text_profile(corpus), 'binary': binary_profile(corpus)}
+
+    jobs = [(entry.index, entry.name, entry.offset, lengths[entry.index], period)
+            for entry in entries if entry.flag == FLAG_STORED and entry.stored_size]
+    with profiler.stage('solve', bytes=sum(job[3] for job in jobs), entries=len(jobs)), \
+            ProcessPoolExecutor(max_workers=workers, initializer=_open_worker,
+                                initargs=(pak_path, profiles, snapshot_path)) as pool:
+        return list(pool.map(solve_entry, jobs, chunksize=32))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ciphertext-only key recovery by column frequency analysis")
+    parser.add_argument('idx', nargs='?', help="Path to the .idx file")
+    add_snapshot_argument(parser)
+    parser.add_argument('--pak', help="Path to the .pak file (default: next to the .idx)")
+    parser.add_argument('--period', type=int, default=DEFAULT_PERIOD, help="Key period to solve for")
+    parser.add_argument('--corpus', help="Directory of extracted .xml/.csb files for the reference byte profiles")
+    parser.add_argument('--workers', type=int, help="Process pool size (default: CPU count)")
+    parser.add_argument('--output', default='freq_report.json', help="JSON report path")
+    parser.add_argument('--keystore', help="Write keys whose every byte reaches --min-confidence to a .l1rk")
+    parser.add_argument('--min-confidence', type=float, default=DEFAULT_MIN_CONFIDENCE)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    snapshot = snapshot_from_args(parser, args)
+    if args.period < 1:
+        print("[!] --period must be positive")
+        sys.exit(1)
+
+    profiler = profiler_from_args(args)
+    started = time.perf_counter()
+    results = solve_archive(args.idx, args.pak, args.period, args.corpus, args.workers, profiler, snapshot)
+    elapsed = time.perf_counter() - started
+    confident = [r for r in results if r['min_confidence'] >= args.min_confidence]
+    rejected = []
+    if args.keystore:
+        with profiler.stage('check_keys', entries=len(confident)):
+            if snapshot is not None:
+                for result in confident:
+                    stored, known = snapshot_payload(snapshot, result['index'])
+                    result['key_check'] = check_key(result['name'], stored, bytes.fromhex(result['key']),
+                                                    FLAG_STORED, known) or 'ok'
+            else:
+                with PakArchive(args.idx, args.pak) as archive:
+                    for result in confident:
+                        entry = archive.entries[result['index']]
+                        result['key_check'] = check_key(entry.name, archive.raw(entry),
+                                                        bytes.fromhex(result['key']), entry.flag) or 'ok'
+        rejected = [r for r in confident if r['key_check'] != 'ok']
+        confident = [r for r in confident if r['key_check'] == 'ok']
+
+    print("=" * 80)
+    print("FREQUENCY ANALYSIS")
+    print("=" * 80)
+    print(f"Entries solved: {len(results)} (flag=0)  period {args.period}  in {elapsed:.2f}s")
+    if snapshot is not None:
+        print(f"Source: snapshot {args.snapshot} (up to {2 * snapshot.width} head/tail bytes per entry)")
+    for profile in ('text', 'binary'):
+        selected = [r for r in results if r['profile'] == profile]
+        if selected:
+            sure = sum(1 for r in selected if r['min_confidence'] >= args.min_confidence)
+            print(f"  {profile:6s}: {len(selected):5d} entries, {sure} with every byte >= {args.min_confidence}")
+    checked = [r for r in results if 'prolog_agreement' in r]
+    if checked:
+        print(f"Agreement with the XML prolog crib: {sum(r['prolog_agreement'] for r in checked) / len(checked):.1%} "
+              f"of key bytes over {len(checked)} entries")
+
+    source = snapshot.meta['idx'] if snapshot is not None else str(args.idx)
+    Path(args.output).write_text(json.dumps({
+        'idx': source,
+        'snapshot': args.snapshot,
+        'period': args.period,
+        'seconds': round(elapsed, 3),
+        'results': results,
+    }, indent=1, ensure_ascii=False), encoding='utf-8')
+    print(f"\n[+] Report written to {args.output}")
+
+    if args.keystore:
+        records = [{'name': r['name'], 'index': r['index'], 'key': bytes.fromhex(r['key'])} for r in confident]
+        count = write_keystore(args.keystore, records, args.period, ['frequency'],
+                               f"frequency_solver.py period {args.period} on {args.snapshot or args.idx}")
+        print(f"[+] Wrote {count} keys to {args.keystore}"
+              f"{f', {len(rejected)} confident keys rejected' if rejected else ''}")
+        for result in rejected:
+            print(f"  [!] Rejected key for {result['name']}: {result['key_check']}")
+    finish_profile(profiler, args)
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Lightweight stage timers and throughput counters for the PAK tools.
+
+A Profiler collects named stages. Each stage is a context manager that
+records wall time, bytes and entries processed and, when memory tracing is on,
+the peak traced allocation while it ran:
+
+    profiler = Profiler()
+    with profiler.stage('decrypt', entries=len(entries)) as stage:
+        for entry in entries:
+            stage.add(bytes=entry.stored_size)
+            ...
+    profiler.write('profile.json')
+
+Entering a stage name again accumulates into the same record, so per-entry
+stages inside a loop are cheap to use. A disabled Profiler (the default
+DISABLED instance every instrumented function falls back to) hands out one
+shared no-op stage that is its own context manager: without --profile a
+stage costs a method call and an enter/exit, with no timing, allocation or
+bookkeeping.
+
+Tools expose it through add_profile_arguments():
+  --profile profile.json         stage report: seconds, MB/s, entries/s, peak memory
+  --profile-cprofile run.prof    also run cProfile; top functions go into the report
+  --profile-memory               also trace allocations (tracemalloc) for per-stage peaks
+
+Stages that fan out to a process pool measure the pool's wall time; traced
+memory covers the calling process only.
+
+Usage:
+  python instrument.py <profile.json>     (print a saved report)
+"""
+
+import argparse
+import cProfile
+import io
+import json
+import pstats
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+HOTSPOTS = 25
+
+
+class Stage:
+    """Accumulated measurements of one named stage."""
+
+    __slots__ = ('name', 'seconds', 'bytes', 'entries', 'calls', 'peak_memory')
+
+    def __init__(self, name):
+        self.name = name
+        self.seconds = 0.0
+        self.bytes = 0
+        self.entries = 0
+        self.calls = 0
+        self.peak_memory = None
+
+    def add(self, bytes=0, entries=0):
+        self.bytes += bytes
+        self.entries += entries
+
+    def as_dict(self):
+        result = {
+            'seconds': round(self.seconds, 6),
+            'calls': self.calls,
+            'bytes': self.bytes,
+            'entries': self.entries,
+        }
+        if self.seconds > 0:
+            if self.bytes:
+                result['mb_per_s'] = round(self.bytes / 1024 / 1024 / self.seconds, 2)
+            if self.entries:
+                result['entries_per_s'] = round(self.entries / self.seconds, 1)
+        if self.peak_memory is not None:
+            result['peak_memory'] = self.peak_memory
+        return result
+
+
+class _NullStage:
+    """The stage and context a disabled Profiler reuses for every stage() call."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return None
+
+    def add(self, bytes=0, entries=0):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class Profiler:
+    """
+    Named stage timers plus optional cProfile and tracemalloc capture.
+
+    Args:
+        enabled: False gives a no-op profiler
+        cprofile: Run cProfile between start() and stop()
+        trace_memory: Trace allocations with tracemalloc for per-stage peaks
+    """
+
+    def __init__(self, enabled=True, cprofile=False, trace_memory=False):
+        self.enabled = enabled
+        self.stages = {}
+        self.counters = {}
+        self._cprofile = cProfile.Profile() if enabled and cprofile else None
+        self._trace_memory = enabled and trace_memory
+        self._open = []
+        self._started = None
+        self._elapsed = None
+        self._owns_tracing = False
+        self.traced_peak = None
+
+    def start(self):
+        if not self.enabled or self._started is not None:
+            return self
+        if self._trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._owns_tracing = True
+        if self._cprofile:
+            self._cprofile.enable()
+        self._started = time.perf_counter()
+        return self
+
+    def stop(self):
+        if not self.enabled or self._started is None or self._elapsed is not None:
+            return self
+        self._elapsed = time.perf_counter() - self._started
+        if self._cprofile:
+            self._cprofile.disable()
+        if self._trace_memory and tracemalloc.is_tracing():
+            self.traced_peak = max([tracemalloc.get_traced_memory()[1]] +
+                                   [stage.peak_memory or 0 for stage in self.stages.values()])
+            if self._owns_tracing:
+                tracemalloc.stop()
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def stage(self, name, bytes=0, entries=0):
+        """Time a block under `name`; yields the Stage so the block can add() to its counters."""
+        if not self.enabled:
+            return _NULL_STAGE
+        return self._timed_stage(name, bytes, entries)
+
+    @contextmanager
+    def _timed_stage(self, name, bytes, entries):
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = Stage(name)
+        stage.add(bytes, entries)
+        tracing = self._trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            outer_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.reset_peak()
+        self._open.append(0)
+        started = time.perf_counter()
+        try:
+            yield stage
+        finally:
+            stage.seconds += time.perf_counter() - started
+            stage.calls += 1
+            child_peak = self._open.pop()
+            if tracing:
+                peak = max(tracemalloc.get_traced_memory()[1], child_peak)
+                stage.peak_memory = max(stage.peak_memory or 0, peak)
+                if self._open:
+                    # The reset hid the enclosing stage's earlier peak; hand both up
+                    self._open[-1] = max(self._open[-1], peak, outer_peak)
+
+    def count(self, name, amount=1):
+        """Bump a free-standing counter (cache hits, skipped entries, ...)."""
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def report(self, **extra):
+        """Report dict: total time, per-stage measurements, counters, memory and hotspots."""
+        self.stop()
+        report = {
+            'argv': sys.argv,
+            'seconds': round(self._elapsed, 6) if self._elapsed is not None else None,
+            'stages': {name: stage.as_dict() for name, stage in self.stages.items()},
+            'counters': dict(self.counters),
+        }
+        if self.traced_peak is not None:
+            report['traced_peak_memory'] = self.traced_peak
+        if resource is not None:
+            maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            # ru_maxrss is in KB on Linux, bytes on macOS
+            report['process_peak_rss'] = maxrss if sys.platform == 'darwin' else maxrss * 1024
+        if self._cprofile:
+            report['hotspots'] = hotspots(self._cprofile)
+        report.update(extra)
+        return report
+
+    def write(self, path, cprofile_path=None, **extra):
+        """Write the JSON report (and the raw cProfile stats if a path is given)."""
+        report = self.report(**extra)
+        Path(path).write_text(json.dumps(report, indent=1, ensure_ascii=False), encoding='utf-8')
+        if self._cprofile and cprofile_path:
+            self._cprofile.dump_stats(cprofile_path)
+        return report
+
+
+DISABLED = Profiler(enabled=False)
+
+
+def hotspots(profile, limit=HOTSPOTS):
+    """Top functions by cumulative time from a cProfile.Profile."""
+    stats = pstats.Stats(profile, stream=io.StringIO())
+    rows = []
+    for (filename, line, function), (_, calls, own, cumulative, _) in stats.stats.items():
+        rows.append({
+            'function': f"{Path(filename).name}:{line}({function})",
+            'calls': calls,
+            'own_seconds': round(own, 6),
+            'cumulative_seconds': round(cumulative, 6),
+        })
+    rows.sort(key=lambda row: -row['cumulative_seconds'])
+    return rows[:limit]
+
+
+def add_profile_arguments(parser):
+    """Add --profile, --profile-cprofile and --profile-memory to an argparse parser."""
+    group = parser.add_argument_group('profiling')
+    group.add_argument('--profile', metavar='JSON', help="Write per-stage timings and throughput as JSON")
+    group.add_argument('--profile-cprofile', metavar='PROF', help="With --profile: also run cProfile, dump stats here")
+    group.add_argument('--profile-memory', action='store_true', help="With --profile: trace per-stage peak memory")
+
+
+def profiler_from_args(args):
+    """A started Profiler for parsed --profile arguments, or DISABLED without --profile."""
+    if not getattr(args, 'profile', None):
+        return DISABLED
+    return Profiler(cprofile=bool(args.profile_cprofile), trace_memory=args.profile_memory).start()
+
+
+def finish_profile(profiler, args, **extra):
+    """Write the report requested on the command line, if any."""
+    if not profiler.enabled:
+        return None
+    report = profiler.write(args.profile, args.profile_cprofile, **extra)
+    print(f"[+] Profile written to {args.profile}")
+    return report
+
+
+def format_size(size):
+    if size is None:
+        return '-'
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print a saved --profile report")
+    parser.add_argument('report', help="JSON written by a tool's --profile option")
+    args = parser.parse_args()
+
+    if not Path(args.report).exists():
+        print(f"[!] File not found: {args.report}")
+        sys.exit(1)
+    report = json.loads(Path(args.report).read_text(encoding='utf-8'))
+
+    print("=" * 80)
+    print(f"PROFILE: {' '.join(report.get('argv', []))}")
+    print("=" * 80)
+    print(f"Total: {report['seconds']:.3f}s" if report.get('seconds') is not None else "Total: -")
+    print()
+    print(f"{'Stage':24s} {'Seconds':>9s} {'Calls':>7s} {'MB/s':>9s} {'Entries/s':>11s} {'Peak mem':>10s}")
+    print("-" * 80)
+    for name, stage in report['stages'].items():
+        print(f"{name:24s} {stage['seconds']:9.3f} {stage['calls']:7d} "
+              f"{stage.get('mb_per_s', 0):9.1f} {stage.get('entries_per_s', 0):11.1f} "
+              f"{format_size(stage.get('peak_memory')):>10s}")
+    for name, value in report.get('counters', {}).items():
+        print(f"  {name}: {value}")
+    if 'traced_peak_memory' in report or 'process_peak_rss' in report:
+        print(f"\nPeak traced memory: {format_size(report.get('traced_peak_memory'))}  "
+              f"process peak RSS: {format_size(report.get('process_peak_rss'))}")
+    if report.get('hotspots'):
+        print("\nHotspots (cumulative):")
+        for row in report['hotspots'][:15]:
+            print(f"  {row['cumulative_seconds']:9.3f}s {row['own_seconds']:9.3f}s {row['calls']:9d}  {row['function']}")
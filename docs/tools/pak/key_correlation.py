@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+Vectorised correlation report between recovered keys and entry metadata.
+
+The STATISTICAL CORRELATION ANALYSIS section of key_analysis.py prints value
+ranges for key bytes 0-3. This tool joins every key in a keystore with its IDX
+entry and tests every key byte against every numeric entry feature in a few
+matrix products:
+
+  - Pearson correlation (Fisher z test)
+  - mutual information between the key byte's high nibble and 16 quantile
+    bins of the feature (G test)
+  - per-bit bias of every key bit, and the phi correlation of every key bit
+    with every bit of the features' low bytes
+
+Features are index, offset, size, compressed size, flag, stored size, name
+length and several name hashes (CRC32, Adler-32, FNV-1a, djb2 and the
+keystore's BLAKE2b), each as a value and as its four little-endian bytes.
+p-values are Bonferroni corrected within each test family, and significant
+relationships are ranked by corrected p-value.
+
+With --snapshot the entry metadata is read from a snapshot.py file instead of
+the IDX.
+
+Requires numpy.
+
+Usage:
+  python key_correlation.py <ui.idx> <keys.l1rk> [--alpha 0.01] [--top 25]
+                            [--output correlation.json] [--profile profile.json]
+  python key_correlation.py --snapshot ui_snapshot.npz <keys.l1rk> [--alpha 0.01] ...
+"""
+
+import argparse
+import json
+import math
+import sys
+import time
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+from instrument import DISABLED, add_profile_arguments, finish_profile, profiler_from_args
+from keystore import Keystore, name_hash
+from pak_format import NAME_ENCODING, read_idx
+from snapshot import add_snapshot_argument, snapshot_from_args
+
+DEFAULT_ALPHA = 0.01
+MI_BINS = 16
+MIN_ENTRIES = 8
+
+_erfc = np.vectorize(math.erfc, otypes=[np.float64])
+
+
+def fnv1a32(data):
+    h = 0x811C9DC5
+    for byte in data:
+        h = ((h ^ byte) * 0x01000193) & 0xFFFFFFFF
+    return h
+
+
+def djb2(data):
+    h = 5381
+    for byte in data:
+        h = (h * 33 + byte) & 0xFFFFFFFF
+    return h
+
+
+NAME_HASHES = {
+    'crc32': zlib.crc32,
+    'crc32_lower': lambda data: zlib.crc32(data.lower()),
+    'crc32_basename': lambda data: zlib.crc32(data.rsplit(b'\\', 1)[-1]),
+    'adler32': zlib.adler32,
+    'fnv1a32': fnv1a32,
+    'djb2': djb2,
+}
+
+
+def entry_features(entries):
+    """
+    Numeric features per entry.
+
+    Returns:
+        (feature names, (entries, features) float64 matrix, names of the byte
+        features, (entries, byte features) uint8 matrix)
+    """
+    columns = {
+        'index': [e.index for e in entries],
+        'offset': [e.offset for e in entries],
+        'size': [e.size for e in entries],
+        'compressed_size': [e.compressed_size for e in entries],
+        'flag': [e.flag for e in entries],
+        'stored_size': [e.stored_size for e in entries],
+        'name_length': [len(e.name.encode(NAME_ENCODING)) for e in entries],
+    }
+    raw_names = [e.name.encode(NAME_ENCODING) for e in entries]
+    for label, function in NAME_HASHES.items():
+        columns[f'name_{label}'] = [function(raw) for raw in raw_names]
+    columns['name_blake2b'] = [name_hash(e.name) & 0xFFFFFFFF for e in entries]
+
+    names, values, byte_names, byte_values = [], [], [], []
+    for label, column in columns.items():
+        column = np.array(column, dtype=np.uint64)
+        names.append(label)
+        values.append(column.astype(np.float64))
+        for shift in range(4):
+            byte_names.append(f'{label}.b{shift}')
+            byte_values.append(((column >> np.uint64(8 * shift)) & np.uint64(0xFF)).astype(np.uint8))
+
+    names += byte_names
+    values += [column.astype(np.float64) for column in byte_values]
+    return names, np.column_stack(values), byte_names, np.column_stack(byte_values)
+
+
+def _standardise(matrix):
+    centred = matrix - matrix.mean(axis=0)
+    std = centred.std(axis=0)
+    varying = std > 0
+    return np.where(varying, centred / np.where(varying, std, 1.0), 0.0), varying
+
+
+def pearson(a, b):
+    """All-pairs Pearson correlation between the columns of a and b; constant columns give 0."""
+    za, _ = _standardise(a)
+    zb, _ = _standardise(b)
+    return za.T @ zb / len(a)
+
+
+def pearson_p(r, n):
+    """Two-sided p-value of a correlation via the Fisher z transform."""
+    z = np.arctanh(np.clip(r, -0.999999, 0.999999)) * math.sqrt(max(n - 3, 1))
+    return _erfc(np.abs(z) / math.sqrt(2))
+
+
+def chi2_sf(statistic, dof):
+    """Chi-square survival function (Wilson-Hilferty normal approximation)."""
+    k = np.asarray(dof, dtype=np.float64)
+    z = ((np.maximum(statistic, 0) / k) ** (1 / 3) - (1 - 2 / (9 * k))) / np.sqrt(2 / (9 * k))
+    return 0.5 * _erfc(z / math.sqrt(2))
+
+
+def quantile_bins(matrix, bins=MI_BINS):
+    """Bin every column into (up to) `bins` quantile bins: int matrix of the same shape."""
+    out = np.zeros(matrix.shape, dtype=np.int64)
+    quantiles = np.linspace(0, 1, bins + 1)[1:-1]
+    for column in range(matrix.shape[1]):
+        edges = np.unique(np.quantile(matrix[:, column], quantiles))
+        out[:, column] = np.searchsorted(edges, matrix[:, column], side='right')
+    return out
+
+
+def one_hot(binned, bins):
+    """(n, c) bin numbers -> (n, c * bins) indicator matrix."""
+    n, c = binned.shape
+    out = np.zeros((n, c * bins), dtype=np.float64)
+    out[np.arange(n)[:, None], np.arange(c)[None, :] * bins + binned] = 1.0
+    return out
+
+
+def mutual_information(key_bins, feature_bins, bins=MI_BINS):
+    """
+    Mutual information (bits) between every key column and every feature column.
+
+    Returns:
+        (MI matrix (key columns, features), G-test p-values)
+    """
+    n = len(key_bins)
+    joint = (one_hot(key_bins, bins).T @ one_hot(feature_bins, bins)) / n
+    joint = joint.reshape(key_bins.shape[1], bins, feature_bins.shape[1], bins).transpose(0, 2, 1, 3)
+    pk = joint.sum(axis=3, keepdims=True)
+    pf = joint.sum(axis=2, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        terms = np.where(joint > 0, joint * np.log2(joint / (pk * pf)), 0.0)
+    mi = terms.sum(axis=(2, 3))
+
+    dof = np.maximum(((pk > 0).sum(axis=(2, 3)) - 1) * ((pf > 0).sum(axis=(2, 3)) - 1), 1)
+    g = 2 * n * math.log(2) * mi
+    return mi, chi2_sf(g, dof)
+
+
+def bits(matrix):
+    """(n, c) uint8 -> (n, c * 8) bit matrix, least significant bit first."""
+    return np.unpackbits(matrix[:, :, None], axis=2, bitorder='little').reshape(len(matrix), -1).astype(np.float64)
+
+
+def collect_keys(idx_path, keystore_path, positions=None, snapshot=None):
+    """
+    Join keystore keys with IDX entries (or the entries of a Snapshot).
+
+    Returns:
+        (entries with a key, (entries, positions) uint8 key matrix, skipped count)
+    """
+    entries = snapshot.entries() if snapshot is not None else read_idx(idx_path)[1]
+    keyed, keys = [], []
+    skipped = 0
+    with Keystore(keystore_path, fallback=None) as store:
+        positions = positions or store.key_length
+        for entry in entries:
+            key = store.get(entry.name, entry.index)
+            if key is None:
+                continue
+            if len(key) < positions:
+                skipped += 1
+                continue
+            keyed.append(entry)
+            keys.append(bytes(key[:positions]))
+    matrix = np.frombuffer(b''.join(keys), dtype=np.uint8).reshape(len(keys), positions) if keys \
+        else np.zeros((0, positions), dtype=np.uint8)
+    return keyed, matrix, skipped
+
+
+def correlate(idx_path, keystore_path, positions=None, alpha=DEFAULT_ALPHA, profiler=DISABLED, snapshot=None):
+    """
+    Test every key byte and bit against every entry feature.
+
+    Returns:
+        report dict with counts, per-bit bias and the ranked significant relationships
+    """
+    with profiler.stage('collect_keys') as stage:
+        entries, keys, skipped = collect_keys(idx_path, keystore_path, positions, snapshot)
+        stage.add(bytes=keys.nbytes, entries=len(entries))
+    n, width = keys.shape
+    source = snapshot.meta['idx'] if snapshot is not None else str(idx_path)
+    report = {'idx': source, 'keystore': str(keystore_path), 'entries': n,
+              'skipped_short_keys': skipped, 'positions': width, 'alpha': alpha}
+    if n < MIN_ENTRIES:
+        report.update(relationships=[], bit_bias=[], error=f'need at least {MIN_ENTRIES} keyed entries')
+        return report
+
+    with profiler.stage('features', entries=n):
+        names, features, byte_names, byte_features = entry_features(entries)
+    key_values = keys.astype(np.float64)
+    findings = []
+
+    def add(kind, p_values, effect, label, feature_names):
+        corrected = np.minimum(p_values * p_values.size, 1.0)
+        for position, column in zip(*np.nonzero(corrected < alpha)):
+            findings.append({
+                'test': kind,
+                'key': label(position),
+                'feature': feature_names[column],
+                'effect': round(float(effect[position, column]), 4),
+                'p_corrected': float(corrected[position, column]),
+            })
+
+    def byte_label(pos):
+        return f'byte {pos}'
+
+    # Pearson on key bytes vs features
+    with profiler.stage('pearson', entries=n):
+        r = pearson(key_values, features)
+        add('pearson', pearson_p(r, n), r, byte_label, names)
+
+    # Mutual information on the key byte's high nibble vs quantile bins
+    with profiler.stage('mutual_info', entries=n):
+        mi, mi_p = mutual_information(keys.astype(np.int64) >> 4, quantile_bins(features))
+        add('mutual_info', mi_p, mi, byte_label, names)
+
+    # Key bits vs feature low-byte bits
+    key_bits = bits(keys)
+    with profiler.stage('bit_phi', entries=n):
+        phi = pearson(key_bits, bits(byte_features))
+        add('bit_phi', pearson_p(phi, n), phi, lambda pos: f'byte {pos // 8} bit {pos % 8}',
+            [f'{name}.bit{b}' for name in byte_names for b in range(8)])
+
+    # Bias of each key bit on its own
+    ones = key_bits.mean(axis=0)
+    z = (ones - 0.5) * 2 * math.sqrt(n)
+    bias_p = np.minimum(_erfc(np.abs(z) / math.sqrt(2)) * len(ones), 1.0)
+    bit_bias = [{'key': f'byte {pos // 8} bit {pos % 8}', 'ones': round(float(ones[pos]), 4),
+                 'p_corrected': float(bias_p[pos])}
+                for pos in np.argsort(bias_p) if bias_p[pos] < alpha]
+
+    findings.sort(key=lambda f: (f['p_corrected'], -abs(f['effect'])))
+    report.update(tests={'pearson': r.size, 'mutual_info': mi.size, 'bit_phi': phi.size, 'bit_bias': len(ones)},
+                  relationships=findings, bit_bias=bit_bias)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Correlate recovered key bytes with IDX entry metadata")
+    parser.add_argument('idx', nargs='?', help="Path to the .idx file")
+    add_snapshot_argument(parser)
+    parser.add_argument('keystore', help="Keystore (.l1rk) with the recovered keys")
+    parser.add_argument('--positions', type=int, help="Key bytes to test (default: keystore key length)")
+    parser.add_argument('--alpha', type=float, default=DEFAULT_ALPHA, help="Significance level after correction")
+    parser.add_argument('--top', type=int, default=25, help="Relationships to print")
+    parser.add_argument('--output', help="Write the full report as JSON")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    snapshot = snapshot_from_args(parser, args)
+    if not Path(args.keystore).exists():
+        print(f"[!] File not found: {args.keystore}")
+        sys.exit(1)
+
+    profiler = profiler_from_args(args)
+    started = time.perf_counter()
+    report = correlate(args.idx, args.keystore, args.positions, args.alpha, profiler, snapshot)
+    elapsed = time.perf_counter() - started
+
+    print("=" * 80)
+    print("KEY / METADATA CORRELATION")
+    print("=" * 80)
+    print(f"Keyed entries: {report['entries']}  key bytes: {report['positions']}  "
+          f"(skipped {report['skipped_short_keys']} shorter keys)  in {elapsed:.2f}s")
+    if 'error' in report:
+        print(f"[!] {report['error']}")
+        sys.exit(1)
+    print(f"Tests: {', '.join(f'{kind} {count}' for kind, count in report['tests'].items())}")
+    print()
+
+    if report['relationships']:
+        print(f"{'Test':12s} {'Key':18s} {'Feature':28s} {'Effect':>8s} {'p (corr.)':>10s}")
+        print("-" * 80)
+        for finding in report['relationships'][:args.top]:
+            print(f"{finding['test']:12s} {finding['key']:18s} {finding['feature']:28s} "
+                  f"{finding['effect']:8.3f} {finding['p_corrected']:10.2e}")
+        if len(report['relationships']) > args.top:
+            print(f"... {len(report['relationships']) - args.top} more")
+    else:
+        print(f"[*] No relationship significant at alpha={args.alpha} after correction")
+
+    if report['bit_bias']:
+        print(f"\nBiased key bits: {len(report['bit_bias'])}")
+        for bias in report['bit_bias'][:10]:
+            print(f"  {bias['key']:18s} ones={bias['ones']:.3f}  p={bias['p_corrected']:.2e}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=1), encoding='utf-8')
+        print(f"\n[+] Report written to {args.output}")
+    finish_profile(profiler, args)
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+Compact, memory-mapped per-entry keystore (.l1rk).
+
+Replaces the per-entry 38-byte keys scattered as Python int lists across
+docs/analysis/pak_analysis/*.py and the loose key_*.txt files with one binary
+file of fixed-width key rows. Rows are indexed by IDX entry index and by a
+64-bit BLAKE2b hash of the entry name, and the file is only ever read through
+mmap: opening a keystore with thousands of keys costs a header parse, and
+every process that opens it shares the same page-cache copy.
+
+File layout (little endian, sections 8-byte aligned):
+  Header       magic "L1RK", format version u16, key length u16,
+               row count u32, provenance size u32
+  Provenance   UTF-8 JSON: created, description, sources[]
+  Index table  row count x u32 entry index, ascending (0xFFFFFFFF = unknown)
+  Hash table   row count x u64 name hash, ascending
+  Hash rows    row count x u32 row number for each hash table slot
+  Rows         row count x (u16 valid bytes, u16 source id, key bytes),
+               in index-table order
+
+Usage:
+  python keystore.py build keys.l1rk --from-scripts ..\\..\\analysis\\pak_analysis
+                     --from-txt ..\\..\\analysis\\pak_analysis [--idx ui.idx] [--derive]
+  python keystore.py dump keys.l1rk
+  python keystore.py get keys.l1rk <name|index>
+"""
+
+import argparse
+import ast
+import bisect
+import hashlib
+import json
+import mmap
+import re
+import struct
+import sys
+import time
+from pathlib import Path
+
+from pak_format import NAME_ENCODING, XML_PROLOG, PakArchive, crib_key_lookup, read_idx
+
+MAGIC = b'L1RK'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sHHII')
+ROW_META = struct.Struct('<HH')
+UNKNOWN_INDEX = 0xFFFFFFFF
+DEFAULT_KEY_LENGTH = len(XML_PROLOG)
+
+
+def name_hash(name):
+    """64-bit BLAKE2b of the entry name as stored in the IDX."""
+    return int.from_bytes(hashlib.blake2b(name.encode(NAME_ENCODING), digest_size=8).digest(), 'little')
+
+
+def _align(size):
+    return (size + 7) & ~7
+
+
+def write_keystore(path, records, key_length=DEFAULT_KEY_LENGTH, sources=(), description=''):
+    """
+    Write a keystore.
+
+    Args:
+        path: Output .l1rk path
+        records: iterable of dicts with name, key (bytes), optional index and source
+        key_length: Row width; longer keys are truncated, shorter ones zero padded
+        sources: Provenance labels; a record's 'source' indexes this list
+        description: Free-form provenance text
+    """
+    rows = sorted(records, key=lambda r: (r.get('index', UNKNOWN_INDEX), r['name']))
+    count = len(rows)
+
+    provenance = json.dumps({
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'description': description,
+        'sources': list(sources),
+        'names': [r['name'] for r in rows],
+    }, ensure_ascii=False).encode('utf-8')
+
+    hashes = sorted((name_hash(r['name']), row) for row, r in enumerate(rows))
+
+    out = bytearray(HEADER.pack(MAGIC, FORMAT_VERSION, key_length, count, len(provenance)))
+    out += provenance
+    out += bytes(_align(len(out)) - len(out))
+    out += struct.pack(f'<{count}I', *(r.get('index', UNKNOWN_INDEX) for r in rows))
+    out += bytes(_align(len(out)) - len(out))
+    out += struct.pack(f'<{count}Q', *(h for h, _ in hashes))
+    out += struct.pack(f'<{count}I', *(row for _, row in hashes))
+    out += bytes(_align(len(out)) - len(out))
+    for r in rows:
+        key = bytes(r['key'][:key_length])
+        out += ROW_META.pack(len(key), r.get('source', 0))
+        out += key.ljust(key_length, b'\x00')
+
+    Path(path).write_bytes(out)
+    return count
+
+
+class Keystore:
+    """
+    Read-only, memory-mapped keystore.
+
+    Usable directly as a PakArchive key_lookup:
+        with Keystore('keys.l1rk') as keys:
+            archive = PakArchive('ui.idx', key_lookup=keys.lookup)
+
+    Entries are looked up by name. Falling back to the IDX index for names
+    the keystore lacks is opt-in (by_index=True): indices shift between
+    client versions, so against another version's IDX the index row is a
+    different entry's key.
+    """
+
+    def __init__(self, path, fallback=crib_key_lookup, by_index=False):
+        self.path = Path(path)
+        self.fallback = fallback
+        self.by_index = by_index
+        self._file = open(self.path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.key_length, self.count, prov_size = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path}: not a keystore (magic {magic!r})")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{path}: unsupported keystore version {version}")
+
+        pos = HEADER.size
+        self._provenance_slice = (pos, pos + prov_size)
+        pos = _align(pos + prov_size)
+        view = memoryview(self._map)
+        self._indices = view[pos:pos + 4 * self.count].cast('I')
+        pos = _align(pos + 4 * self.count)
+        self._hashes = view[pos:pos + 8 * self.count].cast('Q')
+        pos += 8 * self.count
+        self._hash_rows = view[pos:pos + 4 * self.count].cast('I')
+        pos = _align(pos + 4 * self.count)
+        self.row_size = ROW_META.size + self.key_length
+        self._rows_start = pos
+        self._views = (view, self._indices, self._hashes, self._hash_rows)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        if self._map is None:
+            return
+        for view in reversed(self._views):
+            view.release()
+        self._map.close()
+        self._file.close()
+        self._map = None
+
+    @property
+    def provenance(self):
+        start, end = self._provenance_slice
+        return json.loads(self._map[start:end].decode('utf-8'))
+
+    def row(self, row):
+        """Return (key, source id) for a row number; key is trimmed to its valid bytes."""
+        pos = self._rows_start + row * self.row_size
+        valid, source = ROW_META.unpack_from(self._map, pos)
+        start = pos + ROW_META.size
+        return self._map[start:start + valid], source
+
+    def row_for_name(self, name):
+        target = name_hash(name)
+        slot = bisect.bisect_left(self._hashes, target)
+        if slot < self.count and self._hashes[slot] == target:
+            return self._hash_rows[slot]
+        return None
+
+    def row_for_index(self, index):
+        slot = bisect.bisect_left(self._indices, index)
+        if slot < self.count and self._indices[slot] == index:
+            return slot
+        return None
+
+    def get(self, name=None, index=None):
+        """
+        Key for an entry name, or None. The index is used when no name is
+        given, or when the name is missing and the keystore was opened with
+        by_index=True.
+        """
+        row = self.row_for_name(name) if name is not None else None
+        if row is None and index is not None and (name is None or self.by_index):
+            row = self.row_for_index(index)
+        return None if row is None else self.row(row)[0]
+
+    def lookup(self, entry, stored):
+        """PakArchive key_lookup: name (then index with by_index), then the fallback lookup."""
+        key = self.get(entry.name, entry.index)
+        if key is None and self.fallback is not None:
+            key = self.fallback(entry, stored)
+        return key
+
+    def key_matrix(self):
+        """All key rows as a (count, key_length) uint8 NumPy array view (requires numpy)."""
+        import numpy as np
+        rows = np.frombuffer(self._map, dtype=np.uint8, count=self.count * self.row_size,
+                             offset=self._rows_start).reshape(self.count, self.row_size)
+        return rows[:, ROW_META.size:]
+
+
+def records_from_scripts(directory):
+    """
+    Collect key dicts from the analysis scripts without executing them.
+
+    Any dict literal with a 'filename' and a 'key' or 'derived_key' int list
+    counts, which covers key_analysis.py, verify_keys.py, final_verification.py,
+    test_double_encryption.py, find_master_key.py and check_encrypted_data.py.
+    """
+    records = {}
+    for script in sorted(Path(directory).glob('*.py')):
+        tree = ast.parse(script.read_text(encoding='utf-8'), filename=str(script))
+        for node in ast.walk(tree):
+            if not isinstance(node, ast.Dict):
+                continue
+            try:
+                fields = {ast.literal_eval(k): v for k, v in zip(node.keys, node.values) if k is not None}
+            except ValueError:
+                continue
+            key_node = fields.get('key') or fields.get('derived_key')
+            if 'filename' not in fields or key_node is None:
+                continue
+            try:
+                record = {
+                    'name': ast.literal_eval(fields['filename']),
+                    'key': bytes(ast.literal_eval(key_node)),
+                    'origin': script.name,
+                }
+                if 'index' in fields:
+                    record['index'] = ast.literal_eval(fields['index'])
+            except (ValueError, TypeError):
+                continue
+            existing = records.setdefault(record['name'], record)
+            if 'index' in record:
+                existing.setdefault('index', record['index'])
+    return list(records.values())
+
+
+def records_from_txt(directory, key_length=DEFAULT_KEY_LENGTH):
+    """Parse key_*.txt dumps ('Analyzing: <path>' + 'Derived key' hex block)."""
+    records = []
+    for path in sorted(Path(directory).glob('key_*.txt')):
+        lines = path.read_text(encoding='utf-8', errors='replace').splitlines()
+        name = None
+        hex_bytes = []
+        collecting = False
+        for line in lines:
+            if line.startswith('Analyzing:'):
+                name = re.split(r'[\\/]', line.split(':', 1)[1].strip())[-1]
+            elif line.startswith('Derived key'):
+                collecting = True
+            elif collecting:
+                if not line.strip():
+                    break
+                hex_bytes.extend(int(part, 16) for part in line.split())
+        if name and hex_bytes:
+            records.append({'name': name, 'key': bytes(hex_bytes[:key_length]), 'origin': path.name})
+    return records
+
+
+def records_from_idx(archive):
+    """Derive keys for every entry the crib lookup can key (uncompressed XML)."""
+    records = []
+    for entry in archive.entries:
+        key = crib_key_lookup(entry, archive.raw(entry)[:len(XML_PROLOG)])
+        if key:
+            records.append({'name': entry.name, 'key': key, 'index': entry.index, 'origin': 'derived'})
+    return records
+
+
+def build(args):
+    collected = []
+    if args.from_scripts:
+        collected.extend(records_from_scripts(args.from_scripts))
+    if args.from_txt:
+        collected.extend(records_from_txt(args.from_txt, args.key_length))
+    if args.derive:
+        if not args.idx:
+            print("[!] --derive needs --idx")
+            sys.exit(1)
+        with PakArchive(args.idx) as archive:
+            collected.extend(records_from_idx(archive))
+
+    # First source wins for a name; origins become the provenance source list
+    records = {}
+    for record in collected:
+        existing = records.setdefault(record['name'], record)
+        if 'index' in record:
+            existing.setdefault('index', record['index'])
+
+    if args.idx:
+        _, entries = read_idx(args.idx)
+        indices = {entry.name: entry.index for entry in entries}
+        for record in records.values():
+            if record['name'] in indices:
+                record['index'] = indices[record['name']]
+
+    sources = sorted({record['origin'] for record in records.values()})
+    for record in records.values():
+        record['source'] = sources.index(record['origin'])
+
+    count = write_keystore(args.output, records.values(), args.key_length, sources, args.description)
+    print(f"[+] Wrote {count} keys ({args.key_length} bytes each) to {args.output}")
+    for source in sources:
+        print(f"    {source}: {sum(1 for r in records.values() if r['origin'] == source)}")
+
+
+def dump(args):
+    with Keystore(args.keystore) as keys:
+        provenance = keys.provenance
+        print(f"Keystore: {args.keystore}")
+        print(f"Keys: {keys.count}  Key length: {keys.key_length}  Created: {provenance['created']}")
+        if provenance['description']:
+            print(f"Description: {provenance['description']}")
+        print("-" * 80)
+        for row, name in enumerate(provenance['names']):
+            key, source = keys.row(row)
+            index = keys._indices[row]
+            index_text = '?' if index == UNKNOWN_INDEX else str(index)
+            print(f"{index_text:>6s}  {name:30s} {key[:16].hex(' ').upper()}  [{provenance['sources'][source]}]")
+
+
+def get(args):
+    with Keystore(args.keystore, fallback=None) as keys:
+        key = keys.get(index=int(args.entry)) if args.entry.isdigit() else keys.get(name=args.entry)
+        if key is None:
+            print(f"[!] No key for {args.entry}")
+            sys.exit(1)
+        print(key.hex(' ').upper())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build and inspect .l1rk per-entry keystores")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build_cmd = commands.add_parser('build', help="Collect keys into a keystore")
+    build_cmd.add_argument('output', help="Output .l1rk path")
+    build_cmd.add_argument('--from-scripts', help="Directory of analysis scripts holding key lists")
+    build_cmd.add_argument('--from-txt', help="Directory of key_*.txt dumps")
+    build_cmd.add_argument('--idx', help="IDX used to fill in entry indices")
+    build_cmd.add_argument('--derive', action='store_true', help="Also derive keys of uncompressed XML entries from --idx")
+    build_cmd.add_argument('--key-length', type=int, default=DEFAULT_KEY_LENGTH)
+    build_cmd.add_argument('--description', default='', help="Provenance note stored in the header")
+
+    dump_cmd = commands.add_parser('dump', help="List every key")
+    dump_cmd.add_argument('keystore')
+
+    get_cmd = commands.add_parser('get', help="Print one key by entry name or IDX index")
+    get_cmd.add_argument('keystore')
+    get_cmd.add_argument('entry')
+
+    args = parser.parse_args()
+    {'build': build, 'dump': dump, 'get': get}[args.command](args)
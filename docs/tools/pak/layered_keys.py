@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Precomposed multi-layer XOR keys.
+
+test_double_encryption.py decrypts in two full XOR passes (file-specific key,
+then master key, and the reverse) and find_master_key.py builds further
+intermediate buffers. Because XOR layers commute, any stack of repeating keys
+collapses into one repeating keystream whose period is the lcm of the layer
+lengths:
+
+    combined[i] = key_a[i % len_a] ^ key_b[i % len_b] ^ ...
+
+This module builds that keystream once per entry and caches it, so a layered
+scheme decrypts in a single xor_repeat() pass however many layers it has.
+
+Usage:
+  python layered_keys.py <key_hex> <key_hex> [...] [--decrypt in.bin --output out.bin]
+"""
+
+import argparse
+import math
+import sys
+from collections import OrderedDict
+from pathlib import Path
+
+from pak_format import xor_repeat
+
+# Combined keystreams longer than this are only built up to the entry size
+DEFAULT_MAX_PERIOD = 1 << 20
+
+
+def combined_period(keys):
+    period = 1
+    for key in keys:
+        period = math.lcm(period, len(key))
+    return period
+
+
+def compose(keys, phases=None, limit=None):
+    """
+    Collapse repeating XOR keys into one keystream.
+
+    Args:
+        keys: sequence of non-empty bytes keys
+        phases: optional per-key start offset (key position lined up with byte 0)
+        limit: cap on the returned length; the result is then a prefix of the
+               full period and is only valid for payloads up to that length
+
+    Returns:
+        bytes of length lcm(len(k) for k in keys), or limit if smaller
+    """
+    if not keys:
+        raise ValueError("compose() needs at least one key")
+    phases = phases or [0] * len(keys)
+    length = combined_period(keys)
+    if limit is not None:
+        length = min(length, limit)
+
+    stream = bytes(length)
+    for key, phase in zip(keys, phases):
+        stream = xor_repeat(stream, key, phase)
+    return stream
+
+
+class LayeredKeyLookup:
+    """
+    PakArchive key_lookup that stacks several key layers.
+
+    Each layer is either fixed bytes (a master key shared by all entries) or
+    a key_lookup callable (entry, stored) -> key (a keystore, the prolog crib).
+    The composed keystream is cached per entry, so repeated reads of the same
+    entry cost one dictionary hit.
+
+    Usage:
+        layers = LayeredKeyLookup(MASTER_KEY, keystore.lookup)
+        archive = PakArchive('ui.idx', key_lookup=layers)
+    """
+
+    def __init__(self, *layers, max_period=DEFAULT_MAX_PERIOD, cache_size=4096):
+        if not layers:
+            raise ValueError("LayeredKeyLookup needs at least one layer")
+        self.layers = layers
+        self.max_period = max_period
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+
+    def __call__(self, entry, stored):
+        cache_key = (entry.name, entry.index)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            self._cache.move_to_end(cache_key)
+            return cached
+
+        keys = []
+        for layer in self.layers:
+            key = layer(entry, stored) if callable(layer) else layer
+            if not key:
+                return None
+            keys.append(bytes(key))
+
+        limit = None if combined_period(keys) <= self.max_period else max(entry.stored_size, 1)
+        combined = compose(keys, limit=limit)
+
+        self._cache[cache_key] = combined
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return combined
+
+    def clear(self):
+        self._cache.clear()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compose repeating XOR keys into one keystream")
+    parser.add_argument('keys', nargs='+', help="Layer keys as hex (spaces allowed inside quotes)")
+    parser.add_argument('--decrypt', help="File to decrypt in one pass with the combined key")
+    parser.add_argument('--output', help="Where to write the decrypted file")
+    args = parser.parse_args()
+
+    try:
+        layers = [bytes.fromhex(text) for text in args.keys]
+    except ValueError as e:
+        print(f"[!] Bad hex key: {e}")
+        sys.exit(1)
+    if any(not layer for layer in layers):
+        print("[!] Empty key")
+        sys.exit(1)
+
+    combined = compose(layers)
+    print(f"Layers: {', '.join(str(len(layer)) for layer in layers)} bytes")
+    print(f"Combined period: {len(combined)} bytes")
+    print(f"Combined key (first 64 bytes): {combined[:64].hex(' ').upper()}")
+
+    if args.decrypt:
+        data = Path(args.decrypt).read_bytes()
+        plain = xor_repeat(data, combined)
+        output = Path(args.output) if args.output else Path(args.decrypt).with_suffix('.dec')
+        output.write_bytes(plain)
+        print(f"[+] Decrypted {len(data)} bytes in one pass -> {output}")
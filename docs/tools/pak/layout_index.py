@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Streaming index of decrypted UI XML layouts: elements, attributes, textures,
+fonts and CSB references, and which layouts use them.
+
+Replaces reading 100-300 byte previews of 2k_ChatUI.xml or MainMenuUI.xml by
+hand. Every XML entry is decrypted and inflated chunk by chunk
+(PakArchive.open()) straight into ElementTree.iterparse(); each element is
+cleared once its end tag is seen, so memory per layout stays constant however
+large the file is. Entries are parsed in a process pool.
+
+Each layout contributes rows (kind, key, value, count) to a SQLite index:
+
+  element     tag name
+  attribute   attribute name and value (values without letters, such as
+              coordinates and colours, are counted under the name only)
+  texture     image attribute values (.png .jpg .pvr .plist .webp ...)
+  font        font files and font-named attributes (.ttf .otf .fnt)
+  csb         referenced .csb layouts
+
+With --client, every archive of a client_index.py index is built, each under
+its IDX path relative to the client (without .idx, after --label/ when
+given) and with the keystore the client index recorded for it.
+
+Usage:
+  python layout_index.py <index.sqlite> build <ui.idx> [--keystore keys.l1rk] [--label ui] [--workers N]
+  python layout_index.py <index.sqlite> build --client client.sqlite [--label v2]
+  python layout_index.py <index.sqlite> find texture ui/common/button_1.png
+  python layout_index.py <index.sqlite> find attribute text=확인      (value may use % wildcards)
+  python layout_index.py <index.sqlite> find attribute type=ListView
+  python layout_index.py <index.sqlite> show Chat\\2k_ChatUI.xml
+  python layout_index.py <index.sqlite> top texture [--limit 20]
+"""
+
+import argparse
+import sqlite3
+import sys
+import time
+import xml.etree.ElementTree as ET
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from instrument import DISABLED, add_profile_arguments, finish_profile, profiler_from_args
+from pak_format import NoKeyError, PakArchive
+
+KINDS = ('element', 'attribute', 'texture', 'font', 'csb')
+TEXTURE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.pvr', '.pvr.ccz', '.plist', '.webp', '.tga', '.bmp')
+FONT_EXTENSIONS = ('.ttf', '.otf', '.fnt', '.ttc')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS layouts (
+    id INTEGER PRIMARY KEY,
+    label TEXT NOT NULL,
+    name TEXT NOT NULL,
+    elements INTEGER NOT NULL,
+    depth INTEGER NOT NULL,
+    error TEXT,
+    UNIQUE (label, name)
+);
+CREATE TABLE IF NOT EXISTS refs (
+    layout INTEGER NOT NULL REFERENCES layouts(id),
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    count INTEGER NOT NULL
+);
+"""
+REF_INDEXES = {
+    'refs_by_value': 'refs(kind, value)',
+    'refs_by_key': 'refs(kind, key, value)',
+    'refs_by_layout': 'refs(layout)',
+}
+
+_archive = None
+
+
+def _open_worker(idx_path, pak_path, keystore_path):
+    """Process pool initializer: each worker maps the PAK (and keystore) once."""
+    global _archive
+    lookup = {}
+    if keystore_path:
+        from keystore import Keystore
+        lookup['key_lookup'] = Keystore(keystore_path).lookup
+    _archive = PakArchive(idx_path, pak_path, **lookup)
+
+
+def classify(attribute, value):
+    """Reference kind of an attribute value: texture, font, csb or None."""
+    lower = value.lower()
+    if lower.endswith('.csb'):
+        return 'csb'
+    if lower.endswith(FONT_EXTENSIONS) or ('font' in attribute.lower() and not lower.replace('.', '').isdigit()):
+        return 'font'
+    if lower.endswith(TEXTURE_EXTENSIONS):
+        return 'texture'
+    return None
+
+
+def scan_layout(stream):
+    """
+    Parse one XML layout from a binary stream in constant memory.
+
+    Returns:
+        (Counter of (kind, key, value), element count, maximum depth)
+    """
+    refs = Counter()
+    elements = 0
+    depth = max_depth = 0
+    root = None
+    for event, element in ET.iterparse(stream, events=('start', 'end')):
+        if event == 'start':
+            depth += 1
+            max_depth = max(max_depth, depth)
+            if root is None:
+                root = element
+            elements += 1
+            refs['element', element.tag, ''] += 1
+            for attribute, value in element.attrib.items():
+                kind = classify(attribute, value)
+                if kind:
+                    refs[kind, attribute, value] += 1
+                refs['attribute', attribute, value if any(char.isalpha() for char in value) else ''] += 1
+            continue
+        depth -= 1
+        element.clear()
+        if depth == 1:
+            # Cleared children stay attached to the root; drop them too
+            root.clear()
+    return refs, elements, max_depth
+
+
+def index_entry(index):
+    """Stream-parse one entry; runs inside a pool worker."""
+    entry = _archive.entries[index]
+    result = {'name': entry.name, 'bytes': entry.size, 'refs': [], 'elements': 0, 'depth': 0, 'error': None}
+    try:
+        with _archive.open(entry) as stream:
+            refs, result['elements'], result['depth'] = scan_layout(stream)
+        result['refs'] = [(kind, key, value, count) for (kind, key, value), count in refs.items()]
+    except NoKeyError:
+        result['error'] = 'no key'
+    except Exception as exc:  # malformed XML, corrupt payload: recorded, not fatal
+        result['error'] = f"{type(exc).__name__}: {exc}"
+    return result
+
+
+class LayoutIndex:
+    """SQLite database of layouts and the references they contain."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.db = sqlite3.connect(self.path)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SCHEMA)
+        self.create_indexes()
+
+    def create_indexes(self):
+        for name, columns in REF_INDEXES.items():
+            self.db.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {columns}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+    def build(self, idx_path, pak_path=None, keystore_path=None, label=None, workers=None, profiler=DISABLED):
+        """
+        (Re)index every XML entry of an archive under a label.
+
+        Returns:
+            stats dict (layouts, elements, refs, errors, bytes)
+        """
+        label = label or Path(idx_path).stem
+        with PakArchive(idx_path, pak_path) as archive:
+            jobs = [entry.index for entry in archive.entries if entry.name.lower().endswith('.xml')]
+            total_bytes = sum(archive.entries[index].size for index in jobs)
+
+        stats = {'layouts': 0, 'elements': 0, 'refs': 0, 'errors': 0, 'bytes': total_bytes}
+        stale = [row[0] for row in self.db.execute("SELECT id FROM layouts WHERE label = ?", (label,))]
+        self.db.executemany("DELETE FROM refs WHERE layout = ?", ((layout,) for layout in stale))
+        self.db.execute("DELETE FROM layouts WHERE label = ?", (label,))
+        # Bulk loading without the indexes and rebuilding them afterwards is about twice as fast
+        for name in REF_INDEXES:
+            self.db.execute(f"DROP INDEX IF EXISTS {name}")
+
+        with profiler.stage('parse', bytes=total_bytes, entries=len(jobs)), \
+                ProcessPoolExecutor(max_workers=workers, initializer=_open_worker,
+                                    initargs=(idx_path, pak_path, keystore_path)) as pool:
+            for result in pool.map(index_entry, jobs, chunksize=32):
+                layout = self.db.execute(
+                    "INSERT INTO layouts (label, name, elements, depth, error) VALUES (?, ?, ?, ?, ?)",
+                    (label, result['name'], result['elements'], result['depth'], result['error'])).lastrowid
+                self.db.executemany("INSERT INTO refs VALUES (?, ?, ?, ?, ?)",
+                                    ((layout, *ref) for ref in result['refs']))
+                stats['layouts'] += 1
+                stats['elements'] += result['elements']
+                stats['refs'] += len(result['refs'])
+                stats['errors'] += result['error'] is not None
+        with profiler.stage('create_indexes'):
+            self.create_indexes()
+            self.db.commit()
+        return stats
+
+    def find(self, kind, value, limit=200):
+        """
+        Layouts using a reference.
+
+        For 'attribute', value is "name=value" or just "name"; values may use
+        SQL LIKE wildcards (%). For 'element' the value is the tag; for the
+        other kinds, the referenced path (wildcards allowed).
+
+        Returns:
+            [{'label', 'layout', 'key', 'value', 'count'}, ...]
+        """
+        if kind == 'attribute':
+            key, _, value = value.partition('=')
+            where, params = "r.kind = 'attribute' AND r.key = ?", [key]
+            if value:
+                where += " AND r.value LIKE ?" if '%' in value else " AND r.value = ?"
+                params.append(value)
+        elif kind == 'element':
+            where, params = "r.kind = 'element' AND r.key = ?", [value]
+        else:
+            where = f"r.kind = ? AND r.value {'LIKE' if '%' in value else '='} ?"
+            params = [kind, value]
+        rows = self.db.execute(
+            f"SELECT l.label, l.name, r.key, r.value, r.count FROM refs AS r JOIN layouts AS l ON l.id = r.layout "
+            f"WHERE {where} ORDER BY r.count DESC, l.name LIMIT ?", (*params, limit))
+        return [{'label': label, 'layout': name, 'key': key, 'value': value, 'count': count}
+                for label, name, key, value, count in rows]
+
+    def show(self, name):
+        """Everything one layout references, per kind: {label: {kind: [(key, value, count), ...]}}."""
+        layouts = {}
+        for layout, label, elements, depth, error in self.db.execute(
+                "SELECT id, label, elements, depth, error FROM layouts WHERE name = ? COLLATE NOCASE",
+                (name.replace('/', '\\'),)):
+            refs = {}
+            for kind, key, value, count in self.db.execute(
+                    "SELECT kind, key, value, count FROM refs WHERE layout = ? ORDER BY kind, count DESC, key",
+                    (layout,)):
+                refs.setdefault(kind, []).append((key, value, count))
+            layouts[label] = {'elements': elements, 'depth': depth, 'error': error, 'refs': refs}
+        return layouts
+
+    def top(self, kind, limit=20):
+        """Most used values of a kind: [(key or value, layouts, total count), ...]."""
+        column = 'key' if kind == 'element' else 'value'
+        return self.db.execute(
+            f"SELECT {column}, COUNT(DISTINCT layout), SUM(count) FROM refs WHERE kind = ? AND {column} != '' "
+            f"GROUP BY {column} ORDER BY COUNT(DISTINCT layout) DESC, SUM(count) DESC LIMIT ?",
+            (kind, limit)).fetchall()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Streaming, queryable index of UI XML layouts")
+    parser.add_argument('index', help="SQLite index file (created if missing)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build', help="Index every XML entry of an archive")
+    build.add_argument('idx', nargs='?', help="Path to the .idx file")
+    build.add_argument('--client', help="client_index.py index: build every archive of the client")
+    build.add_argument('--pak', help="Path to the .pak file (default: next to the .idx)")
+    build.add_argument('--keystore', help="Per-entry .l1rk keystore (default: XML prolog keys only)")
+    build.add_argument('--label', help="Name for this archive's layouts (default: IDX file stem)")
+    build.add_argument('--workers', type=int, help="Process pool size (default: CPU count)")
+    add_profile_arguments(build)
+
+    find = commands.add_parser('find', help="Layouts using an element, attribute, texture, font or CSB")
+    find.add_argument('kind', choices=KINDS)
+    find.add_argument('value', help="Tag, name[=value], or path; % is a wildcard")
+    find.add_argument('--limit', type=int, default=200)
+
+    show = commands.add_parser('show', help="Everything one layout references")
+    show.add_argument('name', help="Entry name, e.g. Chat\\2k_ChatUI.xml")
+
+    top = commands.add_parser('top', help="Most used values of a kind")
+    top.add_argument('kind', choices=KINDS)
+    top.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    with LayoutIndex(args.index) as index:
+        if args.command == 'build':
+            if bool(args.idx) == bool(args.client):
+                parser.error("build takes an IDX file or --client")
+            for path in (args.idx, args.client, args.keystore):
+                if path and not Path(path).exists():
+                    print(f"[!] File not found: {path}")
+                    sys.exit(1)
+            profiler = profiler_from_args(args)
+            if args.client:
+                from client_index import ClientIndex
+                targets = []
+                with ClientIndex(args.client) as client:
+                    for path, idx_path, pak_path, keystore in client.pairs():
+                        label = Path(path).with_suffix('').as_posix()
+                        targets.append((f"{args.label}/{label}" if args.label else label, idx_path, pak_path,
+                                        keystore))
+            else:
+                targets = [(args.label, args.idx, args.pak, args.keystore)]
+            totals = {}
+            for label, idx_path, pak_path, keystore in targets:
+                stats = index.build(idx_path, pak_path, keystore, label, args.workers, profiler)
+                print(f"[+] {label or Path(idx_path).stem}: {stats['layouts']} layouts "
+                      f"({stats['bytes'] / 1024 / 1024:.1f} MB), {stats['elements']} elements, "
+                      f"{stats['refs']} index rows, {stats['errors']} errors")
+                for name, value in stats.items():
+                    totals[name] = totals.get(name, 0) + value
+            finish_profile(profiler, args, stats=totals)
+        elif args.command == 'find':
+            hits = index.find(args.kind, args.value, args.limit)
+            for hit in hits:
+                detail = hit['key'] if args.kind == 'element' else f"{hit['key']}={hit['value']}"
+                print(f"{hit['count']:6d}  {hit['label']}:{hit['layout']}  {detail}")
+            print(f"[*] {len(hits)} layouts")
+        elif args.command == 'show':
+            layouts = index.show(args.name)
+            if not layouts:
+                print(f"[!] Layout not indexed: {args.name}")
+                sys.exit(1)
+            for label, layout in layouts.items():
+                print("=" * 80)
+                print(f"{label}:{args.name}  {layout['elements']} elements, depth {layout['depth']}"
+                      + (f"  [!] {layout['error']}" if layout['error'] else ''))
+                print("=" * 80)
+                for kind in KINDS:
+                    rows = layout['refs'].get(kind, [])
+                    if rows:
+                        print(f"\n{kind} ({len(rows)}):")
+                        for key, value, count in rows:
+                            shown = key if kind == 'element' else (f"{key}={value}" if value else key)
+                            print(f"  {count:5d}  {shown}")
+        else:
+            for value, layouts, total in index.top(args.kind, args.limit):
+                print(f"{layouts:6d} layouts {total:8d} uses  {value}")
+
+    print(f"[*] Completed in {time.perf_counter() - started:.2f}s")
@@ -0,0 +1,493 @@
+#!/usr/bin/env python3
+"""
+Entry-granular binary delta patches between two IDX/PAK versions.
+
+PatchEngine (src/LineageLauncher.Patcher) has no delta format yet, so a UI
+change ships a whole new ui.pak. A patch built here carries, per entry of the
+new archive, the cheapest of
+
+  same    unchanged stored bytes under the same name (runs of old IDX
+          indices; nothing else is shipped)
+  copy    stored bytes identical to another old entry (moved or renamed)
+  delta   COPY/ADD operations against the old entry's plaintext, from
+          block-hash matching (rsync-style anchors extended byte-wise)
+  full    the whole plaintext (new entries, or when a delta is not smaller)
+  raw     the stored bytes as-is (no key known on either side)
+
+Deltas are computed on plaintext, so a one-line edit in a flag=2 entry does
+not turn into a whole new ZLIB stream. On apply, plaintext is rebuilt,
+checked against its BLAKE2b digest, deflated at the level the new archive
+used (detected at create time, so the result is byte-identical when the
+level is one zlib reproduces; entries it cannot reproduce ship raw) and
+encrypted with the entry key carried in the patch. The whole patch body is
+LZMA-compressed: downloads scale with the edit, not the archive.
+
+Apply writes a new IDX/PAK, copying unchanged payloads from the old one. The
+patch records the new archive's layout - payload offsets that do not follow
+back to back, IDX compressed_size values, and the PAK bytes no payload
+covers (the preamble and slack, taken from the old PAK where they match) -
+so the pair is reproduced exactly, then checked against BLAKE2b digests of
+the new IDX and PAK. With --in-place, apply patches the old pair through
+PakPatcher instead, leaving unchanged entries untouched (possible when the
+new archive keeps every old entry at its index, e.g. edits plus appended
+entries). Every changed payload is rebuilt and checked before the first
+write, and then appended, never written over live ones.
+
+Usage:
+  python pak_delta.py create <old.idx> <new.idx> <patch.l1rp> [--old-keystore k.l1rk] [--new-keystore k.l1rk]
+  python pak_delta.py apply <patch.l1rp> <old.idx> [--output new.idx | --in-place]
+  python pak_delta.py info <patch.l1rp>
+"""
+
+import argparse
+import hashlib
+import json
+import lzma
+import struct
+import sys
+import time
+from pathlib import Path
+
+from pak_format import (FLAG_ZLIB, STREAM_CHUNK, IdxEntry, NoKeyError, PakArchive, PakPatcher, decode_payload,
+                        default_pak_path, encode_payload, read_idx_prefix, write_idx)
+
+MAGIC = b'L1RP'
+FORMAT_VERSION = 2
+PATCH_HEADER = struct.Struct('<4sI')
+BLOCK = 32
+# Matching is compared in slices of this size before falling back to single bytes
+EXTEND_STEP = 64
+ZLIB_LEVELS = (6, 9, 1, 2, 3, 4, 5, 7, 8)
+# Per-operation cost used to decide whether a delta beats shipping the plaintext
+OP_COST = 8
+
+
+def digest(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def file_digest(path):
+    blake = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(STREAM_CHUNK), b''):
+            blake.update(chunk)
+    return blake.hexdigest()
+
+
+def _read_span(handle, start, length):
+    handle.seek(start)
+    return handle.read(length)
+
+
+def _extend(a, i, b, j):
+    """Length of the common run of a[i:] and b[j:]."""
+    length = 0
+    limit = min(len(a) - i, len(b) - j)
+    while length + EXTEND_STEP <= limit and a[i + length:i + length + EXTEND_STEP] == \
+            b[j + length:j + length + EXTEND_STEP]:
+        length += EXTEND_STEP
+    while length < limit and a[i + length] == b[j + length]:
+        length += 1
+    return length
+
+
+def make_delta(old, new, block=BLOCK):
+    """
+    COPY/ADD operations that rebuild `new` from `old`.
+
+    Old is cut into aligned blocks indexed by content; new is scanned byte by
+    byte through unmatched regions only, and every block hit is extended in
+    both directions, so matched regions cost one comparison pass.
+
+    Returns:
+        (ops, literal bytes): ops are (old offset, length) copies, with offset
+        -1 meaning the next `length` literal bytes
+    """
+    ops = []
+    literal = bytearray()
+    anchors = {}
+    for i in range(0, len(old) - block + 1, block):
+        anchors.setdefault(old[i:i + block], i)
+
+    pending = 0
+    j = 0
+    while j <= len(new) - block:
+        i = anchors.get(new[j:j + block])
+        if i is None:
+            j += 1
+            continue
+        # Extend backwards over bytes not yet emitted
+        while j > pending and i > 0 and old[i - 1] == new[j - 1]:
+            i -= 1
+            j -= 1
+        length = _extend(old, i, new, j)
+        if j > pending:
+            ops.append((-1, j - pending))
+            literal += new[pending:j]
+        if ops and ops[-1][0] >= 0 and ops[-1][0] + ops[-1][1] == i:
+            ops[-1] = (ops[-1][0], ops[-1][1] + length)
+        else:
+            ops.append((i, length))
+        j += length
+        pending = j
+    if pending < len(new):
+        ops.append((-1, len(new) - pending))
+        literal += new[pending:]
+    return ops, bytes(literal)
+
+
+def apply_delta(old, ops, literal):
+    out = bytearray()
+    pos = 0
+    for offset, length in ops:
+        if offset < 0:
+            out += literal[pos:pos + length]
+            pos += length
+        else:
+            out += old[offset:offset + length]
+    return bytes(out)
+
+
+def zlib_level(plain, key, stored):
+    """The ZLIB level that reproduces a flag=2 payload byte for byte, or None."""
+    for level in ZLIB_LEVELS:
+        if encode_payload(plain, key, FLAG_ZLIB, level) == stored:
+            return level
+    return None
+
+
+def _key(archive, entry, stored):
+    try:
+        return bytes(archive.key(entry, stored))
+    except NoKeyError:
+        return None
+
+
+def create_patch(old_idx, new_idx, patch_path, old_lookup=None, new_lookup=None, block=BLOCK):
+    """
+    Build a patch that turns old into new.
+
+    Returns:
+        stats dict (per-action counts, patch and new PAK sizes)
+    """
+    data = bytearray()
+    records = []
+    stats = {'same': 0, 'copy': 0, 'delta': 0, 'full': 0, 'raw': 0}
+    old_args = {'key_lookup': old_lookup} if old_lookup else {}
+    new_args = {'key_lookup': new_lookup} if new_lookup else {}
+
+    with PakArchive(old_idx, **old_args) as old, PakArchive(new_idx, **new_args) as new:
+        old_digests = {}
+        for entry in old.entries:
+            old_digests.setdefault(digest(old.raw(entry)), entry)
+
+        for entry in new.entries:
+            stored = new.raw(entry)
+            record = {'name': entry.name, 'flag': entry.flag, 'size': entry.size}
+            base = old.by_name.get(entry.name)
+            stored_digest = digest(stored)
+            if base is not None and base.flag == entry.flag and old.raw(base) == stored:
+                stats['same'] += 1
+                previous = records[-1] if records else None
+                if previous and previous['action'] == 'same' and previous['first'] + previous['count'] == base.index:
+                    previous['count'] += 1
+                else:
+                    records.append({'action': 'same', 'first': base.index, 'count': 1})
+                continue
+            if stored_digest in old_digests:
+                record.update(action='copy', base=old_digests[stored_digest].name, digest=stored_digest)
+            else:
+                key = _key(new, entry, stored)
+                if key is None:
+                    record.update(action='raw', length=len(stored))
+                    data += stored
+                else:
+                    plain = new.read(entry)
+                    record.update(key=key.hex(), plain=digest(plain))
+                    if entry.flag == FLAG_ZLIB:
+                        record['level'] = zlib_level(plain, key, stored)
+                    if record.get('level', 0) is None:
+                        # zlib cannot reproduce this stream: ship it as stored
+                        for field in ('key', 'plain', 'level'):
+                            del record[field]
+                        record.update(action='raw', length=len(stored))
+                        data += stored
+                        stats['raw'] += 1
+                        records.append(record)
+                        continue
+                    ops = None
+                    base_key = _key(old, base, old.raw(base)) if base is not None else None
+                    if base_key is not None:
+                        base_stored = old.raw(base)
+                        ops, literal = make_delta(old.read(base), plain, block)
+                        if len(literal) + OP_COST * len(ops) >= len(plain):
+                            ops = None
+                    if ops is not None:
+                        record.update(action='delta', base=base.name, base_key=base_key.hex(),
+                                      digest=digest(base_stored), ops=ops, length=len(literal))
+                        data += literal
+                    else:
+                        record.update(action='full', length=len(plain))
+                        data += plain
+            stats[record['action']] += 1
+            records.append(record)
+
+        header = {
+            'version': FORMAT_VERSION,
+            'old': {'idx': Path(old_idx).name, 'entries': len(old.entries), 'digest': digest(Path(old_idx).read_bytes())},
+            'new': {'idx': Path(new_idx).name, 'entries': len(new.entries), 'field2': new.header.field2,
+                    'field3': new.header.field3, 'prefix': read_idx_prefix(new_idx).hex(),
+                    'pak_bytes': new.pak_path.stat().st_size, 'layout': pak_layout(old, new, data),
+                    'idx_digest': file_digest(new_idx), 'pak_digest': file_digest(new.pak_path)},
+            'entries': records,
+        }
+    meta = json.dumps(header, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    body = lzma.compress(struct.pack('<I', len(meta)) + meta + bytes(data), preset=9 | lzma.PRESET_EXTREME)
+    Path(patch_path).write_bytes(PATCH_HEADER.pack(MAGIC, FORMAT_VERSION) + body)
+    stats.update(patch_bytes=PATCH_HEADER.size + len(body), new_pak_bytes=header['new']['pak_bytes'])
+    return stats
+
+
+def pak_layout(old, new, data):
+    """
+    What apply needs beyond the payloads to reproduce new's IDX/PAK exactly.
+
+    Returns:
+        dict of 'offsets' ([index, offset] where an entry does not start right
+        after the previous one), 'compressed' ([index, compressed_size] where
+        it differs from what PakWriter would record) and 'gaps' ([start,
+        length, data offset] for PAK bytes outside every payload; data offset
+        -1 means the old PAK holds the same bytes there). Shipped gap bytes
+        are appended to `data`.
+    """
+    offsets, compressed, spans = [], [], []
+    position = None
+    for entry in new.entries:
+        if entry.offset != position:
+            offsets.append([entry.index, entry.offset])
+        if entry.compressed_size != (entry.stored_size if entry.flag == FLAG_ZLIB else 0):
+            compressed.append([entry.index, entry.compressed_size])
+        position = entry.offset + entry.stored_size
+        if entry.stored_size:
+            spans.append((entry.offset, position))
+
+    pak_bytes = new.pak_path.stat().st_size
+    holes = []
+    covered = 0
+    for start, end in sorted(spans):
+        if start > covered:
+            holes.append((covered, start - covered))
+        covered = max(covered, end)
+    if pak_bytes > covered:
+        holes.append((covered, pak_bytes - covered))
+
+    gaps = []
+    with open(old.pak_path, 'rb') as old_pak, open(new.pak_path, 'rb') as new_pak:
+        for start, length in holes:
+            span = _read_span(new_pak, start, length)
+            if _read_span(old_pak, start, length) == span:
+                gaps.append([start, length, -1])
+            else:
+                gaps.append([start, length, len(data)])
+                data += span
+    return {'offsets': offsets, 'compressed': compressed, 'gaps': gaps}
+
+
+def read_patch(patch_path):
+    """(header dict, data bytes) of a patch file."""
+    raw = Path(patch_path).read_bytes()
+    magic, version = PATCH_HEADER.unpack_from(raw, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{patch_path}: not a PAK patch (magic {magic!r})")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"{patch_path}: unsupported patch version {version}")
+    body = lzma.decompress(raw[PATCH_HEADER.size:])
+    (meta_size,) = struct.unpack_from('<I', body, 0)
+    header = json.loads(body[4:4 + meta_size].decode('utf-8'))
+    return header, memoryview(body)[4 + meta_size:]
+
+
+def expand(records, old_entries):
+    """One (record, data offset) per new entry, in order; 'same' runs expand to the old entries they name."""
+    pos = 0
+    for record in records:
+        if record['action'] == 'same':
+            for base in old_entries[record['first']:record['first'] + record['count']]:
+                yield {'action': 'same', 'name': base.name, 'base': base.name, 'flag': base.flag,
+                       'size': base.size}, pos
+            continue
+        yield record, pos
+        pos += record.get('length', 0)
+
+
+def rebuild(record, source, data, pos):
+    """
+    Stored payload for one expanded patch record.
+
+    Args:
+        source: the old archive (PakArchive or PakPatcher)
+        data: patch data stream; pos: offset of this record's bytes in it
+
+    Returns:
+        (stored bytes, plaintext size)
+    """
+    action = record['action']
+    if action in ('same', 'copy', 'delta'):
+        base = source.by_name.get(record['base'])
+        if base is None:
+            raise ValueError(f"{record['name']}: base entry {record['base']} missing from the old archive")
+        base_stored = source.raw(base)
+        if action != 'same' and digest(base_stored) != record['digest']:
+            raise ValueError(f"{record['name']}: old entry {record['base']} does not match the patch")
+        if action != 'delta':
+            return base_stored, record['size']
+    if action == 'raw':
+        return bytes(data[pos:pos + record['length']]), record['size']
+
+    literal = bytes(data[pos:pos + record['length']])
+    if action == 'delta':
+        old_plain = decode_payload(base_stored, bytes.fromhex(record['base_key']), base.flag)
+        plain = apply_delta(old_plain, record['ops'], literal)
+    else:
+        plain = literal
+    if digest(plain) != record['plain']:
+        raise ValueError(f"{record['name']}: rebuilt plaintext does not match the patch digest")
+    level = record.get('level') or 6
+    return encode_payload(plain, bytes.fromhex(record['key']), record['flag'], level), len(plain)
+
+
+def apply_patch(patch_path, old_idx, output_idx=None, in_place=False):
+    """
+    Apply a patch to an old archive: into a new IDX/PAK pair, or in place.
+
+    Returns:
+        stats dict (entries, kept, written, bytes)
+    """
+    header, data = read_patch(patch_path)
+    if digest(Path(old_idx).read_bytes()) != header['old']['digest']:
+        raise ValueError(f"{old_idx} is not the archive this patch was made from ({header['old']['idx']})")
+    stats = {'entries': header['new']['entries'], 'kept': 0, 'written': 0, 'bytes': 0}
+
+    if in_place:
+        with PakPatcher(old_idx) as patcher:
+            records = list(expand(header['entries'], patcher.entries))
+            names = [entry.name for entry in patcher.entries]
+            if [record['name'] for record, _ in records[:len(names)]] != names:
+                raise ValueError("--in-place needs every old entry at its old index; write a new archive instead")
+            # Rebuild and check every payload against the untouched old entries before the first write:
+            # a copy or delta may name as its base an entry the patch also replaces
+            changed = []
+            for record, pos in records:
+                if record['action'] == 'same':
+                    stats['kept'] += 1
+                    continue
+                changed.append((record, *rebuild(record, patcher, data, pos)))
+            for record, stored, size in changed:
+                entry = patcher.by_name.get(record['name'])
+                if entry is None:
+                    patcher.add(record['name'], stored, size, record['flag'])
+                else:
+                    patcher.replace(entry, stored, size, record['flag'])
+                stats['written'] += 1
+                stats['bytes'] += len(stored)
+        return stats
+
+    new = header['new']
+    layout = new['layout']
+    offsets = dict(layout['offsets'])
+    compressed = dict(layout['compressed'])
+    output_idx = Path(output_idx)
+    output_pak = default_pak_path(output_idx)
+    output_idx.parent.mkdir(parents=True, exist_ok=True)
+    entries = []
+    with PakArchive(old_idx) as old, open(old.pak_path, 'rb') as old_pak, open(output_pak, 'wb') as pak:
+        for start, length, pos in layout['gaps']:
+            span = _read_span(old_pak, start, length) if pos < 0 else data[pos:pos + length]
+            pak.seek(start)
+            pak.write(span)
+        offset = None
+        for index, (record, pos) in enumerate(expand(header['entries'], old.entries)):
+            stored, size = rebuild(record, old, data, pos)
+            offset = offsets.get(index, offset)
+            pak.seek(offset)
+            pak.write(stored)
+            compressed_size = compressed.get(index, len(stored) if record['flag'] == FLAG_ZLIB else 0)
+            entries.append(IdxEntry(index, record['name'], offset, size, compressed_size, record['flag']))
+            offset += len(stored)
+            stats['kept' if record['action'] in ('same', 'copy') else 'written'] += 1
+            stats['bytes'] += len(stored)
+        pak.truncate(new['pak_bytes'])
+    write_idx(output_idx, entries, new['field2'], new['field3'], bytes.fromhex(new['prefix']))
+
+    for path, expected in ((output_idx, new['idx_digest']), (output_pak, new['pak_digest'])):
+        if file_digest(path) != expected:
+            raise ValueError(f"{path} does not match the new archive ({new['idx']}) the patch was made for")
+    return stats
+
+
+def _lookup(path):
+    if not path:
+        return None
+    from keystore import Keystore
+    return Keystore(path).lookup
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Entry-granular delta patches between IDX/PAK versions")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    create = commands.add_parser('create', help="Build a patch from old to new")
+    create.add_argument('old_idx')
+    create.add_argument('new_idx')
+    create.add_argument('patch', help="Output patch file (.l1rp)")
+    create.add_argument('--old-keystore', help="Keystore for the old archive (default: XML prolog keys only)")
+    create.add_argument('--new-keystore', help="Keystore for the new archive (default: XML prolog keys only)")
+    create.add_argument('--block', type=int, default=BLOCK, help="Anchor block size for delta matching")
+
+    apply = commands.add_parser('apply', help="Apply a patch to the old archive")
+    apply.add_argument('patch')
+    apply.add_argument('old_idx')
+    target = apply.add_mutually_exclusive_group(required=True)
+    target.add_argument('--output', help="New .idx to write (the .pak goes next to it)")
+    target.add_argument('--in-place', action='store_true', help="Patch the old IDX/PAK pair itself")
+
+    info = commands.add_parser('info', help="Summarise a patch")
+    info.add_argument('patch')
+    args = parser.parse_args()
+
+    inputs = {'create': ('old_idx', 'new_idx', 'old_keystore', 'new_keystore'), 'apply': ('patch', 'old_idx'),
+              'info': ('patch',)}[args.command]
+    for name in inputs:
+        path = getattr(args, name)
+        if path and not Path(path).exists():
+            print(f"[!] File not found: {path}")
+            sys.exit(1)
+
+    started = time.perf_counter()
+    if args.command == 'create':
+        stats = create_patch(args.old_idx, args.new_idx, args.patch, _lookup(args.old_keystore),
+                             _lookup(args.new_keystore), args.block)
+        print(f"[+] {args.patch}: {stats['patch_bytes']} bytes "
+              f"({stats['patch_bytes'] / max(stats['new_pak_bytes'], 1):.2%} of the new PAK)")
+        print("    " + ', '.join(f"{action} {stats[action]}" for action in ('same', 'copy', 'delta', 'full', 'raw')))
+    elif args.command == 'apply':
+        try:
+            stats = apply_patch(args.patch, args.old_idx, args.output, args.in_place)
+        except ValueError as exc:
+            print(f"[!] {exc}")
+            sys.exit(2)
+        print(f"[+] {stats['entries']} entries: {stats['kept']} kept, {stats['written']} rebuilt "
+              f"-> {args.old_idx if args.in_place else args.output}")
+    else:
+        header, data = read_patch(args.patch)
+        counts = {}
+        for record in header['entries']:
+            counts[record['action']] = counts.get(record['action'], 0) + record.get('count', 1)
+        print(f"{header['old']['idx']} ({header['old']['entries']} entries) -> "
+              f"{header['new']['idx']} ({header['new']['entries']} entries)")
+        print(f"Actions: {', '.join(f'{action} {count}' for action, count in sorted(counts.items()))}")
+        layout = header['new']['layout']
+        print(f"Layout: {len(layout['offsets'])} placed offsets, {len(layout['gaps'])} gaps "
+              f"({sum(gap[1] for gap in layout['gaps'] if gap[2] >= 0)} bytes shipped)")
+        print(f"Patch data: {len(data)} bytes uncompressed, {Path(args.patch).stat().st_size} on disk")
+    print(f"[*] Completed in {time.perf_counter() - started:.2f}s")
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Structural and content diff between two IDX/PAK versions.
+
+Joins the two IDX tables on the name column with NumPy, then hashes only the
+payloads that can still change the answer:
+  - added/removed entries whose stored size appears on both sides (move detection)
+  - every common entry, in parallel, when --content is given (same-size edits)
+Payloads are read through the memory-mapped PAK; nothing is extracted.
+
+Requires numpy.
+
+Usage:
+  python pak_diff.py <old.idx> <new.idx> [--content] [--output diff.json] [--profile profile.json]
+"""
+
+import argparse
+import hashlib
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from instrument import DISABLED, add_profile_arguments, finish_profile, profiler_from_args
+from pak_format import NAME_ENCODING, IdxEntry, PakArchive, read_idx_table, stored_sizes
+
+
+def payload_digest(archive, entry):
+    return hashlib.blake2b(archive.raw(entry), digest_size=16).hexdigest()
+
+
+def hash_rows(archive, table, rows, workers=None):
+    """
+    Hash the stored payloads of the given table rows on a thread pool.
+
+    hashlib releases the GIL for large buffers, so threads scale across cores
+    while sharing the one PAK mapping.
+    """
+    def digest(row):
+        record = table[row]
+        entry = IdxEntry(int(row), '', int(record['offset']), int(record['size']),
+                         int(record['compressed_size']), int(record['flag']))
+        return payload_digest(archive, entry)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(zip((int(r) for r in rows), pool.map(digest, rows)))
+
+
+def decode(name):
+    return name.decode(NAME_ENCODING, errors='replace')
+
+
+def diff_archives(old_idx, new_idx, content=False, workers=None, profiler=DISABLED):
+    """
+    Compare two archives.
+
+    Args:
+        old_idx, new_idx: Paths to the .idx files (the .pak is found next to each)
+        content: Hash every common entry, not only those with metadata changes
+        workers: Hashing thread count
+        profiler: instrument.Profiler for per-stage timings
+
+    Returns:
+        dict with added, removed, modified and moved lists plus counters
+    """
+    with PakArchive(old_idx) as old, PakArchive(new_idx) as new:
+        with profiler.stage('read_idx') as stage:
+            _, old_table = read_idx_table(old_idx)
+            _, new_table = read_idx_table(new_idx)
+            stage.add(entries=len(old_table) + len(new_table))
+        old_stored = stored_sizes(old_table)
+        new_stored = stored_sizes(new_table)
+
+        # Vectorised join on the name column
+        with profiler.stage('join', entries=len(old_table) + len(new_table)):
+            _, old_common, new_common = np.intersect1d(old_table['name'], new_table['name'],
+                                                       assume_unique=False, return_indices=True)
+            removed_rows = np.flatnonzero(~np.isin(old_table['name'], new_table['name']))
+            added_rows = np.flatnonzero(~np.isin(new_table['name'], old_table['name']))
+
+        o = old_table[old_common]
+        n = new_table[new_common]
+        meta_changed = (o['size'] != n['size']) | (o['compressed_size'] != n['compressed_size']) | (o['flag'] != n['flag'])
+
+        modified = []
+        for oi, ni in zip(old_common[meta_changed], new_common[meta_changed]):
+            reasons = [field for field in ('size', 'compressed_size', 'flag')
+                       if old_table[oi][field] != new_table[ni][field]]
+            modified.append({
+                'name': decode(new_table[ni]['name']),
+                'reason': reasons,
+                'old_size': int(old_table[oi]['size']),
+                'new_size': int(new_table[ni]['size']),
+                'old_flag': int(old_table[oi]['flag']),
+                'new_flag': int(new_table[ni]['flag']),
+            })
+
+        hashed = 0
+        if content:
+            same_old = old_common[~meta_changed]
+            same_new = new_common[~meta_changed]
+            with profiler.stage('hash_content', bytes=int(old_stored[same_old].sum() + new_stored[same_new].sum()),
+                                entries=len(same_old) + len(same_new)):
+                old_hashes = hash_rows(old, old_table, same_old, workers)
+                new_hashes = hash_rows(new, new_table, same_new, workers)
+            hashed += len(same_old) + len(same_new)
+            for oi, ni in zip(same_old, same_new):
+                if old_hashes[int(oi)] != new_hashes[int(ni)]:
+                    modified.append({
+                        'name': decode(new_table[ni]['name']),
+                        'reason': ['content'],
+                        'old_size': int(old_table[oi]['size']),
+                        'new_size': int(new_table[ni]['size']),
+                        'old_flag': int(old_table[oi]['flag']),
+                        'new_flag': int(new_table[ni]['flag']),
+                    })
+
+        # Moves: a removed and an added entry with identical stored bytes.
+        # Only sizes present on both sides can match, so hash just those.
+        candidates_old = removed_rows[np.isin(old_stored[removed_rows], new_stored[added_rows])]
+        candidates_new = added_rows[np.isin(new_stored[added_rows], old_stored[removed_rows])]
+        moved_bytes = int(old_stored[candidates_old].sum() + new_stored[candidates_new].sum())
+        with profiler.stage('hash_moves', bytes=moved_bytes, entries=len(candidates_old) + len(candidates_new)):
+            old_hashes = hash_rows(old, old_table, candidates_old, workers)
+            new_hashes = hash_rows(new, new_table, candidates_new, workers)
+        hashed += len(candidates_old) + len(candidates_new)
+
+        by_hash = {}
+        for row, digest in old_hashes.items():
+            by_hash.setdefault(digest, []).append(row)
+        moved = []
+        moved_old, moved_new = set(), set()
+        for row, digest in sorted(new_hashes.items()):
+            if by_hash.get(digest):
+                source = by_hash[digest].pop(0)
+                moved.append({'from': decode(old_table[source]['name']), 'to': decode(new_table[row]['name'])})
+                moved_old.add(source)
+                moved_new.add(row)
+
+        added = [decode(new_table[row]['name']) for row in added_rows if int(row) not in moved_new]
+        removed = [decode(old_table[row]['name']) for row in removed_rows if int(row) not in moved_old]
+
+    modified.sort(key=lambda item: item['name'])
+    return {
+        'old': str(old_idx),
+        'new': str(new_idx),
+        'content_compared': content,
+        'old_entries': len(old_table),
+        'new_entries': len(new_table),
+        'unchanged': len(old_common) - len(modified),
+        'payloads_hashed': hashed,
+        'added': sorted(added),
+        'removed': sorted(removed),
+        'modified': modified,
+        'moved': moved,
+    }
+
+
+def print_report(report):
+    print("=" * 80)
+    print("PAK DIFF")
+    print("=" * 80)
+    print(f"Old: {report['old']} ({report['old_entries']} entries)")
+    print(f"New: {report['new']} ({report['new_entries']} entries)")
+    mode = "full content" if report['content_compared'] else "metadata + move detection"
+    print(f"Mode: {mode}, {report['payloads_hashed']} payloads hashed")
+    print()
+
+    for name in report['added']:
+        print(f"  + {name}")
+    for name in report['removed']:
+        print(f"  - {name}")
+    for item in report['modified']:
+        print(f"  M {item['name']} ({', '.join(item['reason'])}: {item['old_size']} -> {item['new_size']})")
+    for item in report['moved']:
+        print(f"  R {item['from']} -> {item['to']}")
+
+    print()
+    print(f"Added: {len(report['added'])}  Removed: {len(report['removed'])}  "
+          f"Modified: {len(report['modified'])}  Moved: {len(report['moved'])}  "
+          f"Unchanged: {report['unchanged']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Diff two IDX/PAK archive versions")
+    parser.add_argument('old_idx', help="Old .idx file")
+    parser.add_argument('new_idx', help="New .idx file")
+    parser.add_argument('--content', action='store_true',
+                        help="Hash every common entry to catch same-size edits")
+    parser.add_argument('--workers', type=int, help="Hashing threads (default: CPU count)")
+    parser.add_argument('--output', help="Write the report as JSON")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    for path in (args.old_idx, args.new_idx):
+        if not Path(path).exists():
+            print(f"[!] File not found: {path}")
+            sys.exit(1)
+
+    profiler = profiler_from_args(args)
+    started = time.perf_counter()
+    report = diff_archives(args.old_idx, args.new_idx, args.content, args.workers, profiler)
+    print_report(report)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding='utf-8')
+        print(f"\n[+] Report written to {args.output}")
+    print(f"[*] Completed in {time.perf_counter() - started:.2f}s")
+    finish_profile(profiler, args)
@@ -0,0 +1,568 @@
+#!/usr/bin/env python3
+"""
+Shared IDX/PAK archive reader, writer and patcher (no repack) for the Lineage PAK tools.
+
+IDX layout (see docs/pak-editor/ARCHITECTURE.md):
+  - Header (16 bytes): magic "ARMS", file count, two unknown int32 fields
+  - 8-byte prefix (unknown purpose)
+  - Entries (276 bytes each): 260-byte null-terminated name followed by
+    offset, uncompressed size, compressed size and compression flag
+
+Entry payloads are stored back to back in the PAK file. The stored size of an
+entry is its compressed size when flag=2 (ZLIB) and its plain size otherwise.
+
+Payloads are XOR encrypted with a repeating per-entry key (38 bytes for the
+keys recovered so far, see docs/analysis/pak_analysis/ANALYSIS_REPORT.md),
+applied on top of the ZLIB stream for flag=2 entries:
+  stored = XOR(key, zlib(plain))   flag=2
+  stored = XOR(key, plain)         flag=0
+"""
+
+import io
+import mmap
+import os
+import struct
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+
+IDX_MAGIC = b'ARMS'
+IDX_HEADER = struct.Struct('<4sIII')
+IDX_PREFIX_SIZE = 8
+IDX_DATA_START = IDX_HEADER.size + IDX_PREFIX_SIZE
+# The shipped ui.pak's first payload starts at 0x27D, not at 0
+PAK_DATA_START = 0x27D
+
+ENTRY_SIZE = 276
+NAME_SIZE = 260
+ENTRY_META = struct.Struct('<IIII')
+
+FLAG_STORED = 0
+FLAG_ZLIB = 2
+
+STREAM_CHUNK = 64 * 1024
+
+NAME_ENCODING = 'cp949'
+
+# Known plaintext every UI XML file starts with
+XML_PROLOG = b'<?xml version="1.0" encoding="UTF-8"?>'
+
+IDX_DTYPE = [
+    ('name', f'S{NAME_SIZE}'),
+    ('offset', '<u4'),
+    ('size', '<u4'),
+    ('compressed_size', '<u4'),
+    ('flag', '<u4'),
+]
+
+
+@dataclass
+class IdxEntry:
+    """One 276-byte IDX record."""
+    index: int
+    name: str
+    offset: int
+    size: int
+    compressed_size: int
+    flag: int
+
+    @property
+    def is_compressed(self):
+        return self.flag == FLAG_ZLIB
+
+    @property
+    def stored_size(self):
+        """Number of payload bytes the entry occupies in the PAK file."""
+        return self.compressed_size if self.is_compressed else self.size
+
+
+@dataclass
+class IdxHeader:
+    magic: bytes
+    file_count: int
+    field2: int
+    field3: int
+
+
+def read_idx(idx_path):
+    """
+    Parse an IDX file.
+
+    Args:
+        idx_path: Path to .idx file
+
+    Returns:
+        (IdxHeader, list of IdxEntry). Reading stops at EOF when the header
+        claims more entries than the file contains (ui.pak claims 3579 but
+        holds 3578).
+    """
+    data = Path(idx_path).read_bytes()
+    if len(data) < IDX_DATA_START:
+        raise ValueError(f"{idx_path}: too short for an IDX header")
+
+    header = IdxHeader(*IDX_HEADER.unpack_from(data, 0))
+    if header.magic != IDX_MAGIC:
+        raise ValueError(f"{idx_path}: bad magic {header.magic!r}, expected {IDX_MAGIC!r}")
+
+    entries = []
+    available = (len(data) - IDX_DATA_START) // ENTRY_SIZE
+    for index in range(min(header.file_count, available)):
+        pos = IDX_DATA_START + index * ENTRY_SIZE
+        raw_name = data[pos:pos + NAME_SIZE].split(b'\x00', 1)[0]
+        offset, size, compressed_size, flag = ENTRY_META.unpack_from(data, pos + NAME_SIZE)
+        entries.append(IdxEntry(index, raw_name.decode(NAME_ENCODING, errors='replace'),
+                                offset, size, compressed_size, flag))
+
+    return header, entries
+
+
+def read_idx_prefix(idx_path):
+    """The 8 unknown bytes between the IDX header and the first entry."""
+    with open(idx_path, 'rb') as f:
+        f.seek(IDX_HEADER.size)
+        return f.read(IDX_PREFIX_SIZE)
+
+
+def read_idx_table(idx_path):
+    """
+    Parse an IDX file into a NumPy structured array (requires numpy).
+
+    Columns are name (bytes), offset, size, compressed_size and flag, one row
+    per entry in IDX order, so whole-archive metadata can be filtered and
+    joined without a Python loop.
+
+    Returns:
+        (IdxHeader, structured ndarray)
+    """
+    import numpy as np
+
+    data = Path(idx_path).read_bytes()
+    if len(data) < IDX_DATA_START:
+        raise ValueError(f"{idx_path}: too short for an IDX header")
+    header = IdxHeader(*IDX_HEADER.unpack_from(data, 0))
+    if header.magic != IDX_MAGIC:
+        raise ValueError(f"{idx_path}: bad magic {header.magic!r}, expected {IDX_MAGIC!r}")
+
+    count = min(header.file_count, (len(data) - IDX_DATA_START) // ENTRY_SIZE)
+    table = np.frombuffer(data, dtype=IDX_DTYPE, count=count, offset=IDX_DATA_START).copy()
+    # Anything after the first NUL in the 260-byte name field is padding
+    names = np.frombuffer(data, dtype=np.uint8, count=count * ENTRY_SIZE,
+                          offset=IDX_DATA_START).reshape(count, ENTRY_SIZE)[:, :NAME_SIZE]
+    names = np.where(np.cumsum(names == 0, axis=1) > 0, 0, names).astype(np.uint8)
+    table['name'] = names.view(f'S{NAME_SIZE}').ravel()
+    return header, table
+
+
+def stored_sizes(table):
+    """Per-row PAK payload sizes for a read_idx_table() array."""
+    import numpy as np
+    return np.where(table['flag'] == FLAG_ZLIB, table['compressed_size'], table['size'])
+
+
+def archive_name(relative_path):
+    """Convert a path relative to an extracted tree into an IDX entry name."""
+    return str(relative_path).replace('/', '\\')
+
+
+def local_path(name):
+    """Convert an IDX entry name (backslash separated) into a relative Path."""
+    return Path(*name.split('\\'))
+
+
+class NoKeyError(LookupError):
+    """Raised when no decryption key is known for an entry."""
+
+
+def xor_repeat(data, key, phase=0):
+    """
+    XOR data with a repeating key.
+
+    Uses one big-integer XOR instead of a per-byte Python loop, which is
+    roughly two orders of magnitude faster on multi-KB entries.
+
+    Args:
+        data: bytes-like payload
+        key: repeating key
+        phase: key position that lines up with data[0]
+    """
+    length = len(data)
+    if not length:
+        return b''
+    phase %= len(key)
+    stream = (key[phase:] + key * (length // len(key) + 1))[:length]
+    mixed = int.from_bytes(data, 'little') ^ int.from_bytes(stream, 'little')
+    return mixed.to_bytes(length, 'little')
+
+
+def derive_key(stored, crib=XML_PROLOG):
+    """Known-plaintext key recovery: the first len(crib) ciphertext bytes XOR the crib."""
+    if len(stored) < len(crib):
+        return None
+    return xor_repeat(stored[:len(crib)], crib)
+
+
+def decode_payload(stored, key, flag):
+    """Decrypt a stored payload and inflate it when flag=2."""
+    body = xor_repeat(stored, key)
+    return zlib.decompress(body) if flag == FLAG_ZLIB else body
+
+
+def iter_payload(stored, key, flag, chunk_size=STREAM_CHUNK):
+    """
+    Streaming decode_payload(): yields plaintext in pieces of at most
+    chunk_size bytes, decrypting and inflating chunk_size bytes at a time, so
+    memory stays bounded however large the entry is.
+    """
+    inflater = zlib.decompressobj() if flag == FLAG_ZLIB else None
+    for start in range(0, len(stored), chunk_size):
+        body = xor_repeat(stored[start:start + chunk_size], key, start)
+        if inflater is None:
+            yield body
+            continue
+        while body:
+            piece = inflater.decompress(body, chunk_size)
+            if piece:
+                yield piece
+            body = inflater.unconsumed_tail
+    if inflater is not None:
+        tail = inflater.flush()
+        if tail:
+            yield tail
+        if not inflater.eof:
+            raise zlib.error("incomplete or truncated ZLIB stream")
+
+
+class PayloadReader(io.RawIOBase):
+    """Read-only file object over iter_payload(), for parsers that take a stream."""
+
+    def __init__(self, stored, key, flag, chunk_size=STREAM_CHUNK):
+        self._pieces = iter_payload(stored, key, flag, chunk_size)
+        self._pending = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pending:
+            self._pending = next(self._pieces, None)
+            if self._pending is None:
+                self._pending = b''
+                return 0
+        count = min(len(buffer), len(self._pending))
+        buffer[:count] = self._pending[:count]
+        self._pending = self._pending[count:]
+        return count
+
+
+def encode_payload(plain, key, flag, level=6):
+    """Inverse of decode_payload(): deflate when flag=2, then encrypt."""
+    body = zlib.compress(plain, level) if flag == FLAG_ZLIB else plain
+    return xor_repeat(body, key)
+
+
+def crib_key_lookup(entry, stored):
+    """
+    Default key source: derive the key of uncompressed XML entries from the
+    XML prolog. Returns None when the entry cannot be keyed this way.
+    """
+    if entry.flag == FLAG_STORED and entry.name.lower().endswith('.xml'):
+        return derive_key(stored)
+    return None
+
+
+def default_pak_path(idx_path):
+    return Path(idx_path).with_suffix('.pak')
+
+
+class PakArchive:
+    """
+    An IDX/PAK pair with the PAK memory-mapped for random payload access.
+
+    Usage:
+        with PakArchive('ui.idx') as archive:
+            for entry in archive.entries:
+                stored = archive.raw(entry)
+                plain = archive.read(entry)
+
+    key_lookup(entry, stored) supplies per-entry keys; the default derives
+    keys for uncompressed XML entries from the XML prolog.
+    """
+
+    def __init__(self, idx_path, pak_path=None, key_lookup=crib_key_lookup):
+        self.idx_path = Path(idx_path)
+        self.key_lookup = key_lookup
+        self.pak_path = Path(pak_path) if pak_path else default_pak_path(idx_path)
+        self.header, self.entries = read_idx(self.idx_path)
+        self.by_name = {entry.name: entry for entry in self.entries}
+
+        self._file = open(self.pak_path, 'rb')
+        size = self.pak_path.stat().st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def raw(self, entry):
+        """Return the stored (still encrypted) payload bytes of an entry."""
+        end = entry.offset + entry.stored_size
+        if self._map is None or end > len(self._map):
+            raise ValueError(f"{entry.name}: payload 0x{entry.offset:X}+{entry.stored_size} "
+                             f"runs past end of {self.pak_path}")
+        return self._map[entry.offset:end]
+
+    def preamble(self):
+        """Return the PAK bytes ahead of the first payload (see PakWriter)."""
+        starts = [entry.offset for entry in self.entries if entry.stored_size]
+        end = min(starts) if starts else len(self._map or b'')
+        return self._map[:end] if self._map is not None else b''
+
+    def key(self, entry, stored=None):
+        """Return the decryption key for an entry, or raise NoKeyError."""
+        key = self.key_lookup(entry, self.raw(entry) if stored is None else stored)
+        if not key:
+            raise NoKeyError(f"No key for {entry.name}")
+        return key
+
+    def read(self, entry):
+        """Return the decrypted, inflated plaintext of an entry."""
+        if isinstance(entry, str):
+            entry = self.by_name[entry]
+        stored = self.raw(entry)
+        return decode_payload(stored, self.key(entry, stored), entry.flag)
+
+    def open(self, entry, chunk_size=STREAM_CHUNK):
+        """Binary file object streaming an entry's plaintext (see iter_payload())."""
+        if isinstance(entry, str):
+            entry = self.by_name[entry]
+        stored = self.raw(entry)
+        return io.BufferedReader(PayloadReader(stored, self.key(entry, stored), entry.flag, chunk_size))
+
+
+def write_idx(idx_path, entries, field2=0, field3=0, prefix=bytes(IDX_PREFIX_SIZE)):
+    """
+    Write an IDX file for a list of IdxEntry records, in list order.
+
+    The two unknown header fields and the 8-byte prefix are written as given
+    (zero by default); pass header.field2/field3 from read_idx() to keep an
+    original's values.
+    """
+    data = bytearray(IDX_DATA_START + ENTRY_SIZE * len(entries))
+    IDX_HEADER.pack_into(data, 0, IDX_MAGIC, len(entries), field2, field3)
+    data[IDX_HEADER.size:IDX_DATA_START] = prefix
+    for index, entry in enumerate(entries):
+        pos = IDX_DATA_START + index * ENTRY_SIZE
+        raw_name = entry.name.encode(NAME_ENCODING)
+        if len(raw_name) >= NAME_SIZE:
+            raise ValueError(f"{entry.name}: name longer than {NAME_SIZE - 1} bytes")
+        data[pos:pos + len(raw_name)] = raw_name
+        ENTRY_META.pack_into(data, pos + NAME_SIZE, entry.offset, entry.size, entry.compressed_size, entry.flag)
+    Path(idx_path).write_bytes(data)
+
+
+class PakWriter:
+    """
+    Write a new IDX/PAK pair. The PAK starts with `preamble` (PAK_DATA_START
+    zero bytes by default, as in the shipped ui.pak; a repack passes the
+    source's PakArchive.preamble()), then payloads are appended back to back,
+    so every entry's offset is the preamble length plus the stored sizes
+    before it. Uncompressed (flag=0) entries are recorded with
+    compressed_size 0, as the client writes them. The IDX is written on
+    close().
+
+    Usage:
+        with PakWriter('ui.idx') as writer:
+            writer.add_plain('MainMenuUI.xml', plain, key, FLAG_STORED)
+    """
+
+    def __init__(self, idx_path, pak_path=None, field2=0, field3=0, prefix=bytes(IDX_PREFIX_SIZE),
+                 preamble=bytes(PAK_DATA_START)):
+        self.idx_path = Path(idx_path)
+        self.pak_path = Path(pak_path) if pak_path else default_pak_path(idx_path)
+        self.field2 = field2
+        self.field3 = field3
+        self.prefix = prefix
+        self.entries = []
+        self._file = open(self.pak_path, 'wb')
+        self._file.write(preamble)
+        self.offset = len(preamble)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add(self, name, stored, size, flag):
+        """Append an already encoded payload; size is the plaintext size."""
+        compressed_size = len(stored) if flag == FLAG_ZLIB else 0
+        entry = IdxEntry(len(self.entries), name, self.offset, size, compressed_size, flag)
+        self._file.write(stored)
+        self.offset += len(stored)
+        self.entries.append(entry)
+        return entry
+
+    def add_plain(self, name, plain, key, flag, level=6):
+        """Encode (deflate for flag=2, then encrypt) and append a plaintext entry."""
+        return self.add(name, encode_payload(plain, key, flag, level), len(plain), flag)
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._file.close()
+        write_idx(self.idx_path, self.entries, self.field2, self.field3, self.prefix)
+
+
+class PakPatcher:
+    """
+    Patch entries of an existing IDX/PAK pair without a repack.
+
+    A replacement payload is appended to the end of the PAK and the entry's
+    16-byte IDX record is then rewritten to point at it. Payload bytes always
+    reach the PAK before the IDX points at them, so until the record is
+    written the old payload is intact and the old record still valid: an
+    interrupted patch loses the edit, never the entry.
+
+    in_place=True writes a payload over the old one when it fits, which
+    avoids growing the PAK but overwrites bytes the IDX still points at
+    until the record follows. A crash in between leaves the old record
+    (size, flag) over new bytes - a corrupt entry. It therefore requires
+    sync=True, which fsyncs the payload and then the record to keep that
+    window as short as possible; it cannot close it.
+
+    Slack left behind by moved or shrunk payloads is only reclaimed by a full
+    repack (PakWriter).
+
+    Usage:
+        with PakPatcher('ui.idx', key_lookup=keys.lookup) as patcher:
+            entry = patcher.by_name['MainMenuUI.xml']
+            patcher.replace_plain(entry, plain, patcher.key(entry))
+    """
+
+    def __init__(self, idx_path, pak_path=None, key_lookup=crib_key_lookup, sync=False, in_place=False):
+        if in_place and not sync:
+            raise ValueError("in_place patching overwrites live payloads and needs sync=True")
+        self.idx_path = Path(idx_path)
+        self.pak_path = Path(pak_path) if pak_path else default_pak_path(idx_path)
+        self.key_lookup = key_lookup
+        self.sync = sync
+        self.in_place = in_place
+        self.header, self.entries = read_idx(self.idx_path)
+        self.by_name = {entry.name: entry for entry in self.entries}
+        self._idx = open(self.idx_path, 'r+b')
+        self._pak = open(self.pak_path, 'r+b')
+        self.end = self._pak.seek(0, 2)
+        self.stats = {'in_place': 0, 'appended': 0, 'added': 0, 'slack': 0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self._idx.closed:
+            return
+        self._pak.close()
+        self._idx.close()
+
+    def raw(self, entry):
+        """Current stored payload of an entry."""
+        self._pak.seek(entry.offset)
+        stored = self._pak.read(entry.stored_size)
+        if len(stored) != entry.stored_size:
+            raise ValueError(f"{entry.name}: payload 0x{entry.offset:X}+{entry.stored_size} "
+                             f"runs past end of {self.pak_path}")
+        return stored
+
+    def preamble(self):
+        """Return the PAK bytes ahead of the first payload (see PakWriter)."""
+        starts = [entry.offset for entry in self.entries if entry.stored_size]
+        self._pak.seek(0)
+        return self._pak.read(min(starts) if starts else self.end)
+
+    def key(self, entry, stored=None):
+        """Return the decryption key for an entry, or raise NoKeyError."""
+        key = self.key_lookup(entry, self.raw(entry) if stored is None else stored)
+        if not key:
+            raise NoKeyError(f"No key for {entry.name}")
+        return key
+
+    def read(self, entry):
+        stored = self.raw(entry)
+        return decode_payload(stored, self.key(entry, stored), entry.flag)
+
+    def _flush(self, handle):
+        handle.flush()
+        if self.sync:
+            os.fsync(handle.fileno())
+
+    def _write_payload(self, stored, offset):
+        self._pak.seek(offset)
+        self._pak.write(stored)
+        self._flush(self._pak)
+
+    def _write_record(self, entry, name=False):
+        pos = IDX_DATA_START + entry.index * ENTRY_SIZE
+        if name:
+            raw_name = entry.name.encode(NAME_ENCODING)
+            if len(raw_name) >= NAME_SIZE:
+                raise ValueError(f"{entry.name}: name longer than {NAME_SIZE - 1} bytes")
+            self._idx.seek(pos)
+            self._idx.write(raw_name.ljust(NAME_SIZE, b'\x00'))
+        self._idx.seek(pos + NAME_SIZE)
+        self._idx.write(ENTRY_META.pack(entry.offset, entry.size, entry.compressed_size, entry.flag))
+        self._flush(self._idx)
+
+    def replace(self, entry, stored, size, flag=None):
+        """Point an entry at a new, already encoded payload; size is the plaintext size."""
+        if self.in_place and len(stored) <= entry.stored_size:
+            offset = entry.offset
+            self.stats['in_place'] += 1
+            self.stats['slack'] += entry.stored_size - len(stored)
+        else:
+            offset = self.end
+            self.stats['appended'] += 1
+            self.stats['slack'] += entry.stored_size
+        self._write_payload(stored, offset)
+        self.end = max(self.end, offset + len(stored))
+        entry.offset = offset
+        entry.size = size
+        if flag is not None:
+            entry.flag = flag
+        entry.compressed_size = len(stored) if entry.flag == FLAG_ZLIB else 0
+        self._write_record(entry)
+        return entry
+
+    def replace_plain(self, entry, plain, key, level=6):
+        """Encode (deflate for flag=2, then encrypt) and patch in a new plaintext."""
+        return self.replace(entry, encode_payload(plain, key, entry.flag, level), len(plain))
+
+    def add(self, name, stored, size, flag):
+        """Append a new entry: payload at the end of the PAK, record at the end of the IDX."""
+        if name in self.by_name:
+            raise ValueError(f"{name}: already in {self.idx_path}")
+        compressed_size = len(stored) if flag == FLAG_ZLIB else 0
+        entry = IdxEntry(len(self.entries), name, self.end, size, compressed_size, flag)
+        self._write_payload(stored, self.end)
+        self.end += len(stored)
+        self._write_record(entry, name=True)
+        self.entries.append(entry)
+        self.by_name[name] = entry
+        self.header.file_count = max(self.header.file_count, len(self.entries))
+        self._idx.seek(0)
+        self._idx.write(IDX_HEADER.pack(IDX_MAGIC, self.header.file_count, self.header.field2, self.header.field3))
+        self._flush(self._idx)
+        self.stats['added'] += 1
+        return entry
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+pathlib-style read-only view over an IDX/PAK pair, in the manner of zipfile.Path.
+
+Entry names are backslash separated (Chat\\2k_ChatUI.xml); here every
+backslash is a directory level, so scripts walk an archive like a
+filesystem instead of building Windows paths from hard-coded name lists:
+
+    root = PakPath('ui.idx', key_lookup=keys.lookup)
+    for layout in root.glob('Chat/*.xml'):
+        print(layout, layout.stat().st_size)
+    text = (root / 'Chat' / '2k_ChatUI.xml').read_text()
+    with (root / 'Common' / 'Button.csb').open('rb') as f:
+        header = f.read(16)
+
+Nothing happens up front: the archive is opened on first use, the directory
+tree is built from the IDX names the first time a directory is listed or
+tested, and payloads are decrypted only by read_bytes() / read_text() /
+open() - open() streams the entry through PakArchive.open(), so large entries
+are never held in memory whole. Both '/' and '\\' separate parts in the paths
+given to joinpath(), '/' and glob().
+
+Usage:
+  python pak_path.py <ui.idx> [pattern] [--keystore keys.l1rk] [--long]
+"""
+
+import argparse
+import fnmatch
+import io
+import os
+import posixpath
+import re
+import stat as stat_module
+import sys
+from pathlib import Path
+
+from pak_format import PakArchive, crib_key_lookup
+
+
+class _Root:
+    """The archive and directory tree shared by every PakPath of one archive."""
+
+    def __init__(self, idx_path, pak_path=None, key_lookup=crib_key_lookup):
+        self.idx_path = Path(idx_path)
+        self.pak_path = pak_path
+        self.key_lookup = key_lookup
+        self._archive = None
+        self._tree = None
+
+    @property
+    def archive(self):
+        if self._archive is None:
+            self._archive = PakArchive(self.idx_path, self.pak_path, key_lookup=self.key_lookup)
+        return self._archive
+
+    @property
+    def tree(self):
+        """{directory: {child name: entry, or None for a subdirectory}}, '' being the root."""
+        if self._tree is None:
+            tree = {'': {}}
+            for entry in self.archive.entries:
+                parts = entry.name.split('\\')
+                directory = ''
+                for part in parts[:-1]:
+                    child = f"{directory}/{part}" if directory else part
+                    tree[directory].setdefault(part, None)
+                    tree.setdefault(child, {})
+                    directory = child
+                tree[directory][parts[-1]] = entry
+            self._tree = tree
+        return self._tree
+
+    def close(self):
+        if self._archive is not None:
+            self._archive.close()
+            self._archive = None
+
+
+def _normalize(at):
+    return '/'.join(part for part in re.split(r'[\\/]+', at) if part and part != '.')
+
+
+def _glob_parts(pattern, parts):
+    """Whether path parts match pattern parts; '**' matches any number of parts."""
+    if not pattern:
+        return not parts
+    if pattern[0] == '**':
+        return any(_glob_parts(pattern[1:], parts[skip:]) for skip in range(len(parts) + 1))
+    return bool(parts) and fnmatch.fnmatchcase(parts[0], pattern[0]) and _glob_parts(pattern[1:], parts[1:])
+
+
+class PakPath:
+    """
+    A file or directory inside an archive.
+
+    Args:
+        root: IDX path, or another PakPath to share its archive
+        at: Path inside the archive ('' for the root)
+        pak_path: PAK file (default: next to the IDX)
+        key_lookup: Per-entry key source, as for PakArchive
+    """
+
+    def __init__(self, root, at='', pak_path=None, key_lookup=crib_key_lookup):
+        self._root = root._root if isinstance(root, PakPath) else _Root(root, pak_path, key_lookup)
+        self.at = _normalize(at)
+
+    def __repr__(self):
+        return f"PakPath({str(self._root.idx_path)!r}, {self.at!r})"
+
+    def __str__(self):
+        return posixpath.join(self._root.idx_path.as_posix(), self.at) if self.at else self._root.idx_path.as_posix()
+
+    def __eq__(self, other):
+        return isinstance(other, PakPath) and self._root is other._root and self.at == other.at
+
+    def __hash__(self):
+        return hash((id(self._root), self.at))
+
+    def __truediv__(self, other):
+        return self.joinpath(other)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Close the underlying archive (shared by every path derived from this root)."""
+        self._root.close()
+
+    def _child(self, at):
+        path = PakPath.__new__(PakPath)
+        path._root = self._root
+        path.at = at
+        return path
+
+    def joinpath(self, *other):
+        return self._child(_normalize('/'.join([self.at, *map(str, other)])))
+
+    @property
+    def name(self):
+        return self.at.rsplit('/', 1)[-1]
+
+    @property
+    def suffix(self):
+        return posixpath.splitext(self.name)[1]
+
+    @property
+    def stem(self):
+        return posixpath.splitext(self.name)[0]
+
+    @property
+    def parent(self):
+        return self._child(self.at.rsplit('/', 1)[0] if '/' in self.at else '')
+
+    @property
+    def parts(self):
+        return tuple(self.at.split('/')) if self.at else ()
+
+    @property
+    def archive_name(self):
+        """The backslash-separated IDX entry name."""
+        return self.at.replace('/', '\\')
+
+    @property
+    def entry(self):
+        """The IdxEntry of a file, or None for directories and missing paths."""
+        return self._root.archive.by_name.get(self.archive_name) if self.at else None
+
+    def is_file(self):
+        return self.entry is not None
+
+    def is_dir(self):
+        return self.at in self._root.tree
+
+    def exists(self):
+        return self.is_file() or self.is_dir()
+
+    def iterdir(self):
+        children = self._root.tree.get(self.at)
+        if children is None:
+            raise NotADirectoryError(str(self)) if self.is_file() else FileNotFoundError(str(self))
+        prefix = f"{self.at}/" if self.at else ''
+        return (self._child(prefix + name) for name in children)
+
+    def _walk(self):
+        """Every file and directory below this directory, depth first."""
+        for child in self.iterdir():
+            yield child
+            if child.at in self._root.tree:
+                yield from child._walk()
+
+    def glob(self, pattern):
+        """Paths below this directory matching a glob pattern ('*', '?', '[...]', '**')."""
+        wanted = _normalize(pattern).split('/')
+        base = len(self.parts)
+        if '**' not in wanted and not any(char in ''.join(wanted[:-1]) for char in '*?['):
+            # Literal directories: list only the one directory the pattern names
+            directory = self.joinpath(*wanted[:-1])
+            if not directory.is_dir():
+                return iter(())
+            return (path for path in directory.iterdir() if fnmatch.fnmatchcase(path.name, wanted[-1]))
+        return (path for path in self._walk() if _glob_parts(wanted, path.parts[base:]))
+
+    def rglob(self, pattern):
+        return self.glob(f"**/{pattern}")
+
+    def match(self, pattern):
+        wanted = _normalize(pattern).split('/')
+        return fnmatch.fnmatchcase(self.at, '/'.join(wanted)) if '**' not in wanted \
+            else _glob_parts(wanted, list(self.parts))
+
+    def _require_entry(self):
+        entry = self.entry
+        if entry is None:
+            raise IsADirectoryError(str(self)) if self.is_dir() else FileNotFoundError(str(self))
+        return entry
+
+    def read_bytes(self):
+        return self._root.archive.read(self._require_entry())
+
+    def read_text(self, encoding='utf-8', errors='strict'):
+        return self.read_bytes().decode(encoding, errors)
+
+    def open(self, mode='r', encoding='utf-8', errors='strict'):
+        """Streaming reader: 'rb' gives a binary file object, 'r' a text wrapper over it."""
+        if mode not in ('r', 'rb'):
+            raise ValueError(f"{self}: archives are read-only (mode {mode!r})")
+        stream = self._root.archive.open(self._require_entry())
+        return stream if mode == 'rb' else io.TextIOWrapper(stream, encoding=encoding, errors=errors)
+
+    def stat(self):
+        """
+        os.stat_result: st_size is the plaintext size, st_ino the IDX index,
+        times are the PAK file's; directories have size 0.
+        """
+        pak_stat = os.stat(self._root.archive.pak_path)
+        times = (int(pak_stat.st_atime), int(pak_stat.st_mtime), int(pak_stat.st_ctime))
+        entry = self.entry
+        if entry is not None:
+            return os.stat_result((stat_module.S_IFREG | 0o444, entry.index, pak_stat.st_dev, 1, 0, 0, entry.size,
+                                   *times))
+        if self.is_dir():
+            return os.stat_result((stat_module.S_IFDIR | 0o555, 0, pak_stat.st_dev, 2, 0, 0, 0, *times))
+        raise FileNotFoundError(str(self))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="List archive entries through the pathlib-style view")
+    parser.add_argument('idx', help="Path to the .idx file")
+    parser.add_argument('pattern', nargs='?', help="Glob pattern, e.g. 'Chat/*.xml' or '**/*.csb' (default: top level)")
+    parser.add_argument('--pak', help="Path to the .pak file (default: next to the .idx)")
+    parser.add_argument('--keystore', help="Per-entry .l1rk keystore (only needed to read entries)")
+    parser.add_argument('--long', action='store_true', help="Show plaintext size, stored size and flag")
+    args = parser.parse_args()
+
+    if not Path(args.idx).exists():
+        print(f"[!] File not found: {args.idx}")
+        sys.exit(1)
+
+    lookup = {}
+    if args.keystore:
+        from keystore import Keystore
+        lookup['key_lookup'] = Keystore(args.keystore).lookup
+    with PakPath(args.idx, pak_path=args.pak, **lookup) as root:
+        paths = sorted(root.glob(args.pattern) if args.pattern else root.iterdir(), key=lambda path: path.at)
+        for path in paths:
+            entry = path.entry
+            if not args.long:
+                print(f"{path.at}/" if entry is None else path.at)
+            elif entry is None:
+                print(f"{'<dir>':>10s} {'':>10s} {'':4s} {path.at}/")
+            else:
+                print(f"{entry.size:10d} {entry.stored_size:10d} {entry.flag:4d} {path.at}")
+        print(f"[*] {len(paths)} paths")
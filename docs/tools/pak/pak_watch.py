@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Watch an extracted working tree and patch edited entries into the PAK/IDX.
+
+Replaces the decrypt -> edit -> encrypt_xml -> repack by hand loop of
+docs/tools/guides/ui_editing_guide.md. The tree is the layout entry_store.py
+checkout and benchmark extraction produce: one file per entry at its
+backslash-separated name. When a file is saved the watcher
+
+  1. waits until the file has been quiet for --debounce seconds (editors
+     write in several steps; saving five files at once is one batch)
+  2. skips it if its bytes equal the entry's current plaintext
+  3. checks that .xml files are still well-formed
+  4. deflates (flag=2 entries) and encrypts it with the entry's own key
+  5. appends the payload to the PAK and then rewrites the entry's IDX
+     record (PakPatcher); with --in-place a payload that fits overwrites the
+     old one instead (implies --sync: a crash between the payload and the
+     record write corrupts that entry)
+
+Only the changed entries are touched, so a save is client-ready in
+milliseconds; the PAK grows by moved payloads until the next full repack.
+Keys come from --keystore, else the XML prolog crib; they are read before
+an entry is first patched.
+
+Changes are detected with inotify on Linux (no extra packages) and by
+polling mtime/size everywhere else or with --poll. Files that are not in the
+archive are reported and skipped: a new entry needs a key.
+
+Usage:
+  python pak_watch.py <extracted_dir> <ui.idx> [--keystore keys.l1rk] [--debounce 0.05] [--poll] [--interval 0.1]
+                     [--in-place]
+  python pak_watch.py <extracted_dir> <ui.idx> --once      (patch every file that differs, then exit)
+"""
+
+import argparse
+import ctypes
+import hashlib
+import os
+import select
+import struct
+import sys
+import time
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+from pak_format import NoKeyError, PakPatcher, archive_name
+
+DEFAULT_DEBOUNCE = 0.05
+DEFAULT_INTERVAL = 0.1
+
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_ISDIR = 0x40000000
+INOTIFY_MASK = IN_CLOSE_WRITE | IN_MODIFY | IN_MOVED_TO | IN_CREATE
+INOTIFY_EVENT = struct.Struct('iIII')
+
+
+def plain_digest(data):
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def snapshot(root):
+    """{relative path: (mtime_ns, size)} for every file below root."""
+    found = {}
+    pending = [root]
+    while pending:
+        directory = pending.pop()
+        try:
+            with os.scandir(directory) as scan:
+                for item in scan:
+                    if item.is_dir(follow_symlinks=False):
+                        pending.append(item.path)
+                    elif item.is_file(follow_symlinks=False):
+                        stat = item.stat(follow_symlinks=False)
+                        found[os.path.relpath(item.path, root)] = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            continue
+    return found
+
+
+class PollWatcher:
+    """Changed files by comparing mtime/size snapshots."""
+
+    def __init__(self, root, interval=DEFAULT_INTERVAL):
+        self.root = root
+        self.interval = interval
+        self._state = snapshot(root)
+
+    def wait(self, timeout):
+        time.sleep(min(timeout, self.interval) if timeout is not None else self.interval)
+        current = snapshot(self.root)
+        changed = [path for path, signature in current.items() if self._state.get(path) != signature]
+        self._state = current
+        return changed
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """Changed files from Linux inotify, with a watch on every directory of the tree."""
+
+    def __init__(self, root):
+        self.root = root
+        self._libc = ctypes.CDLL(None, use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs = {}
+        for directory, _, _ in os.walk(root):
+            self._watch(directory)
+
+    def _watch(self, directory):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), INOTIFY_MASK)
+        if wd >= 0:
+            self._dirs[wd] = directory
+
+    def wait(self, timeout):
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        changed = []
+        pos = 0
+        while pos + INOTIFY_EVENT.size <= len(data):
+            wd, mask, _, length = INOTIFY_EVENT.unpack_from(data, pos)
+            name = data[pos + INOTIFY_EVENT.size:pos + INOTIFY_EVENT.size + length].split(b'\x00', 1)[0]
+            pos += INOTIFY_EVENT.size + length
+            if wd not in self._dirs or not name:
+                continue
+            path = os.path.join(self._dirs[wd], os.fsdecode(name))
+            if mask & IN_ISDIR:
+                # A new directory: watch it and pick up files written before the watch existed
+                for directory, _, files in os.walk(path):
+                    self._watch(directory)
+                    changed += [os.path.relpath(os.path.join(directory, file), self.root) for file in files]
+            else:
+                changed.append(os.path.relpath(path, self.root))
+        return changed
+
+    def close(self):
+        os.close(self._fd)
+
+
+def make_watcher(root, poll=False, interval=DEFAULT_INTERVAL):
+    if not poll and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(root)
+        except (OSError, AttributeError):
+            pass
+    return PollWatcher(root, interval)
+
+
+class EntrySync:
+    """Patches files of the working tree into the archive, tracking what each entry holds."""
+
+    def __init__(self, root, patcher, level=6, log=print):
+        self.root = Path(root)
+        self.patcher = patcher
+        self.level = level
+        self.log = log
+        self.by_lower = {name.lower(): entry for name, entry in patcher.by_name.items()}
+        self._keys = {}
+        self._digests = {}
+
+    def entry_for(self, relative):
+        name = archive_name(relative)
+        return self.patcher.by_name.get(name) or self.by_lower.get(name.lower())
+
+    def _current_digest(self, entry):
+        if entry.name not in self._digests:
+            self._digests[entry.name] = plain_digest(self.patcher.read(entry))
+        return self._digests[entry.name]
+
+    def apply(self, relative):
+        """Patch one file if it differs from its entry. Returns the action taken."""
+        entry = self.entry_for(relative)
+        if entry is None:
+            return 'unknown'
+        try:
+            plain = (self.root / relative).read_bytes()
+        except FileNotFoundError:
+            return 'missing'
+        try:
+            if entry.name not in self._keys:
+                self._keys[entry.name] = bytes(self.patcher.key(entry))
+            if plain_digest(plain) == self._current_digest(entry):
+                return 'unchanged'
+        except NoKeyError:
+            return 'no-key'
+        if entry.name.lower().endswith('.xml'):
+            try:
+                ET.fromstring(plain)
+            except ET.ParseError as exc:
+                self.log(f"[!] {entry.name}: not well-formed, not patched ({exc})")
+                return 'invalid'
+
+        moved = self.patcher.stats['appended']
+        self.patcher.replace_plain(entry, plain, self._keys[entry.name], self.level)
+        self._digests[entry.name] = plain_digest(plain)
+        return 'appended' if self.patcher.stats['appended'] > moved else 'in place'
+
+    def apply_batch(self, paths, last_change):
+        started = time.perf_counter()
+        results = {}
+        for relative in sorted(set(paths)):
+            action = self.apply(relative)
+            results.setdefault(action, []).append(relative)
+            if action in ('in place', 'appended'):
+                self.log(f"[+] {time.strftime('%H:%M:%S')} {archive_name(relative)} ({action})")
+            elif action == 'unknown':
+                self.log(f"[!] {relative}: not in the archive (a new entry needs a key), skipped")
+            elif action == 'no-key':
+                self.log(f"[!] {relative}: no key for this entry, skipped")
+        patched = len(results.get('in place', [])) + len(results.get('appended', []))
+        if patched:
+            now = time.perf_counter()
+            self.log(f"[*] {patched} entr{'y' if patched == 1 else 'ies'} patched in {(now - started) * 1000:.1f} ms, "
+                     f"archive ready {(now - last_change) * 1000:.0f} ms after the last save")
+        return results
+
+
+def watch(sync, watcher, debounce=DEFAULT_DEBOUNCE):
+    """Collect change events and apply each batch once it has been quiet for `debounce` seconds."""
+    pending = {}
+    while True:
+        timeout = None
+        if pending:
+            timeout = max(0.0, debounce - (time.perf_counter() - max(pending.values())))
+        changed = watcher.wait(timeout)
+        now = time.perf_counter()
+        for relative in changed:
+            pending[relative] = now
+        if pending and now - max(pending.values()) >= debounce:
+            sync.apply_batch(list(pending), max(pending.values()))
+            pending.clear()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-encrypt and patch edited entries of an extracted tree")
+    parser.add_argument('tree', help="Extracted working tree (one file per entry)")
+    parser.add_argument('idx', help="Path to the .idx file to patch")
+    parser.add_argument('--pak', help="Path to the .pak file (default: next to the .idx)")
+    parser.add_argument('--keystore', help="Per-entry .l1rk keystore (default: XML prolog keys only)")
+    parser.add_argument('--level', type=int, default=6, help="ZLIB level for flag=2 entries")
+    parser.add_argument('--debounce', type=float, default=DEFAULT_DEBOUNCE, help="Quiet seconds before patching")
+    parser.add_argument('--poll', action='store_true', help="Poll mtime/size instead of using inotify")
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL, help="Polling interval in seconds")
+    parser.add_argument('--sync', action='store_true', help="Fsync after every write")
+    parser.add_argument('--in-place', action='store_true',
+                        help="Overwrite payloads that fit instead of appending (implies --sync; a crash mid-patch "
+                             "corrupts the entry)")
+    parser.add_argument('--once', action='store_true', help="Patch every file that differs, then exit")
+    args = parser.parse_args()
+
+    for path in (args.tree, args.idx, args.keystore):
+        if path and not Path(path).exists():
+            print(f"[!] File not found: {path}")
+            sys.exit(1)
+
+    lookup = {}
+    if args.keystore:
+        from keystore import Keystore
+        lookup['key_lookup'] = Keystore(args.keystore).lookup
+    with PakPatcher(args.idx, args.pak, sync=args.sync or args.in_place, in_place=args.in_place, **lookup) as patcher:
+        sync = EntrySync(args.tree, patcher, args.level)
+        if args.once:
+            started = time.perf_counter()
+            results = sync.apply_batch(list(snapshot(args.tree)), started)
+            print(', '.join(f"{action}: {len(paths)}" for action, paths in sorted(results.items())))
+            print(f"[*] Slack left in the PAK: {patcher.stats['slack']} bytes")
+            sys.exit(0)
+
+        watcher = make_watcher(args.tree, args.poll, args.interval)
+        print(f"[*] Watching {args.tree} ({type(watcher).__name__}) -> {patcher.idx_path} / {patcher.pak_path}")
+        try:
+            watch(sync, watcher, args.debounce)
+        except KeyboardInterrupt:
+            print(f"\n[*] Stopped: {patcher.stats['in_place']} in place, {patcher.stats['appended']} appended, "
+                  f"{patcher.stats['slack']} bytes of slack until the next repack")
+        finally:
+            watcher.close()
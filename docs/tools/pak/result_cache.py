@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+Incremental analysis runs backed by a SQLite result cache.
+
+key_analysis.py and crack_xor_key.py recompute every hash and every score on
+each run. Here every result is a cell keyed by
+
+    (hypothesis id, hypothesis version, entry content hash)
+
+and stored in SQLite. A run computes only the missing cells: adding one
+hypothesis computes one column, adding a client version computes the rows of
+entries whose content changed, and bumping a hypothesis version recomputes
+just that hypothesis.
+
+The content hash covers the inputs a hypothesis declares it reads (entry
+name, IDX metadata fields, key, stored payload), so a name-only test is not
+recomputed just because an entry moved to another offset in a new version.
+Any module can register hypotheses with @hypothesis(id, version, uses) and
+call run_hypotheses() with its own cache.
+
+The built-in hypotheses are the key-derivation tests of key_analysis.py
+(key bytes equal to a hash of the name, offset, index, size or a
+combination), scored as the number of matching key bytes.
+
+Usage:
+  python result_cache.py <cache.sqlite> run <ui.idx> [--keystore keys.l1rk] [--only filename_md5 ...]
+                        [--profile profile.json]
+  python result_cache.py <cache.sqlite> stats
+  python result_cache.py <cache.sqlite> prune
+"""
+
+import argparse
+import hashlib
+import json
+import sqlite3
+import struct
+import sys
+import time
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+from instrument import DISABLED, add_profile_arguments, finish_profile, profiler_from_args
+from pak_format import NAME_ENCODING, NoKeyError, PakArchive
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    hypothesis TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    content TEXT NOT NULL,
+    value TEXT NOT NULL,
+    created REAL NOT NULL,
+    PRIMARY KEY (hypothesis, version, content)
+) WITHOUT ROWID
+"""
+
+
+INPUTS = ('name', 'index', 'offset', 'size', 'compressed_size', 'flag', 'key', 'stored')
+
+
+@dataclass(frozen=True)
+class Hypothesis:
+    """A named, versioned test: function(entry, stored, key) -> JSON-serialisable result."""
+    id: str
+    version: int
+    function: Callable
+    uses: tuple = INPUTS
+    description: str = ''
+
+
+HYPOTHESES = {}
+
+
+def hypothesis(hypothesis_id, version=1, uses=INPUTS):
+    """
+    Register a hypothesis.
+
+    Args:
+        hypothesis_id: Stable name of the test
+        version: Bump whenever the function's result would change, so cached
+                 cells of older versions are ignored
+        uses: The entry inputs the function reads (subset of INPUTS)
+    """
+    unknown = set(uses) - set(INPUTS)
+    if unknown:
+        raise ValueError(f"{hypothesis_id}: unknown inputs {sorted(unknown)}")
+
+    def register(function):
+        HYPOTHESES[hypothesis_id] = Hypothesis(hypothesis_id, version, function, tuple(sorted(uses)),
+                                               (function.__doc__ or '').strip())
+        return function
+    return register
+
+
+def content_hash(entry, key, stored, uses=INPUTS):
+    """Identity of the inputs a hypothesis reads for one entry."""
+    h = hashlib.blake2b(digest_size=16)
+    for field in sorted(uses):
+        if field == 'name':
+            value = entry.name.encode(NAME_ENCODING)
+        elif field == 'key':
+            value = key
+        elif field == 'stored':
+            value = hashlib.blake2b(stored, digest_size=16).digest()
+        else:
+            value = struct.pack('<I', getattr(entry, field))
+        h.update(field.encode('ascii'))
+        h.update(struct.pack('<I', len(value)))
+        h.update(value)
+    return h.hexdigest()
+
+
+class ResultCache:
+    """SQLite-backed (hypothesis, version, content) -> result store."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.db = sqlite3.connect(self.path)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+    def get_many(self, hypothesis_id, version, contents):
+        """Cached results for a set of content hashes: {content: value}."""
+        found = {}
+        contents = list(contents)
+        for start in range(0, len(contents), 500):
+            chunk = contents[start:start + 500]
+            rows = self.db.execute(
+                f"SELECT content, value FROM results WHERE hypothesis = ? AND version = ? "
+                f"AND content IN ({','.join('?' * len(chunk))})",
+                (hypothesis_id, version, *chunk))
+            found.update((content, json.loads(value)) for content, value in rows)
+        return found
+
+    def put_many(self, hypothesis_id, version, values):
+        """Store {content: value} results for one hypothesis version."""
+        now = time.time()
+        self.db.executemany(
+            "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+            ((hypothesis_id, version, content, json.dumps(value), now) for content, value in values.items()))
+        self.db.commit()
+
+    def stats(self):
+        rows = self.db.execute(
+            "SELECT hypothesis, version, COUNT(*) FROM results GROUP BY hypothesis, version ORDER BY hypothesis, version")
+        return [{'hypothesis': h, 'version': v, 'cells': n} for h, v, n in rows]
+
+    def prune(self, current):
+        """Delete cells of hypotheses or versions not in {hypothesis id: version}."""
+        removed = 0
+        for row in self.stats():
+            if current.get(row['hypothesis']) != row['version']:
+                self.db.execute("DELETE FROM results WHERE hypothesis = ? AND version = ?",
+                                (row['hypothesis'], row['version']))
+                removed += row['cells']
+        self.db.commit()
+        self.db.execute('VACUUM')
+        return removed
+
+
+def run_hypotheses(cache, archive, hypotheses=None, profiler=DISABLED):
+    """
+    Evaluate hypotheses over every keyed entry, computing only cells missing from the cache.
+
+    Returns:
+        ({hypothesis id: {entry name: value}}, stats dict with computed/cached/no_key counts)
+    """
+    hypotheses = list(hypotheses or HYPOTHESES.values())
+    rows = []
+    no_key = 0
+    with profiler.stage('read_keys', entries=len(archive.entries)) as stage:
+        for entry in archive.entries:
+            stored = archive.raw(entry)
+            stage.add(bytes=len(stored))
+            try:
+                key = bytes(archive.key(entry, stored))
+            except NoKeyError:
+                no_key += 1
+                continue
+            rows.append((entry, stored, key))
+
+    results = {}
+    stats = {'entries': len(rows), 'no_key': no_key, 'computed': 0, 'cached': 0}
+    hashes = {}
+    for hyp in hypotheses:
+        # Hypotheses reading the same inputs share one set of content hashes
+        if hyp.uses not in hashes:
+            with profiler.stage('content_hash', entries=len(rows)):
+                hashes[hyp.uses] = [content_hash(entry, key, stored, hyp.uses) for entry, stored, key in rows]
+        contents = hashes[hyp.uses]
+
+        with profiler.stage('cache_lookup', entries=len(rows)):
+            cached = cache.get_many(hyp.id, hyp.version, set(contents))
+        fresh = {}
+        with profiler.stage('compute') as stage:
+            for (entry, stored, key), content in zip(rows, contents):
+                if content not in cached and content not in fresh:
+                    fresh[content] = hyp.function(entry, stored, key)
+            stage.add(entries=len(fresh))
+        if fresh:
+            with profiler.stage('cache_store', entries=len(fresh)):
+                cache.put_many(hyp.id, hyp.version, fresh)
+        stats['computed'] += len(fresh)
+        stats['cached'] += len(rows) - len(fresh)
+
+        values = {**cached, **fresh}
+        results[hyp.id] = {entry.name: values[content] for (entry, _, _), content in zip(rows, contents)}
+    return results, stats
+
+
+def _matching_bytes(key, candidate):
+    return sum(1 for a, b in zip(key, candidate) if a == b)
+
+
+@hypothesis('filename_md5', uses=('name', 'key'))
+def _filename_md5(entry, stored, key):
+    """Key bytes equal MD5(name)"""
+    return _matching_bytes(key, hashlib.md5(entry.name.encode(NAME_ENCODING)).digest())
+
+
+@hypothesis('filename_sha1', uses=('name', 'key'))
+def _filename_sha1(entry, stored, key):
+    """Key bytes equal SHA1(name)"""
+    return _matching_bytes(key, hashlib.sha1(entry.name.encode(NAME_ENCODING)).digest())
+
+
+@hypothesis('filename_sha256', uses=('name', 'key'))
+def _filename_sha256(entry, stored, key):
+    """Key bytes equal SHA256(name)"""
+    return _matching_bytes(key, hashlib.sha256(entry.name.encode(NAME_ENCODING)).digest())
+
+
+@hypothesis('filename_crc32', uses=('name', 'key'))
+def _filename_crc32(entry, stored, key):
+    """Key bytes 0-3 equal CRC32(name), little endian"""
+    return _matching_bytes(key, struct.pack('<I', zlib.crc32(entry.name.encode(NAME_ENCODING))))
+
+
+@hypothesis('filename_lower_md5', uses=('name', 'key'))
+def _filename_lower_md5(entry, stored, key):
+    """Key bytes equal MD5(lower-case name)"""
+    return _matching_bytes(key, hashlib.md5(entry.name.lower().encode(NAME_ENCODING)).digest())
+
+
+@hypothesis('basename_md5', uses=('name', 'key'))
+def _basename_md5(entry, stored, key):
+    """Key bytes equal MD5(name without directory)"""
+    return _matching_bytes(key, hashlib.md5(entry.name.rsplit('\\', 1)[-1].encode(NAME_ENCODING)).digest())
+
+
+@hypothesis('offset_md5', uses=('offset', 'key'))
+def _offset_md5(entry, stored, key):
+    """Key bytes equal MD5(offset as u32 LE)"""
+    return _matching_bytes(key, hashlib.md5(struct.pack('<I', entry.offset)).digest())
+
+
+@hypothesis('index_md5', uses=('index', 'key'))
+def _index_md5(entry, stored, key):
+    """Key bytes equal MD5(index as u32 LE)"""
+    return _matching_bytes(key, hashlib.md5(struct.pack('<I', entry.index)).digest())
+
+
+@hypothesis('size_md5', uses=('size', 'key'))
+def _size_md5(entry, stored, key):
+    """Key bytes equal MD5(size as u32 LE)"""
+    return _matching_bytes(key, hashlib.md5(struct.pack('<I', entry.size)).digest())
+
+
+@hypothesis('name_offset_md5', uses=('name', 'offset', 'key'))
+def _name_offset_md5(entry, stored, key):
+    """Key bytes equal MD5(name + offset)"""
+    return _matching_bytes(key, hashlib.md5(entry.name.encode(NAME_ENCODING) + struct.pack('<I', entry.offset)).digest())
+
+
+@hypothesis('name_index_md5', uses=('name', 'index', 'key'))
+def _name_index_md5(entry, stored, key):
+    """Key bytes equal MD5(name + index)"""
+    return _matching_bytes(key, hashlib.md5(entry.name.encode(NAME_ENCODING) + struct.pack('<I', entry.index)).digest())
+
+
+@hypothesis('metadata_md5', uses=('index', 'offset', 'size', 'key'))
+def _metadata_md5(entry, stored, key):
+    """Key bytes equal MD5(index + offset + size)"""
+    return _matching_bytes(key, hashlib.md5(struct.pack('<III', entry.index, entry.offset, entry.size)).digest())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cached, incremental key-derivation hypothesis runs")
+    parser.add_argument('cache', help="SQLite cache file (created if missing)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help="Evaluate hypotheses, computing only uncached cells")
+    run.add_argument('idx', help="Path to the .idx file")
+    run.add_argument('--pak', help="Path to the .pak file (default: next to the .idx)")
+    run.add_argument('--keystore', help="Per-entry .l1rk keystore (default: XML prolog keys only)")
+    run.add_argument('--only', nargs='+', metavar='HYPOTHESIS', help="Restrict to these hypothesis ids")
+    run.add_argument('--output', help="Write per-entry results as JSON")
+    add_profile_arguments(run)
+
+    commands.add_parser('stats', help="Show cached cells per hypothesis version")
+    commands.add_parser('prune', help="Drop cells of unknown hypotheses and stale versions")
+    args = parser.parse_args()
+
+    profiler = profiler_from_args(args)
+    started = time.perf_counter()
+    with ResultCache(args.cache) as cache:
+        if args.command == 'run':
+            if not Path(args.idx).exists():
+                print(f"[!] File not found: {args.idx}")
+                sys.exit(1)
+            unknown = set(args.only or ()) - set(HYPOTHESES)
+            if unknown:
+                print(f"[!] Unknown hypothesis: {', '.join(sorted(unknown))}")
+                print(f"    Available: {', '.join(sorted(HYPOTHESES))}")
+                sys.exit(1)
+            selected = [HYPOTHESES[h] for h in args.only] if args.only else None
+
+            lookup = {}
+            if args.keystore:
+                from keystore import Keystore
+                lookup['key_lookup'] = Keystore(args.keystore).lookup
+            with PakArchive(args.idx, args.pak, **lookup) as archive:
+                results, stats = run_hypotheses(cache, archive, selected, profiler)
+
+            print("=" * 80)
+            print("KEY DERIVATION HYPOTHESES")
+            print("=" * 80)
+            print(f"Keyed entries: {stats['entries']}  (no key: {stats['no_key']})")
+            print(f"Cells computed: {stats['computed']}  from cache: {stats['cached']}")
+            print()
+            print(f"{'Hypothesis':24s} {'avg':>6s} {'max':>5s}  (matching key bytes)")
+            print("-" * 44)
+            ranked = sorted(results.items(), key=lambda item: -sum(item[1].values()) / max(len(item[1]), 1))
+            for hyp_id, values in ranked:
+                scores = list(values.values()) or [0]
+                print(f"{hyp_id:24s} {sum(scores) / len(scores):6.2f} {max(scores):5d}")
+
+            if args.output:
+                Path(args.output).write_text(json.dumps(results, indent=1, ensure_ascii=False), encoding='utf-8')
+                print(f"\n[+] Results written to {args.output}")
+        elif args.command == 'stats':
+            rows = cache.stats()
+            for row in rows:
+                current = HYPOTHESES.get(row['hypothesis'])
+                state = '' if current and current.version == row['version'] else '  (stale)'
+                print(f"{row['hypothesis']:24s} v{row['version']:<3d} {row['cells']:8d} cells{state}")
+            print(f"Total: {sum(row['cells'] for row in rows)} cells in {args.cache}")
+        else:
+            removed = cache.prune({h.id: h.version for h in HYPOTHESES.values()})
+            print(f"[+] Removed {removed} stale cells")
+
+    print(f"[*] Completed in {time.perf_counter() - started:.2f}s")
+    finish_profile(profiler, args)
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Offline archive snapshot: IDX metadata plus head/tail ciphertext per entry.
+
+Most analysis only looks at the IDX table and the first (prolog, magic) or
+last bytes of each entry. A snapshot keeps exactly that in one .npz file:
+
+  table      IDX rows (read_idx_table() layout)
+  header     magic, file count and the two unknown header fields
+  head       first N stored bytes per entry (entries x N, zero padded)
+  tail       last N stored bytes per entry (right aligned, zero padded)
+  head_len   valid bytes in each head row
+  tail_len   valid bytes in each tail row
+  meta       UTF-8 JSON: source paths, PAK size, N, creation time
+
+so analyses can run on a laptop without the 100+ MB PAK. By default members
+are written uncompressed, which lets Snapshot() memory-map every array in
+place (np.load ignores mmap_mode for .npz files, so the members are mapped
+directly from their offsets inside the zip). --compress trades that for a
+smaller file that is read into memory instead.
+
+header_classifier.py, two_time_pad.py, frequency_solver.py, crib_drag.py and
+key_correlation.py take --snapshot in place of the .idx argument (see
+add_snapshot_argument()).
+
+Requires numpy.
+
+Usage:
+  python snapshot.py create <ui.idx> <ui_snapshot.npz> [--pak ui.pak] [--bytes 256] [--compress]
+                            [--profile profile.json]
+  python snapshot.py info <ui_snapshot.npz>
+"""
+
+import argparse
+import json
+import struct
+import sys
+import time
+import zipfile
+from pathlib import Path
+
+import numpy as np
+
+from instrument import DISABLED, add_profile_arguments, finish_profile, profiler_from_args
+from pak_format import IdxEntry, IdxHeader, NAME_ENCODING, default_pak_path, read_idx_table, stored_sizes
+
+DEFAULT_SNAPSHOT_BYTES = 256
+SNAPSHOT_FORMAT = 1
+ZIP_LOCAL_HEADER = struct.Struct('<4sHHHHHIIIHH')
+
+
+def write_snapshot(idx_path, path, pak_path=None, width=DEFAULT_SNAPSHOT_BYTES, compress=False, profiler=DISABLED):
+    """
+    Write a snapshot of an archive.
+
+    Args:
+        idx_path: Path to .idx file
+        path: Output .npz path
+        pak_path: Path to .pak file (default: next to the .idx)
+        width: Head and tail bytes kept per entry
+        compress: Deflate the members (smaller, but not memory-mappable)
+        profiler: instrument.Profiler for per-stage timings
+
+    Returns:
+        number of entries written
+    """
+    with profiler.stage('read_idx') as stage:
+        header, table = read_idx_table(idx_path)
+        stage.add(entries=len(table))
+    pak_path = Path(pak_path) if pak_path else default_pak_path(idx_path)
+    pak_size = pak_path.stat().st_size
+    pak = np.memmap(pak_path, dtype=np.uint8, mode='r') if pak_size else np.zeros(0, np.uint8)
+
+    offsets = table['offset'].astype(np.int64)
+    # Payloads past EOF are clipped so a truncated PAK still snapshots
+    sizes = np.clip(stored_sizes(table).astype(np.int64), 0, np.maximum(pak_size - offsets, 0))
+    lengths = np.minimum(sizes, width)
+
+    def gather(positions, valid):
+        if not pak_size:
+            return np.zeros(positions.shape, dtype=np.uint8)
+        return np.where(valid, pak[np.clip(positions, 0, pak_size - 1)], 0).astype(np.uint8)
+
+    columns = np.arange(width, dtype=np.int64)
+    with profiler.stage('gather', bytes=2 * int(lengths.sum()), entries=len(table)):
+        head = gather(offsets[:, None] + columns[None, :], columns[None, :] < lengths[:, None])
+        # Tail rows are right aligned: the last byte of the entry is column width-1
+        tail = gather(offsets[:, None] + sizes[:, None] - width + columns[None, :],
+                      columns[None, :] >= (width - lengths)[:, None])
+
+    meta = json.dumps({
+        'format': SNAPSHOT_FORMAT,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'idx': str(idx_path),
+        'pak': str(pak_path),
+        'pak_size': pak_size,
+        'bytes': width,
+    }).encode('utf-8')
+
+    save = np.savez_compressed if compress else np.savez
+    with profiler.stage('write', bytes=head.nbytes + tail.nbytes + table.nbytes), open(path, 'wb') as f:
+        save(f,
+             table=table,
+             header=np.array([int.from_bytes(header.magic, 'little'), header.file_count, header.field2, header.field3],
+                             dtype='<u4'),
+             head=head,
+             tail=tail,
+             head_len=lengths.astype('<u4'),
+             tail_len=lengths.astype('<u4'),
+             meta=np.frombuffer(meta, dtype=np.uint8))
+    return len(table)
+
+
+def _map_member(path, info):
+    """Memory-map one stored (uncompressed) .npy member of a zip file."""
+    with open(path, 'rb') as f:
+        f.seek(info.header_offset)
+        fields = ZIP_LOCAL_HEADER.unpack(f.read(ZIP_LOCAL_HEADER.size))
+        name_length, extra_length = fields[-2], fields[-1]
+        f.seek(info.header_offset + ZIP_LOCAL_HEADER.size + name_length + extra_length)
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        offset = f.tell()
+    if not shape or 0 in shape:
+        return np.zeros(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=shape,
+                     order='F' if fortran_order else 'C')
+
+
+class Snapshot:
+    """
+    A loaded snapshot. Arrays are memory-mapped when the members are stored
+    uncompressed and read into memory otherwise.
+
+    Usage:
+        snap = Snapshot('ui_snapshot.npz')
+        prolog_keys = snap.head[:, :38] ^ np.frombuffer(XML_PROLOG, np.uint8)
+    """
+
+    MEMBERS = ('table', 'header', 'head', 'tail', 'head_len', 'tail_len', 'meta')
+
+    def __init__(self, path):
+        self.path = Path(path)
+        arrays = {}
+        with zipfile.ZipFile(self.path) as archive:
+            infos = {Path(info.filename).stem: info for info in archive.infolist()}
+            missing = set(self.MEMBERS) - set(infos)
+            if missing:
+                raise ValueError(f"{path}: not a snapshot (missing {', '.join(sorted(missing))})")
+            self.memory_mapped = all(infos[name].compress_type == zipfile.ZIP_STORED for name in self.MEMBERS)
+
+        if self.memory_mapped:
+            for name in self.MEMBERS:
+                arrays[name] = _map_member(self.path, infos[name])
+        else:
+            with np.load(self.path) as loaded:
+                arrays = {name: loaded[name] for name in self.MEMBERS}
+
+        self.table = arrays['table']
+        self.head = arrays['head']
+        self.tail = arrays['tail']
+        self.head_len = arrays['head_len']
+        self.tail_len = arrays['tail_len']
+        self.meta = json.loads(bytes(arrays['meta']).decode('utf-8'))
+        magic, file_count, field2, field3 = (int(v) for v in arrays['header'])
+        self.header = IdxHeader(magic.to_bytes(4, 'little'), file_count, field2, field3)
+        self._by_name = None
+
+    def __len__(self):
+        return len(self.table)
+
+    @property
+    def width(self):
+        return self.head.shape[1]
+
+    def entry(self, row):
+        """IdxEntry for a row number."""
+        record = self.table[row]
+        return IdxEntry(int(row), bytes(record['name']).decode(NAME_ENCODING, errors='replace'),
+                        int(record['offset']), int(record['size']), int(record['compressed_size']),
+                        int(record['flag']))
+
+    def row_for_name(self, name):
+        if self._by_name is None:
+            self._by_name = {bytes(raw).decode(NAME_ENCODING, errors='replace'): row
+                             for row, raw in enumerate(self.table['name'])}
+        return self._by_name.get(name)
+
+    def head_bytes(self, row):
+        return bytes(self.head[row, :self.head_len[row]])
+
+    def tail_bytes(self, row):
+        return bytes(self.tail[row, self.width - self.tail_len[row]:])
+
+    def entries(self):
+        """IdxEntry for every row, in IDX order (as read_idx() returns them)."""
+        return [self.entry(row) for row in range(len(self))]
+
+    def stored_size(self, row):
+        """Stored size of an entry as snapshotted (clipped at the end of the PAK)."""
+        entry = self.entry(row)
+        return max(0, min(entry.stored_size, self.meta['pak_size'] - entry.offset))
+
+    def head_matrix(self, width=None):
+        """
+        The first `width` stored bytes of every entry, in the layout of
+        header_classifier.header_matrix().
+
+        Returns:
+            (uint8 matrix of shape (entries, width), boolean validity mask)
+        """
+        width = self.width if width is None else width
+        if width > self.width:
+            raise ValueError(f"{self.path}: holds {self.width} head bytes per entry, {width} requested")
+        valid = np.arange(width)[None, :] < np.asarray(self.head_len)[:, None]
+        return np.array(self.head[:, :width]), valid
+
+    def known_bytes(self, row):
+        """
+        Every stored byte the snapshot holds for an entry, with its position.
+        Head and tail overlap for entries shorter than twice the width; each
+        byte is returned once.
+
+        Returns:
+            (int64 positions in the stored payload, uint8 bytes), ascending
+        """
+        head_len = int(self.head_len[row])
+        size = self.stored_size(row)
+        tail_start = max(size - int(self.tail_len[row]), head_len)
+        positions = np.concatenate([np.arange(head_len), np.arange(tail_start, size)]).astype(np.int64)
+        data = np.concatenate([self.head[row, :head_len], self.tail[row, self.width - (size - tail_start):]])
+        return positions, data.astype(np.uint8)
+
+
+def add_snapshot_argument(parser):
+    """Add --snapshot to a tool whose `idx` positional is optional (nargs='?')."""
+    parser.add_argument('--snapshot', metavar='NPZ',
+                        help="Read the IDX table and ciphertext from a snapshot.py file instead of the IDX/PAK")
+
+
+def snapshot_from_args(parser, args):
+    """
+    Check that exactly one of idx / --snapshot was given and that it exists.
+
+    Returns:
+        the loaded Snapshot, or None when reading the IDX/PAK
+    """
+    if (args.idx is None) == (args.snapshot is None):
+        parser.error("give either an .idx file or --snapshot")
+    if args.snapshot and getattr(args, 'pak', None):
+        parser.error("--pak does not apply to --snapshot")
+    path = args.snapshot or args.idx
+    if not Path(path).exists():
+        print(f"[!] File not found: {path}")
+        sys.exit(1)
+    return Snapshot(args.snapshot) if args.snapshot else None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline IDX metadata + head/tail ciphertext snapshots")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    create = commands.add_parser('create', help="Snapshot an IDX/PAK pair")
+    create.add_argument('idx', help="Path to the .idx file")
+    create.add_argument('output', help="Snapshot .npz path")
+    create.add_argument('--pak', help="Path to the .pak file (default: next to the .idx)")
+    create.add_argument('--bytes', type=int, default=DEFAULT_SNAPSHOT_BYTES, help="Head/tail bytes per entry")
+    create.add_argument('--compress', action='store_true', help="Deflate members (smaller, no memory mapping)")
+    add_profile_arguments(create)
+
+    info = commands.add_parser('info', help="Describe a snapshot")
+    info.add_argument('snapshot')
+    args = parser.parse_args()
+
+    if args.command == 'create':
+        if not Path(args.idx).exists():
+            print(f"[!] File not found: {args.idx}")
+            sys.exit(1)
+        profiler = profiler_from_args(args)
+        started = time.perf_counter()
+        count = write_snapshot(args.idx, args.output, args.pak, args.bytes, args.compress, profiler)
+        size = Path(args.output).stat().st_size
+        print(f"[+] Snapshot of {count} entries ({args.bytes} head/tail bytes) -> {args.output} "
+              f"({size / 1024:.1f} KB) in {time.perf_counter() - started:.2f}s")
+        finish_profile(profiler, args)
+    else:
+        if not Path(args.snapshot).exists():
+            print(f"[!] File not found: {args.snapshot}")
+            sys.exit(1)
+        snap = Snapshot(args.snapshot)
+        print("=" * 80)
+        print(f"SNAPSHOT: {args.snapshot}")
+        print("=" * 80)
+        print(f"Source: {snap.meta['idx']} / {snap.meta['pak']} ({snap.meta['pak_size']:,} bytes)")
+        print(f"Created: {snap.meta['created']}")
+        print(f"Header: {snap.header.magic!r} file_count={snap.header.file_count} "
+              f"field2={snap.header.field2} field3={snap.header.field3}")
+        print(f"Entries: {len(snap)}  head/tail bytes: {snap.width}  "
+              f"memory-mapped: {'yes' if snap.memory_mapped else 'no (compressed)'}")
+        flags = np.asarray(snap.table['flag'])
+        for flag in np.unique(flags):
+            print(f"  flag={int(flag)}: {int(np.sum(flags == flag))} entries")
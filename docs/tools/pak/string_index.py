@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+SQLite FTS5 full-text index over the strings of every XML and CSB entry.
+
+Answers "which layouts use this label" without extracting anything: strings
+are pulled from the plaintext of every entry once and stored with their
+postings (entry content, byte offset, byte length), so a search is one FTS5
+lookup.
+
+  XML entries   attribute values and text nodes
+  CSB entries   runs of printable ASCII / UTF-8 Hangul (FlatBuffers strings)
+
+Updates are incremental. Each entry is identified by a content hash of its
+stored bytes, key and flag, computed without decrypting; only contents the
+database has not seen are decrypted and indexed. Entries of several archives
+(or client versions, under different --label values) share one database, and
+contents no entry refers to any more are dropped by `prune`. An entry whose
+key is missing in an update keeps the content it was last indexed with
+(reported as stale) instead of dropping out of its label. With --client,
+every archive of a client_index.py index is updated, each under its IDX path
+relative to the client (without .idx, after --label/ when given) and with the
+keystore the client index recorded for it.
+
+The FTS5 tokenizer is unicode61, so searches match whole words (확인, Close)
+and word prefixes (Inven*). By default the query is matched as a phrase;
+--fts passes raw FTS5 syntax (AND / OR / NEAR / column filters).
+
+Usage:
+  python string_index.py <index.sqlite> update <ui.idx> [--keystore keys.l1rk] [--label ui] [--profile profile.json]
+  python string_index.py <index.sqlite> update --client client.sqlite [--label v2]
+  python string_index.py <index.sqlite> search "캐릭터 선택" [--fts] [--limit 50]
+  python string_index.py <index.sqlite> stats
+  python string_index.py <index.sqlite> prune
+"""
+
+import argparse
+import hashlib
+import re
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+from instrument import DISABLED, add_profile_arguments, finish_profile, profiler_from_args
+from pak_format import NoKeyError, PakArchive
+
+MIN_STRING = 4
+# Printable ASCII or UTF-8 Hangul syllables (U+AC00..U+D7A3 -> EA B0 80 .. ED 9E A3)
+STRING_RUN = re.compile(rb'(?:[\x20-\x7e]|[\xea-\xed][\x80-\xbf]{2}){%d,}' % MIN_STRING)
+XML_ATTRIBUTE = re.compile(rb'=\s*"([^"<]+)"')
+XML_TEXT = re.compile(rb'>([^<]*[^<\s][^<]*)<')
+BATCH = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS contents (
+    id INTEGER PRIMARY KEY,
+    hash TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    strings INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    label TEXT NOT NULL,
+    name TEXT NOT NULL,
+    content INTEGER NOT NULL REFERENCES contents(id),
+    PRIMARY KEY (label, name)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entries_by_content ON entries(content);
+CREATE VIRTUAL TABLE IF NOT EXISTS strings USING fts5(
+    text, content UNINDEXED, offset UNINDEXED, length UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 0'
+);
+"""
+
+
+def content_hash(stored, key, flag):
+    """Identity of an entry's plaintext, computed from what is on disk without decrypting."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(hashlib.blake2b(key, digest_size=16).digest())
+    h.update(bytes([flag]))
+    h.update(stored)
+    return h.hexdigest()
+
+
+def scan_strings(data):
+    """(offset, length, text) for every run of at least MIN_STRING printable ASCII / Hangul characters."""
+    return [(match.start(), match.end() - match.start(), match.group().decode('utf-8', errors='replace'))
+            for match in STRING_RUN.finditer(data)]
+
+
+def xml_strings(data):
+    """(offset, length, text) for every attribute value and non-blank text node of an XML document."""
+    found = []
+    for pattern in (XML_ATTRIBUTE, XML_TEXT):
+        for match in pattern.finditer(data):
+            raw = match.group(1)
+            text = raw.decode('utf-8', errors='replace').strip()
+            if text:
+                found.append((match.start(1), len(raw), text))
+    found.sort()
+    return found
+
+
+def entry_strings(name, plain):
+    """Searchable strings of an entry; numbers, colours and other letter-free values are left out."""
+    strings = xml_strings(plain) if name.lower().endswith('.xml') else scan_strings(plain)
+    return [item for item in strings if any(char.isalpha() for char in item[2])]
+
+
+class StringIndex:
+    """The SQLite database: contents, per-label entry names and the FTS5 postings."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.db = sqlite3.connect(self.path)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+    def update(self, archive, label, profiler=DISABLED):
+        """
+        Bring one label's entries in line with an archive, indexing only unseen contents.
+
+        Returns:
+            stats dict (entries, indexed, reused, strings, removed, no_key, stale); stale
+            counts no_key entries that keep their previously indexed content
+        """
+        stats = {'entries': 0, 'indexed': 0, 'reused': 0, 'strings': 0, 'removed': 0, 'no_key': 0, 'stale': 0}
+        known = dict(self.db.execute("SELECT hash, id FROM contents"))
+        previous = dict(self.db.execute("SELECT name, content FROM entries WHERE label = ?", (label,)))
+        current = {}
+        postings = []
+
+        for entry in archive.entries:
+            stats['entries'] += 1
+            with profiler.stage('hash', entries=1) as stage:
+                stored = archive.raw(entry)
+                stage.add(bytes=len(stored))
+                try:
+                    key = bytes(archive.key(entry, stored))
+                except NoKeyError:
+                    stats['no_key'] += 1
+                    if entry.name in previous:
+                        # Unverifiable, but better than dropping the entry from its label
+                        current[entry.name] = previous[entry.name]
+                        stats['stale'] += 1
+                    continue
+                digest = content_hash(stored, key, entry.flag)
+            if digest in known:
+                stats['reused'] += 1
+                current[entry.name] = known[digest]
+                continue
+
+            with profiler.stage('extract', entries=1) as stage:
+                plain = archive.read(entry)
+                stage.add(bytes=len(plain))
+                strings = entry_strings(entry.name, plain)
+            with profiler.stage('insert', entries=1):
+                content_id = self.db.execute("INSERT INTO contents (hash, size, strings) VALUES (?, ?, ?)",
+                                             (digest, len(plain), len(strings))).lastrowid
+                known[digest] = current[entry.name] = content_id
+                postings.extend((text, content_id, offset, length) for offset, length, text in strings)
+                if len(postings) >= BATCH * 20:
+                    self.db.executemany("INSERT INTO strings VALUES (?, ?, ?, ?)", postings)
+                    postings.clear()
+            stats['indexed'] += 1
+            stats['strings'] += len(strings)
+
+        with profiler.stage('insert'):
+            self.db.executemany("INSERT INTO strings VALUES (?, ?, ?, ?)", postings)
+            self.db.execute("DELETE FROM entries WHERE label = ?", (label,))
+            self.db.executemany("INSERT INTO entries VALUES (?, ?, ?)",
+                                ((label, name, content_id) for name, content_id in current.items()))
+            self.db.commit()
+        stats['removed'] = len(previous - current.keys())
+        return stats
+
+    def search(self, query, limit=50, raw=False):
+        """
+        Postings matching a query.
+
+        Args:
+            query: Text to find (a phrase), or FTS5 syntax when raw is True
+            limit: Maximum number of postings returned, counted after joining
+                strings to the entries that use them
+
+        Returns:
+            [{'label', 'entry', 'offset', 'length', 'text'}, ...]
+        """
+        if not raw:
+            query = '"' + query.replace('"', '""') + '"'
+        rows = self.db.execute(
+            "SELECT e.label, e.name, s.offset, s.length, s.text "
+            "FROM strings AS s JOIN entries AS e ON e.content = s.content "
+            "WHERE s.strings MATCH ? ORDER BY e.label, e.name, s.offset LIMIT ?",
+            (query, limit))
+        return [{'label': label, 'entry': name, 'offset': offset, 'length': length, 'text': text}
+                for label, name, offset, length, text in rows]
+
+    def stats(self):
+        labels = self.db.execute("SELECT label, COUNT(*) FROM entries GROUP BY label ORDER BY label").fetchall()
+        contents, strings = self.db.execute("SELECT COUNT(*), COALESCE(SUM(strings), 0) FROM contents").fetchone()
+        orphans = self.db.execute(
+            "SELECT COUNT(*) FROM contents WHERE id NOT IN (SELECT content FROM entries)").fetchone()[0]
+        return {'labels': dict(labels), 'contents': contents, 'strings': strings, 'unreferenced': orphans}
+
+    def prune(self):
+        """Drop contents (and their strings) no entry of any label refers to."""
+        orphans = [row[0] for row in self.db.execute(
+            "SELECT id FROM contents WHERE id NOT IN (SELECT content FROM entries)")]
+        for start in range(0, len(orphans), BATCH):
+            chunk = orphans[start:start + BATCH]
+            marks = ','.join('?' * len(chunk))
+            self.db.execute(f"DELETE FROM strings WHERE content IN ({marks})", chunk)
+            self.db.execute(f"DELETE FROM contents WHERE id IN ({marks})", chunk)
+        self.db.execute("INSERT INTO strings(strings) VALUES ('optimize')")
+        self.db.commit()
+        self.db.execute('VACUUM')
+        return len(orphans)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incremental SQLite FTS5 index of strings in XML/CSB entries")
+    parser.add_argument('index', help="SQLite index file (created if missing)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    update = commands.add_parser('update', help="Index new or changed entries of an archive")
+    update.add_argument('idx', nargs='?', help="Path to the .idx file")
+    update.add_argument('--client', help="client_index.py index: update every archive of the client")
+    update.add_argument('--pak', help="Path to the .pak file (default: next to the .idx)")
+    update.add_argument('--keystore', help="Per-entry .l1rk keystore (default: XML prolog keys only)")
+    update.add_argument('--label', help="Name for this archive's entries (default: IDX file stem)")
+    add_profile_arguments(update)
+
+    search = commands.add_parser('search', help="Find entries containing a string")
+    search.add_argument('query')
+    search.add_argument('--fts', action='store_true', help="Query is raw FTS5 syntax, not a phrase")
+    search.add_argument('--limit', type=int, default=50, help="Maximum postings (entry + string) listed")
+
+    commands.add_parser('stats', help="Show indexed labels, contents and strings")
+    commands.add_parser('prune', help="Drop contents no entry refers to any more")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    with StringIndex(args.index) as index:
+        if args.command == 'update':
+            if bool(args.idx) == bool(args.client):
+                parser.error("update takes an IDX file or --client")
+            source = args.idx or args.client
+            if not Path(source).exists():
+                print(f"[!] File not found: {source}")
+                sys.exit(1)
+            profiler = profiler_from_args(args)
+            if args.client:
+                from client_index import ClientIndex
+                targets = []
+                with ClientIndex(args.client) as client:
+                    for path, idx_path, pak_path, keystore in client.pairs():
+                        label = Path(path).with_suffix('').as_posix()
+                        targets.append((f"{args.label}/{label}" if args.label else label, idx_path, pak_path,
+                                        keystore))
+            else:
+                targets = [(args.label or Path(args.idx).stem, args.idx, args.pak, args.keystore)]
+            totals = {}
+            for label, idx_path, pak_path, keystore in targets:
+                lookup = {}
+                if keystore:
+                    from keystore import Keystore
+                    lookup['key_lookup'] = Keystore(keystore).lookup
+                with PakArchive(idx_path, pak_path, **lookup) as archive:
+                    stats = index.update(archive, label, profiler)
+                print(f"[+] {label}: {stats['entries']} entries, {stats['indexed']} indexed "
+                      f"({stats['strings']} strings), {stats['reused']} unchanged, {stats['no_key']} without key")
+                if stats['stale']:
+                    print(f"[!] {stats['stale']} entries without key keep their previously indexed strings")
+                for name, value in stats.items():
+                    totals[name] = totals.get(name, 0) + value
+            finish_profile(profiler, args, stats=totals)
+        elif args.command == 'search':
+            query_started = time.perf_counter()
+            try:
+                hits = index.search(args.query, args.limit, args.fts)
+            except sqlite3.OperationalError as exc:
+                print(f"[!] Invalid query: {exc}")
+                sys.exit(1)
+            elapsed = time.perf_counter() - query_started
+            for hit in hits:
+                print(f"{hit['label']}:{hit['entry']}  @0x{hit['offset']:X}+{hit['length']}  {hit['text'][:80]}")
+            print(f"[*] {len(hits)} postings in {elapsed * 1000:.2f} ms")
+        elif args.command == 'stats':
+            stats = index.stats()
+            for label, count in stats['labels'].items():
+                print(f"{label:24s} {count:8d} entries")
+            print(f"Contents: {stats['contents']}  strings: {stats['strings']}  "
+                  f"unreferenced: {stats['unreferenced']}")
+        else:
+            print(f"[+] Removed {index.prune()} unreferenced contents")
+
+    print(f"[*] Completed in {time.perf_counter() - started:.2f}s")
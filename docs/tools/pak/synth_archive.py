@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Synthetic ARMS IDX/PAK generator for benchmarks and tests.
+
+Writes an archive that has the layout of ui.idx / ui.pak without needing the
+client: 276-byte IDX entries, payloads back to back with cumulative offsets
+from 0x27D, compressed_size 0 on uncompressed entries, backslash-separated
+names (some Korean, cp949), a mix of Cocos UI XML and FlatBuffers-style CSB
+entries, ZLIB flag=2 entries and a random key per entry (XOR over the ZLIB
+stream for flag=2, as in the real archive). The keys are written to a .l1rk
+keystore next to the IDX, so every tool can decrypt the result.
+
+Output is deterministic for a given seed and settings. Payload sizes follow a
+log-normal distribution around --mean-size; at the default 2 KB a 1M-entry
+archive is about 2 GB of PAK.
+
+Usage:
+  python synth_archive.py <out.idx> [--entries 10K] [--seed 0] [--xml-ratio 0.6]
+                          [--zlib-ratio 0.4] [--mean-size 2048] [--key-length 38]
+"""
+
+import argparse
+import math
+import random
+import struct
+import sys
+import time
+from pathlib import Path
+
+from keystore import DEFAULT_KEY_LENGTH, write_keystore
+from pak_format import FLAG_STORED, FLAG_ZLIB, XML_PROLOG, PakWriter
+
+DEFAULT_ENTRIES = 10_000
+DEFAULT_MEAN_SIZE = 2048
+DEFAULT_XML_RATIO = 0.6
+DEFAULT_ZLIB_RATIO = 0.4
+SIZE_SIGMA = 0.8
+KOREAN_NAME_RATIO = 0.05
+NODE_POOL = 4096
+
+DIRECTORIES = ('Action', 'Character', 'Chat', 'Common', 'Inventory', 'Map', 'Party', 'Quest', 'Shop', 'Skill')
+WIDGETS = ('Button', 'CheckBox', 'ImageView', 'ListView', 'LoadingBar', 'Panel', 'ScrollView', 'Slider', 'Text',
+           'TextField')
+TEXTS = ('OK', 'Cancel', 'Close', 'Level', 'Inventory', '확인', '취소', '아이템', '캐릭터 선택', '채팅',
+         '설정', '인벤토리', '상점', '파티 초대', '퀘스트 완료', '스킬 습득')
+FONTS = ('fonts/NanumGothic.ttf', 'fonts/NanumGothicBold.ttf', 'fonts/arial.ttf')
+# cp949 entry-name stems for the share of entries with Korean names
+KOREAN_STEMS = ('창', '버튼', '목록', '상점창', '채팅창')
+
+
+def parse_count(text):
+    """Entry count with an optional K/M suffix: '1K' -> 1000, '1M' -> 1000000."""
+    text = text.strip().upper()
+    scale = {'K': 1_000, 'M': 1_000_000}.get(text[-1:], 1)
+    return int(float(text[:-1] if scale > 1 else text) * scale)
+
+
+def entry_name(rng, index, extension):
+    directory = rng.choice(DIRECTORIES)
+    if rng.random() < KOREAN_NAME_RATIO:
+        stem = rng.choice(KOREAN_STEMS)
+    else:
+        stem = f"{directory}_{rng.choice(WIDGETS)}"
+    return f"{directory}\\{stem}_{index:06d}.{extension}"
+
+
+def xml_node(rng, node):
+    """One <UIObject/> line of a Cocos UI layout."""
+    widget = rng.choice(WIDGETS)
+    directory = rng.choice(DIRECTORIES).lower()
+    attributes = (f'name="{widget.lower()}_{node}" type="{widget}" x="{rng.randrange(1280)}" '
+                  f'y="{rng.randrange(720)}" width="{rng.randrange(16, 512)}" height="{rng.randrange(16, 256)}"')
+    if widget in ('Text', 'TextField', 'Button'):
+        attributes += (f' text="{rng.choice(TEXTS)}" fontName="{rng.choice(FONTS)}" '
+                       f'fontSize="{rng.choice((12, 14, 16, 18))}" color="255,255,255"')
+    if widget in ('ImageView', 'Button', 'Panel', 'LoadingBar'):
+        attributes += f' image="ui/{directory}/{widget.lower()}_{rng.randrange(100)}.png"'
+    if rng.random() < 0.1:
+        attributes += f' csb="{directory}/{widget.lower()}_{rng.randrange(100)}.csb"'
+    return f'  <UIObject {attributes} visible="true"/>\n'.encode('utf-8')
+
+
+def _fb_string(text):
+    """FlatBuffers string: u32 length, UTF-8 bytes, NUL, padding to 4 bytes."""
+    raw = text.encode('utf-8')
+    body = struct.pack('<I', len(raw)) + raw + b'\x00'
+    return body + bytes(-len(body) % 4)
+
+
+def csb_node(rng, node):
+    """One FlatBuffers-style node: vtable, scalar fields, name/texture/text strings."""
+    widget = rng.choice(WIDGETS)
+    out = struct.pack('<7H', 14, 24, 4, 8, 12, 16, 20) + b'\x00\x00'
+    out += struct.pack('<iiiif', rng.randrange(1280), rng.randrange(720), rng.randrange(16, 512),
+                       rng.randrange(16, 256), rng.choice((1.0, 0.5, 2.0)))
+    out += _fb_string(f"{widget.lower()}_{node}")
+    out += _fb_string(f"ui/{rng.choice(DIRECTORIES).lower()}/{widget.lower()}_{rng.randrange(100)}.png")
+    if widget in ('Text', 'TextField', 'Button'):
+        out += _fb_string(rng.choice(TEXTS))
+    return out
+
+
+def _assemble(rng, pool, head, tail, size):
+    """head + nodes drawn from the pool until about `size` bytes + tail."""
+    mean = sum(len(node) for node in pool[:64]) / 64
+    nodes = rng.choices(pool, k=max(1, int((size - len(head)) / mean) + 1))
+    return head + b''.join(nodes) + tail
+
+
+def synth_xml(rng, index, size, pool):
+    """Cocos UI layout XML of roughly `size` bytes, built from a pool of xml_node() lines."""
+    head = XML_PROLOG + f'\n<UIObject name="Window_{index}" type="Layer" width="1280" height="720">\n'.encode()
+    return _assemble(rng, pool, head, b'</UIObject>\n', size)
+
+
+def synth_csb(rng, index, size, pool):
+    """FlatBuffers-shaped CSB of roughly `size` bytes, built from a pool of csb_node() records."""
+    return _assemble(rng, pool, struct.pack('<I', 12) + b'CSB\x00' + struct.pack('<I', index), b'', size)
+
+
+def generate(idx_path, entries=DEFAULT_ENTRIES, seed=0, xml_ratio=DEFAULT_XML_RATIO, zlib_ratio=DEFAULT_ZLIB_RATIO,
+             mean_size=DEFAULT_MEAN_SIZE, key_length=DEFAULT_KEY_LENGTH, keystore_path=None, level=6):
+    """
+    Write a synthetic IDX/PAK pair and its keystore.
+
+    Args:
+        idx_path: Output .idx path (the .pak goes next to it)
+        entries: Number of entries
+        seed: RNG seed; equal settings give identical archives
+        xml_ratio: Share of .xml entries (the rest are .csb)
+        zlib_ratio: Share of flag=2 entries
+        mean_size: Median plaintext size in bytes
+        key_length: Per-entry XOR key length
+        keystore_path: Output .l1rk (default: next to the .idx)
+        level: ZLIB level for flag=2 entries
+
+    Returns:
+        stats dict (entries, xml, csb, zlib, plain_bytes, pak_bytes, idx, pak, keystore)
+    """
+    rng = random.Random(seed)
+    keystore_path = Path(keystore_path) if keystore_path else Path(idx_path).with_suffix('.l1rk')
+    mu = math.log(mean_size)
+    stats = {'entries': entries, 'xml': 0, 'csb': 0, 'zlib': 0, 'plain_bytes': 0}
+    records = []
+    # Entries are drawn from shared node pools: per-node generation would dominate the run time
+    xml_pool = [xml_node(rng, node) for node in range(NODE_POOL)]
+    csb_pool = [csb_node(rng, node) for node in range(NODE_POOL)]
+
+    with PakWriter(idx_path) as writer:
+        for index in range(entries):
+            size = int(min(max(rng.lognormvariate(mu, SIZE_SIGMA), 64), mean_size * 64))
+            if rng.random() < xml_ratio:
+                name, plain = entry_name(rng, index, 'xml'), synth_xml(rng, index, size, xml_pool)
+                stats['xml'] += 1
+            else:
+                name, plain = entry_name(rng, index, 'csb'), synth_csb(rng, index, size, csb_pool)
+                stats['csb'] += 1
+            flag = FLAG_ZLIB if rng.random() < zlib_ratio else FLAG_STORED
+            stats['zlib'] += flag == FLAG_ZLIB
+            key = rng.randbytes(key_length)
+            writer.add_plain(name, plain, key, flag, level)
+            records.append({'name': name, 'index': index, 'key': key})
+            stats['plain_bytes'] += len(plain)
+        stats['pak_bytes'] = writer.offset
+
+    write_keystore(keystore_path, records, key_length, ['synthetic'],
+                   f"synth_archive.py seed {seed}, {entries} entries")
+    stats.update(idx=str(idx_path), pak=str(writer.pak_path), keystore=str(keystore_path))
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic ARMS IDX/PAK pair with per-entry keys")
+    parser.add_argument('idx', help="Output .idx path (.pak and .l1rk are written next to it)")
+    parser.add_argument('--entries', type=parse_count, default=DEFAULT_ENTRIES, help="Entry count, e.g. 1K, 100K, 1M")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--xml-ratio', type=float, default=DEFAULT_XML_RATIO, help="Share of .xml entries")
+    parser.add_argument('--zlib-ratio', type=float, default=DEFAULT_ZLIB_RATIO, help="Share of flag=2 entries")
+    parser.add_argument('--mean-size', type=int, default=DEFAULT_MEAN_SIZE, help="Median plaintext size in bytes")
+    parser.add_argument('--key-length', type=int, default=DEFAULT_KEY_LENGTH)
+    parser.add_argument('--keystore', help="Output keystore (default: next to the .idx)")
+    args = parser.parse_args()
+
+    if args.entries < 1 or args.mean_size < 64 or args.key_length < 1:
+        print("[!] --entries and --key-length must be positive, --mean-size at least 64")
+        sys.exit(1)
+
+    Path(args.idx).parent.mkdir(parents=True, exist_ok=True)
+    started = time.perf_counter()
+    stats = generate(args.idx, args.entries, args.seed, args.xml_ratio, args.zlib_ratio, args.mean_size,
+                     args.key_length, args.keystore)
+    elapsed = time.perf_counter() - started
+    print(f"[+] {stats['entries']} entries ({stats['xml']} xml, {stats['csb']} csb, {stats['zlib']} flag=2) "
+          f"-> {stats['idx']} / {stats['pak']}")
+    print(f"    Plain {stats['plain_bytes'] / 1024 / 1024:.1f} MB, PAK {stats['pak_bytes'] / 1024 / 1024:.1f} MB, "
+          f"keys in {stats['keystore']}")
+    print(f"[*] Completed in {elapsed:.2f}s ({stats['entries'] / elapsed:.0f} entries/s)")
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Two-time-pad detection across archive entries with LSH bucketing.
+
+If two entries share a keystream, XORing their ciphertexts cancels the key.
+test_double_encryption.py can only check that by hand, pair by pair. This
+tool fingerprints the first K bytes of every entry as ciphertext XOR the
+predicted plaintext (the XML prolog for .xml entries; nothing for entries
+without a crib, so their raw ciphertext is used), which is the predicted
+keystream; for cribbed entries only the predicted bytes are kept.
+Fingerprints are bucketed with bit-sampling locality-sensitive hashing on
+Hamming distance, so only entries that collide in some band are compared:
+near-linear in the entry count instead of O(n^2) over all 3,578 entries.
+
+Cribbed fingerprints (predicted keystream) and uncribbed ones (raw
+ciphertext) are different quantities, so a distance between the two means
+nothing: each group gets its own LSH index and only pairs within a group are
+compared. Buckets larger than --max-bucket (identical fingerprints, e.g.
+empty entries) are not expanded into pairs; each one is logged with its size
+and a few members.
+
+With --snapshot the fingerprints come from the snapshot's memory-mapped head
+array (--bytes at most the snapshot width) and no PAK is needed.
+
+Pairs with identical fingerprints share a keystream; pairs within the
+distance threshold have related keystreams (partially shared key material).
+
+Requires numpy.
+
+Usage:
+  python two_time_pad.py <ui.idx> [--bytes 64] [--bands 16 --rows 24]
+                         [--threshold 0.15] [--max-bucket 256] [--output ttp.json] [--profile profile.json]
+  python two_time_pad.py --snapshot ui_snapshot.npz [--bytes 64] ...
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from header_classifier import header_matrix
+from instrument import DISABLED, add_profile_arguments, finish_profile, profiler_from_args
+from pak_format import FLAG_STORED, NAME_ENCODING, XML_PROLOG, default_pak_path, read_idx_table, stored_sizes
+from snapshot import add_snapshot_argument, snapshot_from_args
+
+DEFAULT_BYTES = 64
+DEFAULT_BANDS = 16
+DEFAULT_ROWS = 24
+DEFAULT_THRESHOLD = 0.15
+MIN_OVERLAP = 16
+MAX_BUCKET = 256
+
+
+def crib_matrix(table, width):
+    """
+    Predicted plaintext per entry.
+
+    Returns:
+        (uint8 matrix, boolean mask of bytes that are actually predicted)
+    """
+    names = np.char.lower(table['name'])
+    is_xml = np.char.endswith(names, b'.xml') & (table['flag'] == FLAG_STORED)
+
+    crib = np.zeros((len(table), width), dtype=np.uint8)
+    known = np.zeros((len(table), width), dtype=bool)
+    prolog = np.frombuffer(XML_PROLOG[:width], dtype=np.uint8)
+    crib[is_xml, :len(prolog)] = prolog
+    known[is_xml, :len(prolog)] = True
+    return crib, known
+
+
+def fingerprints(idx_path, pak_path=None, width=DEFAULT_BYTES, snapshot=None):
+    """
+    Predicted-keystream fingerprints for every entry (of `snapshot` if given).
+
+    Returns:
+        (table, fingerprint matrix (entries x width), valid mask, cribbed mask)
+    """
+    if snapshot is not None:
+        table = snapshot.table
+        cipher, valid = snapshot.head_matrix(width)
+    else:
+        _, table = read_idx_table(idx_path)
+        pak_path = Path(pak_path) if pak_path else default_pak_path(idx_path)
+        pak = np.memmap(pak_path, dtype=np.uint8, mode='r') if pak_path.stat().st_size else np.zeros(0, np.uint8)
+
+        lengths = np.minimum(stored_sizes(table), width).astype(np.int64)
+        cipher, valid = header_matrix(pak, table['offset'], lengths, width)
+    crib, known = crib_matrix(table, width)
+    cribbed = known.any(axis=1)
+
+    # Cribbed entries only contribute the bytes whose keystream is predicted
+    valid &= np.where(cribbed[:, None], known, True)
+    prints = np.where(valid, cipher ^ crib, 0).astype(np.uint8)
+    return table, prints, valid, cribbed
+
+
+def lsh_candidates(bits, bands, rows, seed=0, max_bucket=MAX_BUCKET):
+    """
+    Bit-sampling LSH: each band hashes `rows` randomly chosen bit positions.
+    Two fingerprints at normalised Hamming distance d collide in a band with
+    probability (1 - d)^rows.
+
+    Returns:
+        (set of (i, j) candidate pairs with i < j,
+         {oversized bucket as a sorted tuple of rows: [bands it was skipped in]})
+    """
+    rng = np.random.default_rng(seed)
+    weights = np.left_shift(np.uint64(1), np.arange(rows, dtype=np.uint64))
+    pairs = set()
+    oversized = {}
+
+    for band in range(bands):
+        positions = rng.choice(bits.shape[1], size=rows, replace=False)
+        codes = (bits[:, positions].astype(np.uint64) * weights).sum(axis=1)
+
+        order = np.argsort(codes, kind='stable')
+        sorted_codes = codes[order]
+        boundaries = np.flatnonzero(np.diff(sorted_codes)) + 1
+        for group in np.split(order, boundaries):
+            if len(group) < 2:
+                continue
+            group = np.sort(group)
+            if len(group) > max_bucket:
+                oversized.setdefault(tuple(int(row) for row in group), []).append(band)
+                continue
+            for a in range(len(group)):
+                for b in range(a + 1, len(group)):
+                    pairs.add((int(group[a]), int(group[b])))
+    return pairs, oversized
+
+
+def hamming(prints, valid, i, j):
+    """Normalised bit distance over the bytes both entries have, or None if they overlap too little."""
+    both = valid[i] & valid[j]
+    overlap = int(both.sum())
+    if overlap < MIN_OVERLAP:
+        return None, overlap
+    diff = np.unpackbits(prints[i][both] ^ prints[j][both])
+    return float(diff.sum()) / (overlap * 8), overlap
+
+
+def detect(idx_path, pak_path=None, width=DEFAULT_BYTES, bands=DEFAULT_BANDS, rows=DEFAULT_ROWS,
+           threshold=DEFAULT_THRESHOLD, seed=0, max_bucket=MAX_BUCKET, profiler=DISABLED, snapshot=None):
+    """
+    Find entries with shared or related keystreams.
+
+    Returns:
+        report dict with pairs, shared-keystream clusters and counters
+    """
+    with profiler.stage('fingerprints') as stage:
+        table, prints, valid, cribbed = fingerprints(idx_path, pak_path, width, snapshot)
+        stage.add(bytes=int(valid.sum()), entries=len(table))
+    bits = np.unpackbits(prints, axis=1)
+
+    # One LSH index per fingerprint kind; rows are mapped back to table rows
+    candidates = set()
+    oversized = []
+    with profiler.stage('lsh', entries=len(table)):
+        for group_name, members in (('cribbed', np.flatnonzero(cribbed)), ('raw', np.flatnonzero(~cribbed))):
+            if len(members) < 2:
+                continue
+            group_pairs, group_oversized = lsh_candidates(bits[members], bands, rows, seed, max_bucket)
+            candidates.update((int(members[i]), int(members[j])) for i, j in group_pairs)
+            oversized.extend((group_name, [int(members[row]) for row in bucket], group_bands)
+                             for bucket, group_bands in group_oversized.items())
+
+    parent = list(range(len(table)))
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def name(row):
+        return table['name'][row].decode(NAME_ENCODING, errors='replace')
+
+    pairs = []
+    with profiler.stage('compare', entries=len(candidates)):
+        for i, j in sorted(candidates):
+            distance, overlap = hamming(prints, valid, i, j)
+            if distance is None or distance > threshold:
+                continue
+            kind = 'shared' if distance == 0 else 'related'
+            if kind == 'shared':
+                parent[find(i)] = find(j)
+            both = valid[i] & valid[j]
+            # With a shared keystream, C_a ^ C_b = P_a ^ P_b
+            plain_xor = prints[i][both] ^ prints[j][both]
+            pairs.append({
+                'a': name(i),
+                'b': name(j),
+                'kind': kind,
+                'distance': round(distance, 4),
+                'overlap_bytes': overlap,
+                'cribbed': bool(cribbed[i] and cribbed[j]),
+                'xor_preview': bytes(plain_xor[:16]).hex(),
+            })
+
+    clusters = {}
+    for row in range(len(table)):
+        clusters.setdefault(find(row), []).append(name(row))
+    shared_clusters = sorted((members for members in clusters.values() if len(members) > 1), key=len, reverse=True)
+
+    report = {
+        'idx': snapshot.meta['idx'] if snapshot is not None else str(idx_path),
+        'entries': len(table),
+        'fingerprint_bytes': width,
+        'bands': bands,
+        'rows_per_band': rows,
+        'threshold': threshold,
+        'cribbed_entries': int(cribbed.sum()),
+        'candidate_pairs': len(candidates),
+        'max_bucket': max_bucket,
+        'oversized_buckets': [{'group': group_name, 'size': len(bucket), 'bands': group_bands,
+                               'members': [name(row) for row in bucket[:20]]}
+                              for group_name, bucket, group_bands in oversized],
+        'pairs': pairs,
+        'shared_clusters': shared_clusters,
+    }
+    if snapshot is not None:
+        report['snapshot'] = str(snapshot.path)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Detect entries that share a keystream (two-time pad)")
+    parser.add_argument('idx', nargs='?', help="Path to the .idx file")
+    add_snapshot_argument(parser)
+    parser.add_argument('--pak', help="Path to the .pak file (default: next to the .idx)")
+    parser.add_argument('--bytes', type=int, default=DEFAULT_BYTES, help="Fingerprint length K")
+    parser.add_argument('--bands', type=int, default=DEFAULT_BANDS, help="LSH bands")
+    parser.add_argument('--rows', type=int, default=DEFAULT_ROWS, help="Sampled bits per band (max 64)")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Max normalised Hamming distance for a related keystream")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-bucket', type=int, default=MAX_BUCKET,
+                        help="Buckets with more entries are logged and not expanded into pairs")
+    parser.add_argument('--output', help="Write the report as JSON")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    snapshot = snapshot_from_args(parser, args)
+    if snapshot is not None and args.bytes > snapshot.width:
+        print(f"[!] --bytes {args.bytes} exceeds the {snapshot.width} head bytes per entry in {args.snapshot}")
+        sys.exit(1)
+    if not 1 <= args.rows <= min(64, args.bytes * 8):
+        print("[!] --rows must be between 1 and 64 (and at most 8 x --bytes)")
+        sys.exit(1)
+
+    profiler = profiler_from_args(args)
+    started = time.perf_counter()
+    report = detect(args.idx, args.pak, args.bytes, args.bands, args.rows, args.threshold, args.seed,
+                    args.max_bucket, profiler, snapshot)
+    elapsed = time.perf_counter() - started
+
+    print("=" * 80)
+    print("TWO-TIME PAD DETECTION")
+    print("=" * 80)
+    print(f"Entries: {report['entries']} ({report['cribbed_entries']} with a plaintext crib, indexed separately)")
+    print(f"LSH: {report['bands']} bands x {report['rows_per_band']} bits -> "
+          f"{report['candidate_pairs']} candidate pairs (vs {report['entries'] * (report['entries'] - 1) // 2} all-pairs)")
+    print()
+    for pair in report['pairs']:
+        print(f"  [{pair['kind']:7s}] d={pair['distance']:.3f}  {pair['a']}  <->  {pair['b']}")
+    if report['shared_clusters']:
+        print("\nShared keystream clusters:")
+        for members in report['shared_clusters']:
+            print(f"  {len(members)} entries: {', '.join(members[:8])}{' ...' if len(members) > 8 else ''}")
+    if report['oversized_buckets']:
+        print(f"\n[!] {len(report['oversized_buckets'])} bucket(s) over {report['max_bucket']} entries skipped "
+              f"(identical fingerprints, e.g. empty entries):")
+        for bucket in report['oversized_buckets']:
+            print(f"  [!] {bucket['group']}: {bucket['size']} entries in {len(bucket['bands'])} band(s), e.g. "
+                  f"{', '.join(bucket['members'][:4])}")
+    print(f"\n[*] Completed in {elapsed:.2f}s")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=1, ensure_ascii=False), encoding='utf-8')
+        print(f"[+] Report written to {args.output}")
+    finish_profile(profiler, args)
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Archive-wide round-trip integrity verifier.
+
+verify_keys.py and final_verification.py check three hard-coded entries
+against the first 38 bytes of the XML prolog. This tool checks every IDX entry
+in a process pool:
+  1. decrypt (keystore, falling back to the XML prolog crib)
+  2. inflate flag=2 entries
+  3. validate: expected size, XML prolog, CSB header
+  4. re-compress (trying every ZLIB level) and re-encrypt, then compare
+     with the stored bytes
+and writes a machine-readable JSON report. Run it on a repack before shipping.
+
+An entry passes only when its stored bytes are reproduced exactly. Entries
+whose ZLIB stream no level reproduces are reported as 'unreproducible', and
+entries without a key as 'no-key'; both fail the run (exit 2) unless
+--allow-unreproducible / --allow-no-key accept them.
+
+Re-encrypting a flag=0 entry with the key it was decrypted with always gives
+the stored bytes back, and a key derived from the entry's own XML prolog
+(the crib fallback, used for entries the keystore lacks) always decrypts to
+that prolog. Such entries are reported as 'unverified' and, like 'no-key',
+need --allow-no-key to pass.
+
+Usage:
+  python verify_archive.py <ui.idx> [--keystore keys.l1rk] [--parse-xml] [--allow-no-key] [--allow-unreproducible]
+                           [--output verify_report.json] [--profile profile.json]
+"""
+
+import argparse
+import json
+import struct
+import sys
+import time
+import xml.etree.ElementTree as ET
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from instrument import DISABLED, add_profile_arguments, finish_profile, profiler_from_args
+from pak_format import FLAG_ZLIB, NoKeyError, PakArchive, crib_key_lookup, encode_payload, xor_repeat
+
+# Levels tried, in order, when reproducing a stored ZLIB stream byte for byte
+ZLIB_LEVELS = (6, 9, 1, 2, 3, 4, 5, 7, 8)
+CSB_MAGIC = b'CSB'
+
+_archive = None
+_keystore = None
+
+
+def _open_worker(idx_path, pak_path, keystore_path):
+    """Process pool initializer: each worker maps the PAK (and keystore) once."""
+    global _archive, _keystore
+    lookup = {}
+    if keystore_path:
+        from keystore import Keystore
+        _keystore = Keystore(keystore_path)
+        lookup['key_lookup'] = _keystore.lookup
+    _archive = PakArchive(idx_path, pak_path, **lookup)
+
+
+def validate_format(name, plain, parse_xml=False):
+    """
+    Check that a plaintext looks like its file type.
+
+    Returns:
+        (format label, problem or None)
+    """
+    lower = name.lower()
+    if lower.endswith('.xml'):
+        if not plain.startswith(b'<?xml'):
+            return 'xml', 'missing XML prolog'
+        end = plain.find(b'?>')
+        if end < 0 or end > 200:
+            return 'xml', 'unterminated XML prolog'
+        if parse_xml:
+            try:
+                ET.fromstring(plain)
+            except (ET.ParseError, LookupError) as e:
+                # LookupError: the prolog names an encoding that does not exist (a wrong key)
+                return 'xml', f'not well-formed: {e}'
+        return 'xml', None
+
+    if lower.endswith('.csb'):
+        if plain.startswith(CSB_MAGIC):
+            return 'csb', None
+        # Cocos CSB is a FlatBuffer: the first u32 is the root table offset
+        if len(plain) >= 8 and 4 <= struct.unpack_from('<I', plain)[0] < len(plain):
+            return 'csb-flatbuffer', None
+        return 'csb', 'neither CSB magic nor a valid FlatBuffers root offset'
+
+    return 'other', None
+
+
+def verify_entry(job):
+    """Round-trip one entry; runs inside a pool worker."""
+    index, parse_xml = job
+    entry = _archive.entries[index]
+    result = {'index': entry.index, 'name': entry.name, 'flag': entry.flag}
+
+    try:
+        stored = _archive.raw(entry)
+    except ValueError as e:
+        result.update(status='fail', problem=str(e))
+        return result
+
+    try:
+        key = _archive.key(entry, stored)
+    except NoKeyError:
+        result['status'] = 'no-key'
+        return result
+
+    body = xor_repeat(stored, key)
+    if entry.flag == FLAG_ZLIB:
+        try:
+            plain = zlib.decompress(body)
+        except zlib.error as e:
+            result.update(status='fail', problem=f'inflate failed: {e}')
+            return result
+    else:
+        plain = body
+
+    problems = []
+    if len(plain) != entry.size:
+        problems.append(f'size {len(plain)} != IDX size {entry.size}')
+    result['format'], format_problem = validate_format(entry.name, plain, parse_xml)
+    if format_problem:
+        problems.append(format_problem)
+
+    if entry.flag == FLAG_ZLIB:
+        match = None
+        for level in ZLIB_LEVELS:
+            if encode_payload(plain, key, entry.flag, level) == stored:
+                match = level
+                break
+        if match is not None:
+            result['roundtrip'] = 'bytes'
+            result['zlib_level'] = match
+        elif not problems:
+            result.update(status='unreproducible', problem='not byte-reproducible: no ZLIB level re-creates the '
+                                                           'stored stream')
+            return result
+    else:
+        if encode_payload(plain, key, entry.flag) == stored:
+            result['roundtrip'] = 'bytes'
+        else:
+            problems.append('re-encrypted payload differs from stored bytes')
+        from_crib = _keystore is None or _keystore.get(entry.name, entry.index) is None
+        if not problems and from_crib and crib_key_lookup(entry, stored):
+            result.update(status='unverified', problem='key derived from the entry\'s own XML prolog: '
+                                                       'nothing to check it against')
+            return result
+
+    result['status'] = 'fail' if problems else 'ok'
+    if problems:
+        result['problem'] = '; '.join(problems)
+    return result
+
+
+def verify_archive(idx_path, pak_path=None, keystore_path=None, parse_xml=False, workers=None, profiler=DISABLED,
+                   allow=()):
+    """
+    Verify every entry of an archive.
+
+    Args:
+        allow: Statuses besides 'ok' that still pass ('no-key', 'unreproducible')
+
+    Returns:
+        report dict with a summary and one result per entry
+    """
+    started = time.perf_counter()
+    with profiler.stage('read_idx') as stage, PakArchive(idx_path, pak_path) as archive:
+        count = len(archive.entries)
+        total_bytes = sum(entry.stored_size for entry in archive.entries)
+        stage.add(entries=count)
+
+    jobs = [(index, parse_xml) for index in range(count)]
+    with profiler.stage('decrypt_verify', bytes=total_bytes, entries=count), \
+            ProcessPoolExecutor(max_workers=workers, initializer=_open_worker,
+                                initargs=(idx_path, pak_path, keystore_path)) as pool:
+        results = list(pool.map(verify_entry, jobs, chunksize=64))
+
+    summary = {}
+    for result in results:
+        summary[result['status']] = summary.get(result['status'], 0) + 1
+        profiler.count(result['status'])
+    elapsed = time.perf_counter() - started
+    return {
+        'idx': str(idx_path),
+        'keystore': str(keystore_path) if keystore_path else None,
+        'entries': count,
+        'bytes': total_bytes,
+        'seconds': round(elapsed, 3),
+        'summary': summary,
+        'passed': all(status == 'ok' or status in allow for status in summary),
+        'results': results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Round-trip verify every entry of an IDX/PAK archive")
+    parser.add_argument('idx', help="Path to the .idx file")
+    parser.add_argument('--pak', help="Path to the .pak file (default: next to the .idx)")
+    parser.add_argument('--keystore', help="Per-entry .l1rk keystore")
+    parser.add_argument('--parse-xml', action='store_true', help="Fully parse XML entries, not just the prolog")
+    parser.add_argument('--allow-no-key', action='store_true',
+                        help="Pass even if some entries have no key or only their XML prolog crib key")
+    parser.add_argument('--allow-unreproducible', action='store_true',
+                        help="Pass even if some ZLIB streams cannot be re-created byte for byte")
+    parser.add_argument('--workers', type=int, help="Process pool size (default: CPU count)")
+    parser.add_argument('--output', default='verify_report.json', help="JSON report path")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    if not Path(args.idx).exists():
+        print(f"[!] File not found: {args.idx}")
+        sys.exit(1)
+
+    profiler = profiler_from_args(args)
+    allow = [status for status, flag in (('no-key', args.allow_no_key), ('unverified', args.allow_no_key),
+                                         ('unreproducible', args.allow_unreproducible)) if flag]
+    report = verify_archive(args.idx, args.pak, args.keystore, args.parse_xml, args.workers, profiler, allow)
+    with profiler.stage('write_report'):
+        Path(args.output).write_text(json.dumps(report, indent=1, ensure_ascii=False), encoding='utf-8')
+
+    print("=" * 80)
+    print("ARCHIVE VERIFICATION")
+    print("=" * 80)
+    print(f"Entries: {report['entries']}  ({report['bytes'] / 1024 / 1024:.1f} MB) in {report['seconds']:.2f}s")
+    for status, count in sorted(report['summary'].items()):
+        print(f"  {status:14s}: {count}")
+    for result in report['results']:
+        if result['status'] in ('fail', 'unreproducible'):
+            print(f"  [!] {result['name']}: {result['problem']}")
+    for status, reason in (('no-key', 'no key'), ('unverified', 'XML prolog crib key only')):
+        unverified = report['summary'].get(status, 0)
+        if unverified:
+            print(f"  [!] {unverified} entries not verified ({reason})"
+                  f"{'' if args.allow_no_key else '; pass --keystore, or --allow-no-key to accept'}")
+    print(f"\n[{'+' if report['passed'] else '!'}] {'PASSED' if report['passed'] else 'FAILED'}")
+    print(f"[+] Report written to {args.output}")
+    finish_profile(profiler, args)
+    sys.exit(0 if report['passed'] else 2)
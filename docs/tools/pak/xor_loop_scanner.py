@@ -0,0 +1,580 @@
+#!/usr/bin/env python3
+"""
+Byte-signature scanner for repeating-key XOR loops in client executables.
+
+find_xor_key_in_exe.py can only find a key it already knows. This tool
+memory-maps Lin.bin (or any PE / raw x86 / x64 image) and searches the code
+sections with NumPy, chunk by chunk, for the instruction idioms a
+repeating-key XOR decrypt loop compiles to:
+
+  xor      xor r8, [base+index*scale(+disp)] / xor [..], r8  (30/32 with SIB)
+  load     movzx r32, byte [..]                               (0F B6)
+  modulo   div/idiv reg, `i % N` multiply-by-magic constants for N <= 1024,
+           and reg, 2^k-1
+  bound    cmp reg, imm followed by a conditional jump
+  loop     backward conditional jump enclosing the XOR
+
+Every indexed XOR is scored by the idioms around it, nearby sites are merged,
+and the sites are ranked. Absolute and RIP-relative data references near each
+site (disp32 operands, lea, mov/push imm32) are resolved through the PE
+section table; those landing in initialised data are ranked as candidate key
+tables, with a preview of their bytes. No disassembler is needed.
+
+Requires numpy.
+
+Usage:
+  python xor_loop_scanner.py <Lin.bin> [--top 30] [--bits 32|64] [--output sites.json] [--profile profile.json]
+"""
+
+import argparse
+import bisect
+import json
+import mmap
+import struct
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from instrument import DISABLED, add_profile_arguments, finish_profile, profiler_from_args
+
+CHUNK = 16 << 20
+PAD = 16
+WINDOW = 64
+MERGE_DISTANCE = 32
+MAX_SITES = 500
+MAX_KEY_LENGTH = 1024
+PREVIEW_BYTES = 48
+
+SCN_CNT_CODE = 0x00000020
+SCN_MEM_EXECUTE = 0x20000000
+SCN_CNT_INITIALIZED_DATA = 0x00000040
+
+WEIGHTS = {
+    'indexed': 1.0,
+    'byte_op': 0.5,
+    'loop': 2.0,
+    'modulo': 2.0,
+    'bound': 1.5,
+    'load': 0.5,
+    'table': 1.0,
+}
+
+
+class Section:
+    def __init__(self, name, rva, virtual_size, raw_offset, raw_size, characteristics):
+        self.name = name
+        self.rva = rva
+        self.virtual_size = virtual_size
+        self.raw_offset = raw_offset
+        self.raw_size = raw_size
+        self.characteristics = characteristics
+
+    @property
+    def executable(self):
+        return bool(self.characteristics & (SCN_CNT_CODE | SCN_MEM_EXECUTE))
+
+    @property
+    def initialised_data(self):
+        return bool(self.characteristics & SCN_CNT_INITIALIZED_DATA) and not self.executable
+
+
+class Image:
+    """
+    Minimal PE view: code sections, bitness and address translation. Files
+    that are not PE images are treated as one raw code section at address 0.
+    """
+
+    def __init__(self, data, bits=None):
+        self.data = data
+        self.image_base = 0
+        self.bits = bits or 32
+        self.sections = []
+        self.is_pe = False
+
+        if len(data) >= 0x40 and data[:2] == b'MZ':
+            pe = struct.unpack_from('<I', data, 0x3C)[0]
+            if pe + 24 <= len(data) and data[pe:pe + 4] == b'PE\x00\x00':
+                self._parse_pe(pe, bits)
+        if not self.sections:
+            self.sections = [Section('raw', 0, len(data), 0, len(data), SCN_CNT_CODE)]
+
+    def _parse_pe(self, pe, bits):
+        machine, count, _, _, _, optional_size, _ = struct.unpack_from('<HHIIIHH', self.data, pe + 4)
+        optional = pe + 24
+        magic = struct.unpack_from('<H', self.data, optional)[0]
+        if magic == 0x20B:
+            self.image_base = struct.unpack_from('<Q', self.data, optional + 24)[0]
+        else:
+            self.image_base = struct.unpack_from('<I', self.data, optional + 28)[0]
+        self.bits = bits or (64 if machine == 0x8664 or magic == 0x20B else 32)
+
+        table = optional + optional_size
+        for index in range(count):
+            pos = table + index * 40
+            if pos + 40 > len(self.data):
+                break
+            name = self.data[pos:pos + 8].rstrip(b'\x00').decode('ascii', errors='replace')
+            virtual_size, rva, raw_size, raw_offset = struct.unpack_from('<IIII', self.data, pos + 8)
+            characteristics = struct.unpack_from('<I', self.data, pos + 36)[0]
+            raw_size = min(raw_size, max(len(self.data) - raw_offset, 0))
+            self.sections.append(Section(name, rva, virtual_size, raw_offset, raw_size, characteristics))
+        self.is_pe = True
+
+    def offset_to_va(self, offset):
+        for section in self.sections:
+            if section.raw_offset <= offset < section.raw_offset + section.raw_size:
+                return self.image_base + section.rva + offset - section.raw_offset
+        return None
+
+    def offsets_to_va(self, offsets):
+        """Vectorised offset_to_va(); offsets outside every section map to -1."""
+        offsets = np.asarray(offsets, dtype=np.int64)
+        result = np.full(len(offsets), -1, dtype=np.int64)
+        for section in self.sections:
+            inside = (offsets >= section.raw_offset) & (offsets < section.raw_offset + section.raw_size)
+            result[inside] = self.image_base + section.rva + offsets[inside] - section.raw_offset
+        return result
+
+    def va_to_offset(self, va):
+        """File offset and section of a virtual address, or (None, None)."""
+        rva = va - self.image_base
+        for section in self.sections:
+            if section.rva <= rva < section.rva + max(section.raw_size, section.virtual_size):
+                if rva - section.rva < section.raw_size:
+                    return section.raw_offset + rva - section.rva, section
+                return None, section
+        return None, None
+
+
+def modulo_magics(max_divisor=MAX_KEY_LENGTH):
+    """
+    Multiply-by-reciprocal constants compilers emit for unsigned `i % N` and
+    `i / N`: ceil(2^(32+s) / N) for 32-bit code, ceil(2^(64+s) / N) for 64-bit.
+
+    Returns:
+        ((u32 magics, divisors), (u64 magics, divisors)), sorted by magic; a constant shared by N
+        and 2^k * N maps to N, as compilers fold the power of two into a shift
+    """
+    magic32, magic64 = {}, {}
+    for divisor in range(3, max_divisor + 1):
+        if divisor & (divisor - 1) == 0:
+            continue
+        for shift in range(0, 11):
+            m32 = -(-(1 << (32 + shift)) // divisor)
+            if m32 < (1 << 32):
+                magic32.setdefault(m32, divisor)
+            m64 = -(-(1 << (64 + shift)) // divisor)
+            if m64 < (1 << 64):
+                magic64.setdefault(m64, divisor)
+
+    def table(magics, dtype):
+        keys = np.array(sorted(magics), dtype=dtype)
+        return keys, np.array([magics[int(key)] for key in keys], dtype=np.int64)
+
+    return table(magic32, np.uint32), table(magic64, np.uint64)
+
+
+def _lookup(magics, values):
+    """Match values against a sorted (keys, divisors) table: (hit mask, divisors of the hits)."""
+    keys, divisors = magics
+    at = np.minimum(np.searchsorted(keys, values), len(keys) - 1)
+    hits = keys[at] == values
+    return hits, divisors[at[hits]]
+
+
+def _u32(code, positions):
+    positions = positions.astype(np.int64)
+    return (code[positions].astype(np.uint32) | (code[positions + 1].astype(np.uint32) << 8) |
+            (code[positions + 2].astype(np.uint32) << 16) | (code[positions + 3].astype(np.uint32) << 24))
+
+
+def _s32(code, positions):
+    return _u32(code, positions).astype(np.int32).astype(np.int64)
+
+
+OPCODES = [*range(0x30, 0x34), 0x0F, 0x25, 0x3D, *range(0x48, 0x50), 0x68, 0x69, *range(0x70, 0x80),
+           0x81, 0x83, 0x8D, *range(0xB8, 0xC0), 0xE2, 0xEB, 0xF7]
+
+
+def _by_opcode(code, count):
+    """
+    Positions of every opcode byte of interest, grouped by opcode with one
+    pass over the chunk.
+
+    Returns:
+        function(*opcodes) -> sorted positions starting with any of them
+    """
+    wanted = np.zeros(256, dtype=bool)
+    wanted[OPCODES] = True
+    first = code[:count]
+    pos = np.flatnonzero(wanted[first])
+    ops = first[pos]
+    order = np.argsort(ops, kind='stable')
+    pos, ops = pos[order], ops[order]
+    bounds = np.searchsorted(ops, np.arange(257))
+
+    def at(*opcodes):
+        parts = [pos[bounds[op]:bounds[op + 1]] for op in opcodes]
+        return np.sort(np.concatenate(parts)) if len(parts) > 1 else parts[0]
+    return at
+
+
+def _jcc(code, positions):
+    """Whether a conditional jump (rel8 or rel32) starts at each position."""
+    first = code[positions]
+    return ((first >= 0x70) & (first <= 0x7F)) | ((first == 0x0F) & ((code[positions + 1] & 0xF0) == 0x80))
+
+
+def find_atoms(code, count, bits, magic32, magic64):
+    """
+    Locate idiom atoms in one chunk of code.
+
+    Args:
+        code: uint8 array of count + PAD bytes
+        count: positions to report (the padding only completes operands)
+
+    Returns:
+        dict of atom kind -> dict of NumPy arrays (pos plus kind-specific fields)
+    """
+    at = _by_opcode(code, count)
+    atoms = {}
+
+    # xor r/m8 <-> r8 (30/32) and the 32-bit forms (31/33) with a memory operand
+    pos = at(0x30, 0x31, 0x32, 0x33)
+    modrm = code[pos + 1]
+    pos, modrm = pos[(modrm >> 6) != 3], modrm[(modrm >> 6) != 3]
+    xmod, xrm, sib = modrm >> 6, modrm & 7, code[pos + 2]
+    has_sib = xrm == 4
+    # [base+index*scale], or in 32-bit code [reg+disp32], i.e. key_table[i]
+    indexed = (has_sib & (((sib >> 3) & 7) != 4)) | ((bits == 32) & ~has_sib & (xmod == 2))
+    disp32 = (xmod == 2) | ((xmod == 0) & (xrm == 5)) | (has_sib & (xmod == 0) & ((sib & 7) == 5))
+    disp = np.where(disp32, _s32(code, pos + np.where(has_sib, 3, 2)), 0)
+    rip_relative = (bits == 64) & (xmod == 0) & (xrm == 5)
+    atoms['xor'] = {
+        'pos': pos,
+        'byte_op': (code[pos] & 1) == 0,
+        'indexed': indexed,
+        'disp32': disp32 & ~rip_relative,
+        'disp': disp,
+    }
+
+    escape = at(0x0F)
+    second = code[escape + 1]
+    load = escape[(second == 0xB6) & ((code[escape + 2] >> 6) != 3)]
+    atoms['load'] = {'pos': load}
+
+    # div / idiv reg
+    division = at(0xF7)
+    division = division[(code[division + 1] & 0xF0) == 0xF0]
+    # and reg, 2^k-1 (83 /4 imm8, 81 /4 imm32, 25 imm32 for eax)
+    group83, group81 = at(0x83), at(0x81)
+    and8_pos = group83[(code[group83 + 1] & 0xF8) == 0xE0]
+    mask8 = code[and8_pos + 2].astype(np.int64)
+    keep = (mask8 >= 7) & ((mask8 & (mask8 + 1)) == 0)
+    and8_pos, mask8 = and8_pos[keep], mask8[keep]
+    and32_pos = np.concatenate([group81[(code[group81 + 1] & 0xF8) == 0xE0], at(0x25)])
+    mask32 = _u32(code, and32_pos + np.where(code[and32_pos] == 0x25, 1, 2)).astype(np.int64)
+    keep = (mask32 >= 7) & (mask32 <= MAX_KEY_LENGTH - 1) & ((mask32 & (mask32 + 1)) == 0)
+    and32_pos, mask32 = and32_pos[keep], mask32[keep]
+
+    # Reciprocal constants for i % N, loaded by mov r32, imm32 (B8+r) or
+    # imul r32, r/m32, imm32 (69 /r) and, in 64-bit code, mov r64, imm64
+    mov_pos = at(*range(0xB8, 0xC0))
+    imul_pos = at(0x69)
+    imul_pos = imul_pos[(code[imul_pos + 1] >> 6) == 3]
+    hits, magic_div = _lookup(magic32, np.concatenate([_u32(code, mov_pos + 1), _u32(code, imul_pos + 2)]))
+    magic_pos = np.concatenate([mov_pos, imul_pos])[hits]
+    if bits == 64:
+        mov64 = at(*range(0x48, 0x50))
+        mov64 = mov64[(code[mov64 + 1] & 0xF8) == 0xB8]
+        values = _u32(code, mov64 + 2).astype(np.uint64) | (_u32(code, mov64 + 6).astype(np.uint64) << np.uint64(32))
+        hits64, div64 = _lookup(magic64, values)
+        magic_pos = np.concatenate([magic_pos, mov64[hits64]])
+        magic_div = np.concatenate([magic_div, div64])
+
+    atoms['modulo'] = {
+        'pos': np.concatenate([division, and8_pos, and32_pos, magic_pos]),
+        'length': np.concatenate([np.zeros(len(division), np.int64), mask8 + 1, mask32 + 1, magic_div]),
+    }
+
+    # Backward jumps: jcc rel8, jmp rel8, loop, jcc rel32
+    short_pos = at(*range(0x70, 0x80), 0xEB, 0xE2)
+    short_pos = short_pos[code[short_pos + 1] >= 0x80]
+    short_target = short_pos + 2 + code[short_pos + 1].astype(np.int8).astype(np.int64)
+    near_pos = escape[((second & 0xF0) == 0x80) & (code[escape + 5] >= 0x80)]
+    near_target = near_pos + 6 + _s32(code, near_pos + 2)
+    atoms['loop'] = {
+        'pos': np.concatenate([short_pos, near_pos]),
+        'target': np.concatenate([short_target, near_target]),
+    }
+
+    # cmp reg, imm8 / imm32 immediately followed by a conditional jump
+    cmp8_pos = group83[(code[group83 + 1] & 0xF8) == 0xF8]
+    cmp8_pos = cmp8_pos[_jcc(code, cmp8_pos + 3)]
+    cmp32_pos = group81[(code[group81 + 1] & 0xF8) == 0xF8]
+    cmp32_pos = cmp32_pos[_jcc(code, cmp32_pos + 6)]
+    cmp_eax_pos = at(0x3D)
+    cmp_eax_pos = cmp_eax_pos[_jcc(code, cmp_eax_pos + 5)]
+    bound_pos = np.concatenate([cmp8_pos, cmp32_pos, cmp_eax_pos])
+    bound_len = np.concatenate([code[cmp8_pos + 2].astype(np.int64), _u32(code, cmp32_pos + 2).astype(np.int64),
+                                _u32(code, cmp_eax_pos + 1).astype(np.int64)])
+    keep = (bound_len >= 4) & (bound_len <= MAX_KEY_LENGTH)
+    atoms['bound'] = {'pos': bound_pos[keep], 'length': bound_len[keep]}
+
+    # Data references: mov r32, imm32 (B8+r), push imm32 (68), lea r, [disp32] / [rip+disp32]
+    lea_pos = at(0x8D)
+    lea_pos = lea_pos[(code[lea_pos + 1] & 0xC7) == 0x05]
+    if bits == 32:
+        push_pos = at(0x68)
+        ref_pos = np.concatenate([mov_pos, push_pos, lea_pos])
+        ref_value = np.concatenate([_u32(code, mov_pos + 1), _u32(code, push_pos + 1),
+                                    _u32(code, lea_pos + 2)]).astype(np.int64)
+        ref_relative = np.zeros(len(ref_pos), dtype=bool)
+    else:
+        # RIP-relative: the value is the displacement from the start of the lea
+        ref_pos = lea_pos
+        ref_value = 6 + _s32(code, lea_pos + 2)
+        ref_relative = np.ones(len(ref_pos), dtype=bool)
+    atoms['ref'] = {'pos': ref_pos, 'value': ref_value, 'relative': ref_relative}
+    return atoms
+
+
+def scan_section(data, section, bits, magic32, magic64):
+    """Concatenated atoms of one code section, positions as file offsets."""
+    merged = {}
+    view = np.frombuffer(data, dtype=np.uint8, count=section.raw_size, offset=section.raw_offset)
+    for start in range(0, section.raw_size, CHUNK):
+        count = min(CHUNK, section.raw_size - start)
+        code = view[start:start + count + PAD]
+        if len(code) < count + PAD:
+            code = np.concatenate([code, np.zeros(count + PAD - len(code), dtype=np.uint8)])
+        for kind, fields in find_atoms(code, count, bits, magic32, magic64).items():
+            fields = dict(fields)
+            offset = section.raw_offset + start
+            fields['pos'] = fields['pos'].astype(np.int64) + offset
+            if kind == 'loop':
+                fields['target'] = fields['target'] + offset
+            bucket = merged.setdefault(kind, {name: [] for name in fields})
+            for name, values in fields.items():
+                bucket[name].append(values)
+    return {kind: {name: np.concatenate(parts) for name, parts in fields.items()} for kind, fields in merged.items()}
+
+
+def _window(positions, low, high):
+    """Index range of sorted `positions` inside [low, high] for every pair of bounds."""
+    return np.searchsorted(positions, low, side='left'), np.searchsorted(positions, high, side='right')
+
+
+def score_sites(atoms, window=WINDOW, max_sites=MAX_SITES):
+    """
+    Score every indexed XOR by the idioms around it.
+
+    Returns:
+        list of up to max_sites site dicts, best first, with nearby sites merged
+    """
+    candidate = atoms['xor']['indexed'] | atoms['xor']['disp32']
+    xor = {name: values[candidate] for name, values in atoms['xor'].items()}
+    pos = xor['pos']
+    if not len(pos):
+        return []
+
+    ordered = {}
+    for kind in ('load', 'modulo', 'bound', 'ref'):
+        order = np.argsort(atoms[kind]['pos'], kind='stable')
+        ordered[kind] = {name: values[order] for name, values in atoms[kind].items()}
+    sorted_pos = {kind: fields['pos'] for kind, fields in ordered.items()}
+
+    lo, hi = _window(sorted_pos['modulo'], pos - window, pos + window)
+    modulo_count = hi - lo
+    lo_b, hi_b = _window(sorted_pos['bound'], pos - window, pos + window)
+    bound_count = hi_b - lo_b
+    lo_l, hi_l = _window(sorted_pos['load'], pos - 16, pos)
+    load_count = hi_l - lo_l
+
+    # A short backward jump (target <= XOR < jump, body <= 2 * window bytes)
+    # encloses the XOR: count intervals opened minus intervals already closed
+    jumps = atoms['loop']
+    short = (jumps['target'] < jumps['pos']) & (jumps['pos'] - jumps['target'] <= 2 * window)
+    opened = np.searchsorted(np.sort(jumps['target'][short]), pos, side='right')
+    closed = np.searchsorted(np.sort(jumps['pos'][short]), pos, side='left')
+    in_loop = opened > closed
+
+    score = (WEIGHTS['indexed'] * xor['indexed'] + WEIGHTS['byte_op'] * xor['byte_op'] +
+             WEIGHTS['loop'] * in_loop + WEIGHTS['modulo'] * (modulo_count > 0) +
+             WEIGHTS['bound'] * (bound_count > 0) + WEIGHTS['load'] * (load_count > 0) +
+             WEIGHTS['table'] * xor['disp32'])
+
+    # Only sites inside a loop make the cut; merge each into any better site nearby
+    floor = WEIGHTS['indexed'] + WEIGHTS['loop']
+    ranked = np.argsort(-score, kind='stable')
+    ranked = ranked[score[ranked] >= floor]
+    sites = []
+    taken = []
+    lo_r, hi_r = _window(sorted_pos['ref'], pos - window, pos + window)
+    for row in ranked:
+        if len(sites) >= max_sites:
+            break
+        at = bisect.bisect_left(taken, pos[row])
+        if (at < len(taken) and taken[at] - pos[row] <= MERGE_DISTANCE) or \
+                (at > 0 and pos[row] - taken[at - 1] <= MERGE_DISTANCE):
+            continue
+        bisect.insort(taken, pos[row])
+
+        lengths = {}
+        for kind, lo_k, hi_k in (('modulo', lo, hi), ('bound', lo_b, hi_b)):
+            values = ordered[kind]['length'][lo_k[row]:hi_k[row]]
+            for value in values[values > 0].tolist():
+                lengths[value] = lengths.get(value, 0) + 1
+
+        refs = ordered['ref']['value'][lo_r[row]:hi_r[row]].tolist()
+        if xor['disp32'][row]:
+            refs.append(int(xor['disp'][row]) & 0xFFFFFFFF)
+        sites.append({
+            'offset': int(pos[row]),
+            'score': round(float(score[row]), 2),
+            'indexed': bool(xor['indexed'][row]),
+            'byte_op': bool(xor['byte_op'][row]),
+            'loop': bool(in_loop[row]),
+            'modulo': int(modulo_count[row]),
+            'bound': int(bound_count[row]),
+            'key_lengths': sorted(lengths, key=lambda n: -lengths[n])[:5],
+            'refs': refs,
+        })
+    return sites
+
+
+def resolve_tables(image, sites, preview=PREVIEW_BYTES):
+    """
+    Rank data addresses referenced near the sites.
+
+    Returns:
+        list of table dicts (va, file offset, section, referencing sites, preview), best first
+    """
+    tables = {}
+    for site in sites:
+        for va in site.pop('refs'):
+            offset, section = image.va_to_offset(va)
+            if section is None or not image.is_pe or section.executable:
+                continue
+            entry = tables.setdefault(va, {'va': va, 'offset': offset, 'section': section.name,
+                                           'sites': [], 'score': 0.0})
+            entry['sites'].append(site['offset'])
+            entry['score'] += site['score']
+
+    ranked = sorted(tables.values(), key=lambda t: (-t['score'], t['va']))
+    for table in ranked:
+        table['va'] = f"0x{table['va']:X}"
+        if table['offset'] is not None:
+            table['preview'] = bytes(image.data[table['offset']:table['offset'] + preview]).hex(' ').upper()
+            table['offset'] = f"0x{table['offset']:X}"
+        else:
+            table['preview'] = '(uninitialised)'
+        table['sites'] = [f"0x{offset:X}" for offset in sorted(set(table['sites']))]
+        table['score'] = round(table['score'], 2)
+    return ranked
+
+
+def scan(path, bits=None, profiler=DISABLED):
+    """
+    Scan an executable for repeating-key XOR loops.
+
+    Returns:
+        report dict with image info, ranked sites and ranked candidate key tables
+    """
+    with open(path, 'rb') as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        image = Image(data, bits)
+        magic32, magic64 = modulo_magics()
+        atoms = {}
+        code_sections = [s for s in image.sections if s.executable and s.raw_size]
+        for section in code_sections:
+            with profiler.stage('find_atoms', bytes=section.raw_size):
+                section_atoms = scan_section(data, section, image.bits, magic32, magic64)
+            for kind, fields in section_atoms.items():
+                bucket = atoms.setdefault(kind, {name: [] for name in fields})
+                for name, values in fields.items():
+                    bucket[name].append(values)
+        atoms = {kind: {name: np.concatenate(parts) for name, parts in fields.items()} for kind, fields in atoms.items()}
+        if 'ref' in atoms:
+            # Resolve every data reference to a virtual address
+            refs = atoms['ref']
+            refs['value'] = np.where(refs['relative'], image.offsets_to_va(refs['pos']) + refs['value'], refs['value'])
+
+        with profiler.stage('score_sites', entries=len(atoms['xor']['pos']) if atoms else 0):
+            sites = score_sites(atoms) if atoms else []
+        for site in sites:
+            va = image.offset_to_va(site['offset'])
+            site['va'] = f"0x{va:X}" if va is not None else None
+        with profiler.stage('resolve_tables', entries=len(sites)):
+            tables = resolve_tables(image, sites)
+        for site in sites:
+            site['offset'] = f"0x{site['offset']:X}"
+
+        return {
+            'file': str(path),
+            'size': len(data),
+            'format': 'PE' if image.is_pe else 'raw',
+            'bits': image.bits,
+            'image_base': f"0x{image.image_base:X}",
+            'code_sections': [s.name for s in code_sections],
+            'code_bytes': sum(s.raw_size for s in code_sections),
+            'atoms': {kind: int(len(fields['pos'])) for kind, fields in atoms.items()},
+            'sites': sites,
+            'tables': tables,
+        }
+    finally:
+        data.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find repeating-key XOR loops and key tables in an executable")
+    parser.add_argument('binary', help="Lin.bin, an .exe/.dll or a raw code dump")
+    parser.add_argument('--bits', type=int, choices=(32, 64), help="Override bitness (default: from the PE header)")
+    parser.add_argument('--top', type=int, default=30, help="Sites and tables to print")
+    parser.add_argument('--output', help="Write the full report as JSON")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    if not Path(args.binary).exists():
+        print(f"[!] File not found: {args.binary}")
+        sys.exit(1)
+
+    profiler = profiler_from_args(args)
+    started = time.perf_counter()
+    report = scan(args.binary, args.bits, profiler)
+    elapsed = time.perf_counter() - started
+
+    print("=" * 80)
+    print("XOR LOOP SIGNATURE SCAN")
+    print("=" * 80)
+    print(f"File: {report['file']}  ({report['size'] / 1024 / 1024:.1f} MB, {report['format']}, "
+          f"{report['bits']}-bit, base {report['image_base']})")
+    print(f"Code: {', '.join(report['code_sections'])}  ({report['code_bytes'] / 1024 / 1024:.1f} MB) "
+          f"scanned in {elapsed:.2f}s "
+          f"({report['code_bytes'] / 1024 / 1024 / max(elapsed, 1e-9):.0f} MB/s)")
+    print(f"Atoms: {', '.join(f'{kind} {count}' for kind, count in report['atoms'].items())}")
+    print()
+
+    print(f"{'Score':>5s}  {'Offset':>10s}  {'VA':>12s}  Idioms / key length hints")
+    print("-" * 80)
+    for site in report['sites'][:args.top]:
+        idioms = [name for name in ('indexed', 'byte_op', 'loop') if site[name]]
+        idioms += [f"{name}x{site[name]}" for name in ('modulo', 'bound') if site[name]]
+        hints = f"  len? {', '.join(map(str, site['key_lengths']))}" if site['key_lengths'] else ''
+        print(f"{site['score']:5.1f}  {site['offset']:>10s}  {site['va'] or '-':>12s}  {' '.join(idioms)}{hints}")
+    if not report['sites']:
+        print("[*] No XOR loop candidates")
+
+    if report['tables']:
+        print(f"\nCandidate key tables ({len(report['tables'])}):")
+        for table in report['tables'][:args.top]:
+            print(f"  {table['va']:>12s} {table['section']:8s} score {table['score']:5.1f}  "
+                  f"sites {len(table['sites'])}  {table['preview'][:47]}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=1), encoding='utf-8')
+        print(f"\n[+] Report written to {args.output}")
+    finish_profile(profiler, args)
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Integrity manifest of a client install (Lin.bin, the IDX/PAK pairs, DLLs).
+
+Walks the install with os.scandir and hashes every file with BLAKE2b-256 on a
+thread pool. Files are split into --chunk-size chunks (4 MB by default) that
+are hashed independently through mmap, so one large PAK keeps every worker
+busy (hashlib releases the GIL while hashing) and the manifest carries a
+digest per chunk:
+
+  chunks   BLAKE2b-256 of each chunk (only listed for files of 2+ chunks)
+  hash     BLAKE2b-256 of the file size (8 bytes, little endian) followed
+           by the chunk digests - the value the launcher compares
+
+so a mismatch in a 300 MB PAK points at the 4 MB ranges to fetch again
+instead of the whole file.
+
+Hashes are cached by (size, mtime) in a JSON file next to the manifest
+(<manifest>.cache); files whose size and mtime are unchanged are not read
+again, so re-verifying an unchanged install only costs the directory walk.
+--full ignores the cache and hashes everything.
+
+`verify` reports missing, changed and (with --extra) unlisted files and
+exits 1 when anything differs, which is the check PatchEngine.
+VerifyIntegrityAsync is meant to perform against a published manifest.
+
+Usage:
+  python install_manifest.py build <client_dir> <manifest.json> [--workers 8] [--chunk-size 4] [--exclude '*.log']
+  python install_manifest.py verify <client_dir> <manifest.json> [--full] [--extra]
+"""
+
+import argparse
+import fnmatch
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+FORMAT_VERSION = 1
+ALGORITHM = 'blake2b-256'
+DIGEST_SIZE = 32
+CHUNK_SIZE = 4 * 1024 * 1024
+# Below this a plain read is cheaper than setting up a mapping
+MMAP_THRESHOLD = 256 * 1024
+DEFAULT_EXCLUDE = ('*.log', '*.tmp', 'Thumbs.db', 'desktop.ini')
+
+
+def scan(root, exclude=DEFAULT_EXCLUDE, skip=()):
+    """{relative path ('/' separated): (size, mtime_ns)} for every file below root but the `skip` paths."""
+    found = {}
+    pending = ['']
+    while pending:
+        relative_dir = pending.pop()
+        with os.scandir(os.path.join(root, relative_dir)) as entries:
+            for item in entries:
+                relative = f"{relative_dir}/{item.name}" if relative_dir else item.name
+                if item.is_dir(follow_symlinks=False):
+                    pending.append(relative)
+                elif item.is_file(follow_symlinks=False):
+                    if relative in skip or any(fnmatch.fnmatch(item.name, pattern) for pattern in exclude):
+                        continue
+                    stat = item.stat(follow_symlinks=False)
+                    found[relative] = (stat.st_size, stat.st_mtime_ns)
+    return found
+
+
+def hash_chunk(path, offset, length):
+    """BLAKE2b-256 of `length` bytes at `offset` (a multiple of mmap.ALLOCATIONGRANULARITY)."""
+    h = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    with open(path, 'rb') as f:
+        if length < MMAP_THRESHOLD:
+            f.seek(offset)
+            h.update(f.read(length))
+        else:
+            with mmap.mmap(f.fileno(), length, access=mmap.ACCESS_READ, offset=offset) as view:
+                h.update(view)
+    return h.digest()
+
+
+def file_hash(size, chunk_digests):
+    h = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    h.update(struct.pack('<Q', size))
+    for digest in chunk_digests:
+        h.update(digest)
+    return h.hexdigest()
+
+
+def chunk_count(size, chunk_size):
+    return max(1, -(-size // chunk_size))
+
+
+def hash_files(root, files, chunk_size=CHUNK_SIZE, workers=None):
+    """
+    Hash files on a thread pool, one task per chunk.
+
+    Args:
+        root: Install directory
+        files: {relative path: (size, mtime_ns)} to hash
+        chunk_size: Chunk length; a multiple of mmap.ALLOCATIONGRANULARITY
+
+    Returns:
+        {relative path: manifest record}, skipping files that vanished while hashing
+    """
+    if chunk_size % mmap.ALLOCATIONGRANULARITY:
+        raise ValueError(f"chunk size must be a multiple of {mmap.ALLOCATIONGRANULARITY}")
+    tasks = []
+    for relative, (size, _) in files.items():
+        for index in range(chunk_count(size, chunk_size)):
+            offset = index * chunk_size
+            tasks.append((relative, index, offset, min(chunk_size, size - offset)))
+    # Longest chunks first so the pool does not end on one large straggler
+    tasks.sort(key=lambda task: -task[3])
+
+    digests = {relative: [None] * chunk_count(size, chunk_size) for relative, (size, _) in files.items()}
+    failed = set()
+    with ThreadPoolExecutor(max_workers=workers or min(32, (os.cpu_count() or 1) + 4)) as pool:
+        futures = [(relative, index, pool.submit(hash_chunk, os.path.join(root, relative), offset, length))
+                   for relative, index, offset, length in tasks]
+        for relative, index, future in futures:
+            try:
+                digests[relative][index] = future.result()
+            except (FileNotFoundError, ValueError, OSError):
+                # Removed or truncated after the scan
+                failed.add(relative)
+
+    records = {}
+    for relative, (size, mtime_ns) in files.items():
+        if relative in failed:
+            continue
+        chunks = digests[relative]
+        record = {'size': size, 'mtime_ns': mtime_ns, 'hash': file_hash(size, chunks)}
+        if len(chunks) > 1:
+            record['chunks'] = [digest.hex() for digest in chunks]
+        records[relative] = record
+    return records
+
+
+def cache_path(manifest_path):
+    return Path(f"{manifest_path}.cache")
+
+
+def load_cache(path, chunk_size):
+    """Cached records, or {} when missing, unreadable or made with another chunk size."""
+    try:
+        cache = json.loads(Path(path).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+    if cache.get('format') != FORMAT_VERSION or cache.get('chunk_size') != chunk_size:
+        return {}
+    return cache.get('files', {})
+
+
+def save_cache(path, chunk_size, records):
+    Path(path).write_text(json.dumps({'format': FORMAT_VERSION, 'chunk_size': chunk_size, 'files': records},
+                                     separators=(',', ':')), encoding='utf-8')
+
+
+def current_records(root, chunk_size=CHUNK_SIZE, workers=None, cache=None, exclude=DEFAULT_EXCLUDE, skip=()):
+    """
+    Records for every file of the install, hashing only files whose (size, mtime) is not cached.
+
+    Returns:
+        (records, stats dict: files, bytes, hashed, hashed_bytes, cached)
+    """
+    files = scan(root, exclude, skip)
+    cache = cache or {}
+    records = {}
+    stale = {}
+    for relative, (size, mtime_ns) in files.items():
+        cached = cache.get(relative)
+        if cached and cached['size'] == size and cached['mtime_ns'] == mtime_ns:
+            records[relative] = cached
+        else:
+            stale[relative] = (size, mtime_ns)
+    records.update(hash_files(root, stale, chunk_size, workers))
+    stats = {
+        'files': len(records),
+        'bytes': sum(record['size'] for record in records.values()),
+        'hashed': len(stale),
+        'hashed_bytes': sum(size for size, _ in stale.values()),
+        'cached': len(files) - len(stale),
+    }
+    return dict(sorted(records.items())), stats
+
+
+def build_manifest(records, chunk_size=CHUNK_SIZE):
+    """Manifest document; mtimes are local to this install and left out."""
+    return {
+        'format': FORMAT_VERSION,
+        'algorithm': ALGORITHM,
+        'chunk_size': chunk_size,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'files': [{'path': relative, 'size': record['size'], 'hash': record['hash'],
+                   **({'chunks': record['chunks']} if 'chunks' in record else {})}
+                  for relative, record in records.items()],
+    }
+
+
+def verify(manifest, records):
+    """
+    Compare an install against a manifest.
+
+    Returns:
+        {'missing': [path], 'changed': [{'path', 'size', 'expected_size', 'bad_chunks'}],
+         'extra': [path], 'ok': count}
+    """
+    chunk_size = manifest['chunk_size']
+    expected = {item['path']: item for item in manifest['files']}
+    result = {'missing': [], 'changed': [], 'extra': sorted(records.keys() - expected.keys()), 'ok': 0}
+    for relative, item in expected.items():
+        record = records.get(relative)
+        if record is None:
+            result['missing'].append(relative)
+        elif record['hash'] == item['hash']:
+            result['ok'] += 1
+        else:
+            want = item.get('chunks') or [None]
+            have = record.get('chunks') or [None]
+            if len(want) == len(have) == 1:
+                bad = [0]
+            else:
+                bad = [index for index in range(chunk_count(item['size'], chunk_size))
+                       if index >= len(have) or index >= len(want) or have[index] != want[index]]
+            result['changed'].append({'path': relative, 'size': record['size'], 'expected_size': item['size'],
+                                      'bad_chunks': bad})
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or verify a chunked BLAKE2 manifest of a client install")
+    commands = parser.add_subparsers(dest='command', required=True)
+    for name, text in (('build', "Hash the install and write a manifest"),
+                       ('verify', "Check the install against a manifest")):
+        command = commands.add_parser(name, help=text)
+        command.add_argument('client', help="Client install directory (the one holding Lin.bin)")
+        command.add_argument('manifest', help="Manifest JSON file")
+        command.add_argument('--workers', type=int, help="Hashing threads (default: CPU count + 4, at most 32)")
+        command.add_argument('--cache', help="(size, mtime) hash cache (default: <manifest>.cache)")
+        command.add_argument('--full', action='store_true', help="Ignore the cache and hash every file")
+        command.add_argument('--exclude', nargs='*', default=list(DEFAULT_EXCLUDE),
+                             help="File name patterns to leave out")
+        if name == 'build':
+            command.add_argument('--chunk-size', type=int, default=CHUNK_SIZE // (1024 * 1024),
+                                 help="Chunk size in MB")
+        else:
+            command.add_argument('--extra', action='store_true', help="Also report files the manifest lacks")
+            command.add_argument('--output', help="Write the verification result as JSON")
+    args = parser.parse_args()
+
+    for path in (args.client, args.manifest if args.command == 'verify' else None):
+        if path and not Path(path).exists():
+            print(f"[!] File not found: {path}")
+            sys.exit(1)
+
+    started = time.perf_counter()
+    manifest = None
+    if args.command == 'build':
+        chunk_size = args.chunk_size * 1024 * 1024
+    else:
+        manifest = json.loads(Path(args.manifest).read_text(encoding='utf-8'))
+        if manifest.get('format') != FORMAT_VERSION or manifest.get('algorithm') != ALGORITHM:
+            print(f"[!] Unsupported manifest: format {manifest.get('format')}, {manifest.get('algorithm')}")
+            sys.exit(1)
+        chunk_size = manifest['chunk_size']
+
+    cache_file = Path(args.cache) if args.cache else cache_path(args.manifest)
+    cache = {} if args.full else load_cache(cache_file, chunk_size)
+    # The manifest and cache may live inside the install; they are not part of it
+    client = Path(args.client).resolve()
+    skip = {path.resolve().relative_to(client).as_posix() for path in (Path(args.manifest), cache_file)
+            if path.resolve().is_relative_to(client)}
+    records, stats = current_records(args.client, chunk_size, args.workers, cache, args.exclude, skip)
+    save_cache(cache_file, chunk_size, records)
+    elapsed = time.perf_counter() - started
+    rate = stats['hashed_bytes'] / elapsed / 1024 / 1024 if elapsed else 0
+    print(f"[*] {stats['files']} files, {stats['bytes'] / 1024 / 1024:.1f} MB: {stats['hashed']} hashed "
+          f"({stats['hashed_bytes'] / 1024 / 1024:.1f} MB, {rate:.0f} MB/s), {stats['cached']} from cache")
+
+    if args.command == 'build':
+        Path(args.manifest).write_text(json.dumps(build_manifest(records, chunk_size), indent=1), encoding='utf-8')
+        print(f"[+] Manifest written to {args.manifest}")
+        print(f"[*] Completed in {time.perf_counter() - started:.2f}s")
+        sys.exit(0)
+
+    result = verify(manifest, records)
+    if not args.extra:
+        result['extra'] = []
+    for relative in result['missing']:
+        print(f"[!] Missing: {relative}")
+    for change in result['changed']:
+        detail = f"size {change['size']} (expected {change['expected_size']})" \
+            if change['size'] != change['expected_size'] else f"{len(change['bad_chunks'])} bad chunk(s)"
+        print(f"[!] Changed: {change['path']}: {detail}")
+    for relative in result['extra']:
+        print(f"[*] Not in manifest: {relative}")
+    if args.output:
+        Path(args.output).write_text(json.dumps(result, indent=2), encoding='utf-8')
+    problems = len(result['missing']) + len(result['changed'])
+    print(f"[{'+' if not problems else '!'}] {result['ok']} ok, {len(result['changed'])} changed, "
+          f"{len(result['missing'])} missing")
+    print(f"[*] Completed in {time.perf_counter() - started:.2f}s")
+    sys.exit(1 if problems else 0)
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Phase latency statistics from launcher Serilog files (launcher-YYYYMMDD.log).
+
+Streams any number of (rotated, optionally gzipped) log files line by line in
+name order, splits them into sessions (Hosting starting -> Hosting stopped),
+pairs the start and end message of every launch phase within a session and
+reports per phase:
+
+  count / failed / incomplete   completed pairs, pairs closed by a failure
+                                message, starts never closed in their session
+  p50 / p95 / p99 / max         latency of completed pairs in milliseconds
+
+plus ERR/WRN counts per session and per 1000 log records, and the most
+frequent error and warning messages (with quoted values and numbers folded so
+similar messages group together). Stack-trace continuation lines belong to
+the record above them and are not counted as records.
+
+Only lines whose message matches a phase marker get their timestamp parsed,
+so throughput is bounded by line splitting rather than by date handling.
+
+Usage:
+  python launcher_log_stats.py launcher-*.log [--output phase_stats.json] [--top 10]
+"""
+
+import argparse
+import gzip
+import json
+import re
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+# phase: (start pattern, end pattern, failure pattern or None); matched against
+# the start of the message text
+PHASES = {
+    'session': (r'Hosting starting', r'Hosting stopped', None),
+    'host_startup': (r'Hosting starting', r'Application started', None),
+    'authentication': (r'Authenticating user', r'Authentication successful', r'Authentication failed'),
+    'hardware_ids': (r'Collecting hardware IDs', r'Hardware IDs collected', None),
+    'http_request': (r'Start processing HTTP request', r'End processing HTTP request', None),
+    'connector_info': (r'Fetching connector info', r'Connector info decrypted successfully', None),
+    'dll_deployment': (r'Starting DLL deployment', r'DLL deployment completed successfully',
+                       r'Failed to deploy DLLs'),
+    'launch': (r'=== Starting Launch with Injection ===', r'=== Launch Complete ===', r'Launch failed at phase'),
+    'create_process': (r'Creating suspended process', r'Process created successfully', None),
+    'dll_injection': (r'Starting injection of', r'All \d+ DLLs injected successfully', r'DLL injection failed'),
+    'pipe_wait': (r'Waiting for game client connection', r'(?:Game client connected|Pipe connection timeout after)',
+                  None),
+    'resume_thread': (r'Resuming main thread', r'Thread resumed', None),
+    'shutdown': (r'Application is shutting down', r'Hosting stopped', None),
+}
+LEVELS = ('VRB', 'DBG', 'INF', 'WRN', 'ERR', 'FTL')
+PERCENTILES = (50, 95, 99)
+
+RECORD = re.compile(r'(\d{4}-\d\d-\d\d)T(\d\d):(\d\d):(\d\d(?:\.\d+)?)([+-]\d\d:\d\d|Z)?\s+\[([A-Z]{3})\] (.*?)'
+                    r'(?: \([0-9a-f]{8}\))?$')
+FOLD_QUOTED = re.compile(r'"[^"]*"|\'[^\']*\'')
+FOLD_NUMBER = re.compile(r'\d+(?:\.\d+)?')
+
+
+def _marker_pattern():
+    """
+    One alternation over every distinct phase marker.
+
+    Returns:
+        (compiled pattern, {group name: [(kind, phase), ...]}); a marker shared
+        by several phases (Hosting starting, Hosting stopped) maps to all of them
+    """
+    by_marker = {}
+    for name, (start, end, failure) in PHASES.items():
+        for kind, marker in (('start', start), ('end', end), ('fail', failure)):
+            if marker:
+                by_marker.setdefault(marker, []).append((kind, name))
+    groups = {f'm{number}': found for number, found in enumerate(by_marker.values())}
+    pattern = '|'.join(f'(?P<m{number}>{marker})' for number, marker in enumerate(by_marker))
+    return re.compile(pattern), groups
+
+
+class _Clock:
+    """Timestamp -> epoch seconds, converting each (date, offset) pair only once."""
+
+    def __init__(self):
+        self._midnights = {}
+
+    def seconds(self, date, hour, minute, second, offset):
+        key = (date, offset)
+        midnight = self._midnights.get(key)
+        if midnight is None:
+            suffix = '+00:00' if offset in (None, 'Z') else offset
+            midnight = datetime.fromisoformat(f'{date}T00:00:00{suffix}').timestamp()
+            self._midnights[key] = midnight
+        return midnight + int(hour) * 3600 + int(minute) * 60 + float(second)
+
+
+def open_log(path):
+    path = Path(path)
+    if path.suffix == '.gz':
+        return gzip.open(path, 'rt', encoding='utf-8', errors='replace')
+    return open(path, encoding='utf-8-sig', errors='replace')
+
+
+def percentile(values, q):
+    """Linear-interpolation percentile of a sorted list."""
+    if not values:
+        return None
+    position = (len(values) - 1) * q / 100
+    low = int(position)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+
+def fold(message):
+    """Message template: quoted values and numbers replaced, for grouping."""
+    return FOLD_NUMBER.sub('N', FOLD_QUOTED.sub('"_"', message))
+
+
+def analyze(paths):
+    """
+    Stream log files and collect phase latencies and level counts.
+
+    Args:
+        paths: Log files, read in the given order (sessions may span files)
+
+    Returns:
+        report dict with files, records, sessions, levels, phases and top messages
+    """
+    names = list(PHASES)
+    markers, marker_groups = _marker_pattern()
+    clock = _Clock()
+
+    durations = {name: [] for name in names}
+    failed_durations = {name: [] for name in names}
+    incomplete = dict.fromkeys(names, 0)
+    open_phases = {name: [] for name in names}
+    levels = dict.fromkeys(LEVELS, 0)
+    messages = {'ERR': {}, 'WRN': {}}
+    sessions = 0
+    session_levels = []
+    records = 0
+    unparsed = 0
+    files = []
+
+    def close_session():
+        for name, starts in open_phases.items():
+            incomplete[name] += len(starts)
+            starts.clear()
+
+    for path in paths:
+        lines = 0
+        with open_log(path) as f:
+            for line in f:
+                lines += 1
+                if not line[:4].isdigit():
+                    continue
+                match = RECORD.match(line.rstrip('\r\n'))
+                if not match:
+                    unparsed += 1
+                    continue
+                records += 1
+                date, hour, minute, second, offset, level, message = match.groups()
+                levels[level] = levels.get(level, 0) + 1
+                if level in messages:
+                    template = fold(message)
+                    messages[level][template] = messages[level].get(template, 0) + 1
+                    if session_levels:
+                        session_levels[-1][level] += 1
+
+                marker = markers.match(message)
+                if not marker:
+                    continue
+                now = clock.seconds(date, hour, minute, second, offset)
+                for kind, name in marker_groups[marker.lastgroup]:
+                    if kind == 'start':
+                        if name == 'session':
+                            close_session()
+                            sessions += 1
+                            session_levels.append({'ERR': 0, 'WRN': 0})
+                        open_phases[name].append(now)
+                    elif open_phases[name]:
+                        started = open_phases[name].pop(0)
+                        target = durations if kind == 'end' else failed_durations
+                        target[name].append((now - started) * 1000)
+        files.append({'path': str(path), 'lines': lines})
+    close_session()
+
+    phases = {}
+    for name in names:
+        ok = sorted(durations[name])
+        failures = len(failed_durations[name])
+        total = len(ok) + failures
+        entry = {
+            'count': len(ok),
+            'failed': failures,
+            'incomplete': incomplete[name],
+            'failure_rate': round(failures / total, 4) if total else None,
+        }
+        for q in PERCENTILES:
+            value = percentile(ok, q)
+            entry[f'p{q}_ms'] = round(value, 3) if value is not None else None
+        entry['max_ms'] = round(ok[-1], 3) if ok else None
+        phases[name] = entry
+
+    per_session = {level: [counts[level] for counts in session_levels] for level in ('ERR', 'WRN')}
+    return {
+        'files': files,
+        'records': records,
+        'unparsed_records': unparsed,
+        'sessions': sessions,
+        'levels': {level: count for level, count in levels.items() if count},
+        'rates': {
+            'errors_per_1k_records': round(levels['ERR'] * 1000 / records, 3) if records else None,
+            'warnings_per_1k_records': round(levels['WRN'] * 1000 / records, 3) if records else None,
+            'errors_per_session': round(sum(per_session['ERR']) / sessions, 3) if sessions else None,
+            'warnings_per_session': round(sum(per_session['WRN']) / sessions, 3) if sessions else None,
+            'sessions_with_errors': sum(1 for count in per_session['ERR'] if count),
+        },
+        'phases': phases,
+        'top_messages': {level: sorted(({'message': template, 'count': count}
+                                        for template, count in by_template.items()),
+                                       key=lambda item: -item['count'])
+                         for level, by_template in messages.items()},
+    }
+
+
+def _ms(value):
+    return f"{value:10.1f}" if value is not None else f"{'-':>10s}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-phase latency percentiles and error rates from launcher logs")
+    parser.add_argument('logs', nargs='+', help="launcher-*.log files (.gz accepted); read in name order")
+    parser.add_argument('--top', type=int, default=10, help="Most frequent ERR/WRN messages to print")
+    parser.add_argument('--output', help="Write the full report as JSON")
+    args = parser.parse_args()
+
+    missing = [path for path in args.logs if not Path(path).exists()]
+    if missing:
+        print(f"[!] File not found: {missing[0]}")
+        sys.exit(1)
+
+    started = time.perf_counter()
+    report = analyze(sorted(args.logs, key=lambda path: Path(path).name))
+    elapsed = time.perf_counter() - started
+    lines = sum(f['lines'] for f in report['files'])
+
+    print("=" * 80)
+    print("LAUNCHER PHASE LATENCY")
+    print("=" * 80)
+    print(f"Files: {len(report['files'])}  lines: {lines}  records: {report['records']}  "
+          f"sessions: {report['sessions']}  in {elapsed:.2f}s ({lines / max(elapsed, 1e-9):,.0f} lines/s)")
+    print()
+    print(f"{'Phase':16s} {'Count':>6s} {'Failed':>6s} {'Open':>5s} {'p50 ms':>10s} {'p95 ms':>10s} "
+          f"{'p99 ms':>10s} {'max ms':>10s}")
+    print("-" * 80)
+    for name, phase in report['phases'].items():
+        if phase['count'] or phase['failed'] or phase['incomplete']:
+            print(f"{name:16s} {phase['count']:6d} {phase['failed']:6d} {phase['incomplete']:5d} "
+                  f"{_ms(phase['p50_ms'])} {_ms(phase['p95_ms'])} {_ms(phase['p99_ms'])} {_ms(phase['max_ms'])}")
+
+    rates = report['rates']
+    print()
+    print(f"Levels: {', '.join(f'{level} {count}' for level, count in report['levels'].items())}")
+    if report['records']:
+        print(f"Errors: {rates['errors_per_1k_records']} per 1k records, {rates['errors_per_session']} per session "
+              f"({rates['sessions_with_errors']} of {report['sessions']} sessions)")
+        print(f"Warnings: {rates['warnings_per_1k_records']} per 1k records, {rates['warnings_per_session']} per session")
+    for level, label in (('ERR', 'errors'), ('WRN', 'warnings')):
+        top = report['top_messages'][level][:args.top]
+        if top:
+            print(f"\nTop {label}:")
+            for item in top:
+                print(f"  {item['count']:5d}  {item['message'][:100]}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=1, ensure_ascii=False), encoding='utf-8')
+        print(f"\n[+] Report written to {args.output}")